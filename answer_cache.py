@@ -0,0 +1,100 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Caches chat answers for near-identical questions over the same chunks.
+
+    A lookup hits when the new question's embedding has cosine similarity of
+    at least ``threshold`` with a cached question, and retrieval returned
+    exactly the same chunk IDs. Entries are tied to a corpus generation.
+    Any ingest bumps the generation, which drops everything cached before it.
+    Callers read the generation before searching, so an answer built from
+    a search that raced an ingest is never stored under the new generation.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 500, ttl_seconds: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> entry dict
+        self._next_key = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _sync_generation(self, generation: int):
+        """Move to a newer generation; returns False if ``generation`` is stale"""
+        if generation > self.generation:
+            self._entries.clear()
+            self.generation = generation
+        return generation == self.generation
+
+    def get(self, query_embedding, chunk_ids: list, generation: int):
+        """Return the cached {'response', 'sources'} for this question, or None"""
+        chunk_key = frozenset(chunk_ids)
+        query = self._normalize(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            if not self._sync_generation(generation):
+                self.misses += 1
+                return None
+            best_key = None
+            best_score = self.threshold
+            for key, entry in list(self._entries.items()):
+                if self.ttl_seconds > 0 and now - entry['stored_at'] > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                if entry['chunk_ids'] != chunk_key:
+                    continue
+                score = float(entry['embedding'] @ query)
+                if score >= best_score:
+                    best_key = key
+                    best_score = score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            return {'response': entry['response'], 'sources': list(entry['sources']), 'similarity': best_score}
+
+    def put(self, query_embedding, chunk_ids: list, generation: int, response: str, sources: list):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            # A search that started before the last ingest may not have seen it
+            if not self._sync_generation(generation):
+                return
+            self._entries[self._next_key] = {
+                'embedding': self._normalize(query_embedding),
+                'chunk_ids': frozenset(chunk_ids),
+                'response': response,
+                'sources': list(sources),
+                'stored_at': time.monotonic(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'generation': self.generation,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,117 @@
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+
+class ChatSession:
+    """One conversation as the LLM sees it, plus the full transcript.
+
+    ``turns`` is what gets replayed to Ollama's chat API on every request.
+    Each turn keeps the document context sent with it and the chunk IDs
+    behind that context, so later questions only send chunks the model
+    hasn't seen yet. Old turns are dropped when the token window fills up.
+    ``transcript`` keeps every exchange regardless. ``turn_lock`` is held
+    for a whole request, so two requests on one session take turns instead
+    of both building on the same history.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turn_lock = asyncio.Lock()
+        self.turns = []
+        self.transcript = []
+        self.trimmed_turns = 0
+        self.last_used = time.monotonic()
+
+    def chunk_ids(self):
+        return {chunk_id for turn in self.turns for chunk_id in turn['chunk_ids']}
+
+    def context_text(self):
+        """All document context sent so far in the live turns"""
+        return "\n---\n".join(turn['context'] for turn in self.turns if turn['context'])
+
+    def history_tokens(self):
+        return sum(turn['tokens'] for turn in self.turns)
+
+    def messages(self, system_prompt: str):
+        messages = [{'role': 'system', 'content': system_prompt}]
+        for turn in self.turns:
+            messages.append({'role': 'user', 'content': turn['prompt']})
+            messages.append({'role': 'assistant', 'content': turn['assistant']})
+        return messages
+
+    def trim(self, max_tokens: int):
+        """Forget the oldest turns until the history fits in max_tokens"""
+        dropped = 0
+        while self.turns and self.history_tokens() > max_tokens:
+            self.turns.pop(0)
+            dropped += 1
+        self.trimmed_turns += dropped
+        return dropped
+
+    def add_turn(self, user: str, prompt: str, context: str, assistant: str, chunk_ids: list, tokens: int):
+        self.turns.append({
+            'user': user,
+            'prompt': prompt,
+            'context': context,
+            'assistant': assistant,
+            'chunk_ids': list(chunk_ids or []),
+            'tokens': tokens,
+        })
+
+    def record(self, user: str, assistant: str, **extra):
+        self.transcript.append({'user': user, 'assistant': assistant, **extra})
+
+
+class ChatSessionStore:
+    """Bounded LRU of chat sessions; idle sessions expire after ttl_seconds"""
+
+    def __init__(self, max_sessions: int = 200, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def _expire(self, now: float):
+        if self.ttl_seconds <= 0:
+            return
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.ttl_seconds:
+                del self._sessions[session_id]
+
+    def get(self, session_id: str = None):
+        """Return the session, creating it if needed.
+
+        Without a session_id the caller gets a fresh session that is never
+        stored, so clients that don't track a conversation never share one.
+        """
+        if session_id is None:
+            return ChatSession(None)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = ChatSession(session_id)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def reset(self, session_id: str):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'sessions': len(sessions),
+            'max_sessions': self.max_sessions,
+            'live_turns': sum(len(s.turns) for s in sessions),
+            'trimmed_turns': sum(s.trimmed_turns for s in sessions),
+        }
@@ -0,0 +1,97 @@
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend that is known to be down"""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated backend failures and recovers on its own.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    every call is refused for ``reset_timeout`` seconds. Then it goes half
+    open: a single trial call is let through. Success closes the circuit;
+    failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """Whether a call may go to the backend right now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+                print(f"🟡 {self.name} circuit half-open, trying one request")
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def before_call(self):
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open, not calling the backend")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"🟢 {self.name} circuit closed, backend recovered")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self):
+        """Open the circuit now, e.g. when a health check finds the backend down"""
+        with self._lock:
+            if self.state != OPEN:
+                self._open()
+
+    def _open(self):
+        if self.state != OPEN:
+            self.times_opened += 1
+            print(f"🔴 {self.name} circuit open for {self.reset_timeout:.0f}s "
+                  f"after {self.consecutive_failures} failures")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in_seconds': retry_in,
+                'times_opened': self.times_opened,
+                'rejected_calls': self.rejected,
+            }
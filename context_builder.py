@@ -0,0 +1,188 @@
+import math
+import threading
+
+CONTEXT_SEPARATOR = "\n---\n"
+NO_CONTEXT = "No relevant documents found."
+
+
+class TokenCounter:
+    """Per-model token estimates calibrated against Ollama's own counts.
+
+    Ollama has no tokenize endpoint, but every generation reports
+    ``prompt_eval_count`` for the prompt it was given. Each observation
+    updates a moving average of characters per token for that model, so the
+    estimate converges to the real tokenizer of whichever model is selected.
+    Until a model has been observed, a conservative default is used.
+    """
+
+    def __init__(self, default_chars_per_token: float = 3.0, smoothing: float = 0.2):
+        self.default_chars_per_token = default_chars_per_token
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._chars_per_token = {}  # model -> calibrated ratio
+        self.observations = {}
+
+    def chars_per_token(self, model: str):
+        return self._chars_per_token.get(model, self.default_chars_per_token)
+
+    def count(self, text: str, model: str):
+        if not text:
+            return 0
+        return math.ceil(len(text) / self.chars_per_token(model))
+
+    def observe(self, model: str, prompt: str, prompt_eval_count, num_ctx: int = None):
+        """Record how many tokens Ollama evaluated for a prompt"""
+        if not prompt or not prompt_eval_count:
+            return
+        # A prompt that filled the window was truncated, so its count is not the real length
+        if num_ctx and prompt_eval_count >= num_ctx:
+            return
+        ratio = len(prompt) / prompt_eval_count
+        # Partial counts (e.g. a reused prompt prefix) give implausible ratios
+        if not 1.0 <= ratio <= 8.0:
+            return
+        with self._lock:
+            current = self._chars_per_token.get(model)
+            self._chars_per_token[model] = ratio if current is None else (
+                (1 - self.smoothing) * current + self.smoothing * ratio
+            )
+            self.observations[model] = self.observations.get(model, 0) + 1
+
+    def stats(self):
+        return {
+            'default_chars_per_token': self.default_chars_per_token,
+            'models': {
+                model: {'chars_per_token': round(ratio, 3), 'observations': self.observations.get(model, 0)}
+                for model, ratio in self._chars_per_token.items()
+            },
+        }
+
+
+def word_overlap(left: list, right: list, max_overlap: int):
+    """Length of the longest suffix of left that is also a prefix of right"""
+    for size in range(min(max_overlap, len(left), len(right)), 0, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
+
+
+def merge_adjacent_chunks(matches: list, max_overlap: int = 100):
+    """Collapse neighbouring chunks of the same document into single passages.
+
+    split_text repeats the last ``max_overlap`` words of a chunk at the start
+    of the next one. When both neighbours are retrieved, the shared words are
+    kept once. Passages are returned best-rank first; each keeps the rank of
+    its best chunk and the ids of every chunk it covers.
+    """
+    passages = []
+    by_doc = {}
+    for rank, match in enumerate(matches):
+        metadata = match['metadata']
+        passage = {
+            'rank': rank,
+            'words': metadata.get('text', '').split(),
+            'metadata': metadata,
+            'ids': [match['id']],
+            'first': metadata.get('chunk_id'),
+            'last': metadata.get('chunk_id'),
+        }
+        passages.append(passage)
+        if metadata.get('doc_id') is not None and passage['first'] is not None:
+            by_doc.setdefault(metadata['doc_id'], []).append(passage)
+
+    merged_away = set()
+    for doc_passages in by_doc.values():
+        doc_passages.sort(key=lambda p: p['first'])
+        current = doc_passages[0]
+        for passage in doc_passages[1:]:
+            if passage['first'] == current['last'] + 1:
+                overlap = word_overlap(current['words'], passage['words'], max_overlap)
+                if overlap:
+                    current['words'] = current['words'] + passage['words'][overlap:]
+                    current['ids'] += passage['ids']
+                    current['last'] = passage['last']
+                    current['rank'] = min(current['rank'], passage['rank'])
+                    if 'page_end' in passage['metadata']:
+                        current['metadata'] = {**current['metadata'], 'page_end': passage['metadata']['page_end']}
+                    merged_away.add(id(passage))
+                    continue
+            current = passage
+
+    result = [p for p in passages if id(p) not in merged_away]
+    result.sort(key=lambda p: p['rank'])
+    return result
+
+
+def source_label(metadata: dict):
+    label = f"{metadata.get('filename', 'unknown')}"
+    if metadata.get('file_type'):
+        label += f" ({metadata['file_type']})"
+    if metadata.get('page_start'):
+        start, end = metadata['page_start'], metadata.get('page_end', metadata['page_start'])
+        label += f" p. {start}" if start == end else f" pp. {start}-{end}"
+    if metadata.get('row_start'):
+        label += f" rows {metadata['row_start']}-{metadata.get('row_end', metadata['row_start'])}"
+    return label
+
+
+def truncate_to_tokens(text: str, max_tokens: int, counter: TokenCounter, model: str):
+    """Cut text to at most max_tokens, preferring to end on a sentence"""
+    if counter.count(text, model) <= max_tokens:
+        return text
+    max_chars = int(max_tokens * counter.chars_per_token(model))
+    cut = text[:max_chars]
+    sentence_end = max(cut.rfind('. '), cut.rfind('\n'))
+    if sentence_end > max_chars // 2:
+        return cut[:sentence_end + 1].rstrip()
+    return cut.rsplit(' ', 1)[0]
+
+
+def pack_context(matches: list, budget_tokens: int, counter: TokenCounter, model: str,
+                 chunk_overlap: int = 100, min_fragment_tokens: int = 48):
+    """Build the LLM context from ranked search matches within a token budget.
+
+    Overlapping neighbours are merged first, then passages are added in
+    retrieval order while they fit. The first passage that doesn't fit is
+    truncated into the remaining space if at least ``min_fragment_tokens``
+    are left, and packing stops. Returns (context, sources, stats).
+    """
+    passages = merge_adjacent_chunks(matches, max_overlap=chunk_overlap)
+    separator_tokens = counter.count(CONTEXT_SEPARATOR, model)
+
+    parts = []
+    sources = []
+    used = 0
+    included_ids = []
+    truncated = False
+    for passage in passages:
+        text = " ".join(passage['words'])
+        if not text:
+            continue
+        cost = counter.count(text, model) + (separator_tokens if parts else 0)
+        remaining = budget_tokens - used
+        if cost > remaining:
+            room = remaining - (separator_tokens if parts else 0)
+            if room >= min_fragment_tokens:
+                text = truncate_to_tokens(text, room, counter, model)
+                cost = counter.count(text, model) + (separator_tokens if parts else 0)
+                truncated = True
+            else:
+                break
+        parts.append(text)
+        used += cost
+        included_ids += passage['ids']
+        sources.append(source_label(passage['metadata']))
+        if truncated:
+            break
+
+    context = CONTEXT_SEPARATOR.join(parts) if parts else NO_CONTEXT
+    stats = {
+        'budget_tokens': budget_tokens,
+        'context_tokens': used,
+        'chunks_retrieved': len(matches),
+        'chunks_included': len(included_ids),
+        'chunk_ids': included_ids,
+        'passages': len(parts),
+        'truncated': truncated,
+    }
+    return context, sources, stats
@@ -0,0 +1,60 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU + TTL cache of normalized query text -> embedding"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-fold and collapse whitespace so trivially different queries share an entry"""
+        return re.sub(r"\s+", " ", query).strip().lower()
+
+    def get(self, query: str):
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                embedding, stored_at = entry
+                if self.ttl_seconds <= 0 or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, embedding):
+        if self.max_size <= 0:
+            return
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,89 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class BatchingEmbedder:
+    """Collects concurrent single-query encodes into one batched encode call.
+
+    Callers block on ``encode(text)``. A background thread waits for the first
+    pending query, keeps collecting for up to ``window_ms`` (or until
+    ``max_batch_size`` queries are pending), encodes them together and resolves
+    each caller's future.
+    """
+
+    def __init__(self, embedder, window_ms: float = 5, max_batch_size: int = 32):
+        self.embedder = embedder
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def encode(self, text: str, timeout: float = None):
+        """Return the embedding (as a list) for a single text"""
+        if self.window <= 0 or self.max_batch_size == 1:
+            return self.embedder.encode([text])[0].tolist()
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout=timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Identical queries in the same window are encoded once
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = self.embedder.encode(unique_texts, batch_size=len(unique_texts))
+                by_text = {text: embedding.tolist() for text, embedding in zip(unique_texts, embeddings)}
+                for text, future in batch:
+                    future.set_result(by_text[text])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'batches': self.batches,
+            'queries': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'pending': self._queue.qsize(),
+        }
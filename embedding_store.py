@@ -0,0 +1,133 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+
+def content_hash(text: str) -> str:
+    """Stable content address for a chunk of text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def embed_with_store(texts: list, hashes: list, store, encode):
+    """Embed texts, only calling encode on hashes the store doesn't have yet.
+
+    Returns (embeddings in input order, number of texts actually encoded).
+    """
+    cached = store.get_many(hashes)
+    missing = {}
+    for text, h in zip(texts, hashes):
+        if h not in cached and h not in missing:
+            missing[h] = text
+
+    if missing:
+        computed = dict(zip(missing.keys(), encode(list(missing.values()))))
+        store.put_many(computed)
+        cached.update(computed)
+
+    return [cached[h] for h in hashes], len(missing)
+
+
+class EmbeddingStore:
+    """Persistent content-hash -> embedding store on local disk (SQLite).
+
+    Entries are keyed on (model, hash) so switching EMBEDDING_MODEL never
+    returns stale vectors. When the store grows past ``max_entries`` the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, model_name: str, max_entries: int = 200000):
+        self.path = path
+        self.model_name = model_name or "default"
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Ingestion worker processes share this file, so wait out their write locks
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   model TEXT NOT NULL,
+                   hash TEXT NOT NULL,
+                   dim INTEGER NOT NULL,
+                   vector BLOB NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (model, hash)
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, hashes: list):
+        """Return {hash: np.ndarray} for the hashes already stored"""
+        found = {}
+        if not hashes:
+            return found
+        unique = list(dict.fromkeys(hashes))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [self.model_name, *part]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(now, self.model_name, h) for h in found]
+                )
+                self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, items: dict):
+        """Store {hash: embedding} and evict the least recently used overflow"""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for h, embedding in items.items():
+            vector = np.asarray(embedding, dtype=np.float32)
+            rows.append((self.model_name, h, vector.shape[-1], vector.tobytes(), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Evict down to 90% so we don't pay this on every insert
+        overflow = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (overflow,)
+        )
+        print(f"🧹 Evicted {overflow} cached embeddings")
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            'entries': count,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
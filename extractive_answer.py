@@ -0,0 +1,69 @@
+import re
+import numpy as np
+
+SECTION_SEPARATOR = re.compile(r'\n-{3,}\n')
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])|\n+')
+
+
+def split_sentences(context: str, min_chars: int = 20, max_chars: int = 400):
+    """Split retrieved context into unique sentence-sized spans, in reading order.
+
+    Text without sentence punctuation (OCR output, spreadsheet rows) is cut
+    into word windows of at most ``max_chars`` so every span stays scoreable.
+    """
+    spans = []
+    seen = set()
+    for section in SECTION_SEPARATOR.split(context):
+        for sentence in SENTENCE_BOUNDARY.split(section):
+            sentence = " ".join(sentence.split())
+            pieces = [sentence]
+            if len(sentence) > max_chars:
+                pieces = []
+                current = []
+                length = 0
+                for word in sentence.split(' '):
+                    if current and length + len(word) + 1 > max_chars:
+                        pieces.append(" ".join(current))
+                        current = []
+                        length = 0
+                    current.append(word)
+                    length += len(word) + 1
+                if current:
+                    pieces.append(" ".join(current))
+            for piece in pieces:
+                if len(piece) >= min_chars and piece not in seen:
+                    seen.add(piece)
+                    spans.append(piece)
+    return spans
+
+
+class ExtractiveAnswerer:
+    """Answers from retrieved text by picking the sentences closest to the question.
+
+    ``encode`` is the already-loaded sentence embedder: it takes a list of
+    strings and returns one vector per string. The question and every
+    candidate sentence are embedded in a single batched call, and the best
+    ``top_n`` sentences above ``min_score`` cosine similarity are returned in
+    the order they appear in the documents.
+    """
+
+    def __init__(self, encode, top_n: int = 3, min_score: float = 0.25, max_sentences: int = 256):
+        self.encode = encode
+        self.top_n = top_n
+        self.min_score = min_score
+        self.max_sentences = max_sentences
+
+    def best_sentences(self, question: str, context: str):
+        """Return [(sentence, score)] for the top spans, in document order"""
+        sentences = split_sentences(context)[:self.max_sentences]
+        if not sentences:
+            return []
+
+        vectors = np.asarray(self.encode([question] + sentences), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        scores = vectors[1:] @ vectors[0]
+
+        top = np.argsort(-scores)[:self.top_n]
+        top = [i for i in top if scores[i] >= self.min_score]
+        return [(sentences[i], float(scores[i])) for i in sorted(top)]
@@ -1,9 +1,76 @@
-import PyPDF2
-import docx
-import pandas as pd
-from pptx import Presentation
+# Parser libraries (PyPDF2, python-docx, pandas, python-pptx) are imported
+# inside the readers that need them to keep startup fast
 import os
 import re
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from spreadsheet_reader import read_spreadsheet
+
+# Big PDFs are split into page ranges and extracted on a process pool;
+# PDF_WORKERS=0 sizes it from the cores this process may use
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', '0'))
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '16'))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '32'))
+# 0 means every page of a PDF is chunked and indexed
+MAX_PDF_CHUNKS = int(os.getenv('MAX_PDF_CHUNKS', '0'))
+
+_pdf_pool = None
+_pdf_pool_enabled = True
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pdf_workers():
+    """Size of the page extraction pool; 1 means pages are read in-line"""
+    if not _pdf_pool_enabled:
+        return 1
+    if PDF_WORKERS > 0:
+        return PDF_WORKERS
+    # Leave a core for the API process, and past 4 the disk is the bottleneck
+    return max(1, min(4, available_cores() - 1))
+
+
+def _get_pdf_pool():
+    """Per-process page extraction pool, started on the first big PDF"""
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=pdf_workers(), mp_context=multiprocessing.get_context('spawn'))
+    return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
+
+def disable_pdf_pool():
+    """Read PDFs serially in this process from now on.
+
+    Ingestion workers call this: they already run one file per core, and a
+    pool in each of them would start INGEST_WORKERS x PDF_WORKERS processes.
+    """
+    global _pdf_pool_enabled
+    _pdf_pool_enabled = False
+    shutdown_pdf_pool()
+
+
+def _extract_pdf_pages(file_path: str, start: int, end: int):
+    """Pool task: [(page_no, text)] for pages start..end-1, numbered from 1"""
+    import PyPDF2
+
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [(n + 1, reader.pages[n].extract_text() or "") for n in range(start, end)]
+
 
 class FileProcessor:
     @staticmethod
@@ -37,16 +104,48 @@ class FileProcessor:
     @staticmethod
     def _read_pdf(file_path: str):
         """Extract text from PDF"""
-        text = ""
+        return "".join(text + "\n" for _, text in FileProcessor.iter_pdf_pages(file_path))
+
+    @staticmethod
+    def iter_pdf_pages(file_path: str):
+        """Yield (page_no, text) in page order, numbered from 1.
+
+        PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted in
+        PDF_PAGES_PER_TASK page ranges on a process pool. A bounded number of
+        ranges is in flight, so pages stream out as soon as the earliest
+        range is done and the whole document is never held in memory.
+        """
+        import PyPDF2
+
         with open(file_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+            page_count = len(reader.pages)
+            workers = pdf_workers()
+            if page_count < PDF_PARALLEL_MIN_PAGES or workers <= 1:
+                for n, page in enumerate(reader.pages):
+                    yield n + 1, page.extract_text() or ""
+                return
+
+        pool = _get_pdf_pool()
+        ranges = iter([(start, min(start + PDF_PAGES_PER_TASK, page_count))
+                       for start in range(0, page_count, PDF_PAGES_PER_TASK)])
+        in_flight = deque()
+        for start, end in ranges:
+            in_flight.append(pool.submit(_extract_pdf_pages, file_path, start, end))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            pages = in_flight.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                in_flight.append(pool.submit(_extract_pdf_pages, file_path, *next_range))
+            yield from pages
 
     @staticmethod
     def _read_docx(file_path: str):
         """Extract text from Word documents"""
+        import docx
+
         doc = docx.Document(file_path)
         return "\n".join([paragraph.text for paragraph in doc.paragraphs])
 
@@ -73,70 +172,16 @@ class FileProcessor:
     def _read_spreadsheet(file_path: str, file_ext: str):
         """Extract SMART data from ANY Excel/CSV file - GENERALIZED"""
         try:
-            if file_ext == 'csv':
-                df = pd.read_csv(file_path, encoding='utf-8', errors='ignore')
-            else:
-                df = pd.read_excel(file_path)
-        
-            # Create intelligent summary for ANY dataset
-            text = f"Dataset Overview:\n"
-            text += f"- Total records: {len(df):,}\n"
-            text += f"- Columns: {', '.join(df.columns)}\n"
-            text += f"- Data types: {', '.join([f'{col}({dtype})' for col, dtype in df.dtypes.items()])}\n"
-        
-            # Dynamic analysis based on column types
-            numeric_cols = df.select_dtypes(include=['number']).columns
-            text_cols = df.select_dtypes(include=['object']).columns
-        
-            # Analyze numeric columns
-            if len(numeric_cols) > 0:
-                text += f"\nNumeric Analysis:\n"
-                for col in numeric_cols:
-                    if col in df.columns:
-                        text += f"- {col}: Total={df[col].sum():,}, Avg={df[col].mean():.2f}, Min={df[col].min():,}, Max={df[col].max():,}\n"
-        
-            # Analyze text columns (categorical data)
-            if len(text_cols) > 0:
-                text += f"\nCategorical Analysis:\n"
-                for col in text_cols:
-                    if col in df.columns and df[col].nunique() < 20:  # Reasonable number of categories
-                        top_values = df[col].value_counts().head(3)
-                        text += f"- {col}: {', '.join([f'{val}({count})' for val, count in top_values.items()])}\n"
-        
-            # Key insights - automatically detect important patterns
-            text += f"\nKey Insights:\n"
-        
-            # Detect if there's date/time column
-            date_cols = [col for col in df.columns if any(keyword in col.lower() for keyword in ['date', 'time', 'month', 'year'])]
-            if date_cols:
-                text += f"- Time period: {df[date_cols[0]].min()} to {df[date_cols[0]].max()}\n"
-        
-            # Detect money/financial columns
-            money_cols = [col for col in df.columns if any(keyword in col.lower() for keyword in ['revenue', 'profit', 'sales', 'income', 'cost', 'price', 'amount'])]
-            if money_cols:
-                for col in money_cols:
-                    text += f"- Total {col}: ${df[col].sum():,}\n"
-        
-            # Detect quantity columns
-            quantity_cols = [col for col in df.columns if any(keyword in col.lower() for keyword in ['quantity', 'units', 'count', 'number', 'qty'])]
-            if quantity_cols:
-                for col in quantity_cols:
-                    text += f"- Total {col}: {df[col].sum():,}\n"
-        
-            # Sample data for context
-            text += f"\nSample Data (first 3 rows):\n"
-            for i, (_, row) in enumerate(df.head(3).iterrows()):
-                sample_text = " | ".join([f"{col}: {row[col]}" for col in df.columns[:4]])  # First 4 columns max
-                text += f"{i+1}. {sample_text}\n"
-                
-            return text
-        
+            summary, _ = read_spreadsheet(file_path, file_ext, with_rows=False)
+            return summary
         except Exception as e:
-            return f"Dataset loaded with {len(df)} records. Error in detailed analysis: {str(e)}"
+            return f"Error in detailed analysis: {str(e)}"
 
     @staticmethod
     def _read_presentation(file_path: str):
         """Extract text from PowerPoint files"""
+        from pptx import Presentation
+
         text = ""
         prs = Presentation(file_path)
         for slide_num, slide in enumerate(prs.slides):
@@ -148,25 +193,13 @@ class FileProcessor:
         return text
     @staticmethod
     def _read_image(file_path: str):
-        """Extract text from images using EasyOCR - CLEAN VERSION"""
+        """Extract text from images using the shared EasyOCR reader"""
         try:
-            import easyocr
-            import cv2
-        
-            reader = easyocr.Reader(['en'])
-            image = cv2.imread(file_path)
-            if image is None:
+            combined_text = FileProcessor.ocr_batch([file_path])[0]
+            if combined_text is None:
                 return "Could not load image file"
         
-            results = reader.readtext(image)
-            extracted_text = []
-        
-            for (bbox, text, confidence) in results:
-                if confidence > 0.3:  # Only keep confident results
-                    extracted_text.append(text.strip())
-        
-            if extracted_text:
-                combined_text = " ".join(extracted_text)
+            if combined_text:
                 print(f"✅ EasyOCR extracted {len(combined_text)} characters: {combined_text[:100]}...")
                 return f"Extracted text from image:\n{combined_text}"
             else:
@@ -175,6 +208,89 @@ class FileProcessor:
         except Exception as e:
             return f"Image processing error: {str(e)}"
 
+    @staticmethod
+    def ocr_batch(images: list):
+        """OCR many image files or page arrays in one pass; one text per image"""
+        import ocr_engine
+
+        return ocr_engine.ocr_images(images)
+
+    @staticmethod
+    def extract_chunks(file_path: str, filename: str):
+        """Extract and chunk a file in one go.
+
+        Returns (text_length, preview, chunks); each chunk is a dict with
+        'text'; PDF chunks also carry 'page_start' and 'page_end', and
+        spreadsheet row groups 'row_start' and 'row_end'. PDF pages stream
+        straight into the chunker as they are extracted.
+        """
+        file_ext = filename.split('.')[-1].lower()
+        if file_ext in ['xlsx', 'xls', 'csv']:
+            # One streamed pass: the dataset summary plus every row group as its own chunk
+            try:
+                summary, row_chunks = read_spreadsheet(file_path, file_ext)
+            except Exception as e:
+                print(f"Error processing {filename}: {str(e)}")
+                return 0, "", []
+            chunks = [{'text': chunk} for chunk in FileProcessor.split_text(summary)] + row_chunks
+            return len(summary), summary[:200], chunks
+
+        if file_ext != 'pdf':
+            text = FileProcessor.process_file(file_path, filename)
+            if not text or len(text) < 10:
+                return len(text or ""), (text or "")[:200], []
+            return len(text), text[:200], [{'text': chunk} for chunk in FileProcessor.split_text(text)]
+
+        seen = {'length': 0, 'preview': ""}
+
+        def measured(pages):
+            for page_no, text in pages:
+                seen['length'] += len(text)
+                if len(seen['preview']) < 200:
+                    seen['preview'] = (seen['preview'] + text)[:200]
+                yield page_no, text
+
+        try:
+            chunks = list(FileProcessor.split_pages(
+                measured(FileProcessor.iter_pdf_pages(file_path)), max_chunks=MAX_PDF_CHUNKS or None
+            ))
+        except Exception as e:
+            print(f"Error processing {filename}: {str(e)}")
+            return 0, "", []
+        if seen['length'] < 10:
+            chunks = []
+        return seen['length'], seen['preview'], chunks
+
+    @staticmethod
+    def split_pages(pages, chunk_size: int = 500, chunk_overlap: int = 100, max_chunks: int = None):
+        """split_text for a stream of (page_no, text), yielding chunks as they fill.
+
+        Produces the same word windows as split_text would on the joined
+        text, with the first and last page each chunk came from.
+        """
+        step = chunk_size - chunk_overlap
+        words = []  # (word, page_no)
+        emitted = 0
+
+        def make_chunk(window):
+            return {
+                'text': " ".join(word for word, _ in window),
+                'page_start': window[0][1],
+                'page_end': window[-1][1],
+            }
+
+        for page_no, text in pages:
+            words.extend((word, page_no) for word in text.split())
+            while len(words) >= chunk_size:
+                yield make_chunk(words[:chunk_size])
+                emitted += 1
+                if max_chunks and emitted >= max_chunks:
+                    return
+                words = words[step:]
+
+        if words and (emitted == 0 or len(words) > chunk_overlap):
+            yield make_chunk(words)
+
     @staticmethod
     def split_text(text: str, chunk_size: int = 500, chunk_overlap: int = 100):
         """Split text into smaller, meaningful chunks"""
@@ -1,5 +1,12 @@
 const API_BASE_URL = 'http://localhost:8000';
 
+// Each page load (and each Clear) is its own multi-turn conversation on the server
+let sessionId = newSessionId();
+
+function newSessionId() {
+    return `web-ui-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`;
+}
+
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', function() {
     checkBackendStatus();
@@ -73,6 +80,10 @@ async function uploadFile() {
             
             // Reload system info to show updated document count
             loadSystemInfo();
+        } else if (response.status === 413) {
+            const error = await response.json();
+            uploadStatus.innerHTML = `❌ ${error.detail}`;
+            uploadStatus.style.background = 'rgba(244, 67, 54, 0.3)';
         } else {
             throw new Error('Upload failed');
         }
@@ -105,7 +116,7 @@ async function sendMessage() {
             },
             body: JSON.stringify({
                 message: message,
-                session_id: 'web-ui'
+                session_id: sessionId
             })
         });
 
@@ -148,6 +159,8 @@ function addMessage(role, text, sources) {
 
 // Clear chat
 function clearChat() {
+    fetch(`${API_BASE_URL}/session/${encodeURIComponent(sessionId)}`, { method: 'DELETE' }).catch(() => {});
+    sessionId = newSessionId();
     document.getElementById('chatMessages').innerHTML = `
         <div class="message assistant">
             <strong>JARVIS:</strong> Hello! I'm JARVIS. Upload documents or ask me questions about your content.
@@ -490,30 +503,122 @@ async function sendMessage() {
         return;
     }
 
-    // If no conversational response, call the API
+    // If no conversational response, call the streaming API
+    const streamingMessage = startStreamingMessage();
     try {
-        const response = await fetch(`${API_BASE_URL}/chat`, {
+        const response = await fetch(`${API_BASE_URL}/chat-stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
                 message: message,
-                session_id: 'web-ui'
+                session_id: sessionId
             })
         });
 
-        if (response.ok) {
-            const data = await response.json();
-            addMessage('assistant', data.response, data.sources || []);
-        } else {
+        if (response.status === 429) {
+            const retryAfter = response.headers.get('Retry-After') || 'a few';
+            streamingMessage.remove();
+            addMessage('assistant', `I'm busy answering other questions right now. Please try again in ${retryAfter} seconds.`, []);
+            return;
+        }
+
+        if (!response.ok || !response.body) {
             throw new Error('Chat failed');
         }
+
+        await readServerSentEvents(response, function(event, data) {
+            if (event === 'sources') {
+                streamingMessage.setSources(data.sources || []);
+            } else if (event === 'token') {
+                streamingMessage.append(data.token);
+            } else if (event === 'done') {
+                streamingMessage.finish(data.response);
+            } else if (event === 'error') {
+                throw new Error(data.detail);
+            }
+        });
     } catch (error) {
+        streamingMessage.remove();
         addMessage('assistant', 'Sorry, I encountered an error. Please check if the backend is running.', []);
         console.error('Chat error:', error);
     }
 }
 
+// Create an assistant message that fills in as tokens arrive
+function startStreamingMessage() {
+    const chatMessages = document.getElementById('chatMessages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message assistant';
+    messageDiv.innerHTML = '<strong>JARVIS:</strong> ';
+
+    const textSpan = document.createElement('span');
+    textSpan.textContent = '⏳';
+    messageDiv.appendChild(textSpan);
+
+    const sourcesDiv = document.createElement('div');
+    sourcesDiv.className = 'sources';
+    sourcesDiv.style.display = 'none';
+    messageDiv.appendChild(sourcesDiv);
+
+    chatMessages.appendChild(messageDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+
+    let text = '';
+    return {
+        append: function(token) {
+            text += token;
+            textSpan.textContent = text;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        },
+        finish: function(fullText) {
+            text = fullText || text;
+            textSpan.textContent = text;
+        },
+        setSources: function(sources) {
+            if (sources.length > 0) {
+                sourcesDiv.textContent = `📁 Sources: ${sources.join(', ')}`;
+                sourcesDiv.style.display = 'block';
+            }
+        },
+        remove: function() {
+            messageDiv.remove();
+        }
+    };
+}
+
+// Read a text/event-stream response and call onEvent(event, data) per message
+async function readServerSentEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            }
+            if (data) {
+                onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+}
+
 // Initialize voice commands
 setupVoiceCommands();
\ No newline at end of file
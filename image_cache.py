@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def file_sha256(path: str, block_size: int = 1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """LRU of normalized vision inputs, keyed on the hash of the original image.
+
+    Each entry holds the resized JPEG bytes and their base64 form, so an
+    image seen before goes to the vision model without touching PIL. The
+    cache is bounded by the total size of what it stores, not entry count,
+    since one photo can be many times the size of another. The hash of each
+    normalized JPEG is kept as an alias, so passing an already normalized
+    image through again is also a hit.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # content hash -> (jpeg_bytes, base64_str)
+        self._aliases = {}  # hash of the normalized JPEG -> content hash
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(entry):
+        return len(entry[0]) + len(entry[1])
+
+    def get(self, key: str):
+        """Return (jpeg_bytes, base64_str) or None"""
+        with self._lock:
+            key = self._aliases.get(key, key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, jpeg_bytes: bytes, base64_str: str):
+        entry = (jpeg_bytes, base64_str)
+        size = self._size(entry)
+        if size > self.max_bytes:
+            return
+        alias = hashlib.sha256(jpeg_bytes).hexdigest()
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= self._size(previous)
+            self._entries[key] = entry
+            self._aliases[alias] = key
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._aliases.pop(hashlib.sha256(evicted[0]).hexdigest(), None)
+                self.total_bytes -= self._size(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from file_processor import FileProcessor, disable_pdf_pool
+from embedding_store import EmbeddingStore, content_hash, embed_with_store
+
+# Per-process state, filled once by _init_worker in each worker process
+_worker = {}
+
+
+def _init_worker(model_name: str, store_path: str, store_max_entries: int):
+    """Load the parsers, the embedder and the OCR reader once per worker process"""
+    from sentence_transformers import SentenceTransformer
+
+    # Parallelism comes from running one file per worker, not pools inside them
+    disable_pdf_pool()
+    _worker['processor'] = FileProcessor()
+    _worker['embedder'] = SentenceTransformer(model_name)
+    _worker['store'] = EmbeddingStore(store_path, model_name, store_max_entries)
+    if os.getenv('OCR_PRELOAD', 'true').lower() == 'true':
+        import ocr_engine
+
+        ocr_engine.warm_up()
+    print(f"👷 Ingestion worker {os.getpid()} ready")
+
+
+def extract_and_embed(file_path: str, filename: str):
+    """Runs in a worker: parse, chunk and embed one file.
+
+    Returns the chunks (dicts with 'text' and, for PDFs, page numbers) and
+    their embeddings, plus a little information for the processing log.
+    Upserting stays with the parent process, which owns the vector index.
+    """
+    start_time = time.time()
+    processor = _worker['processor']
+    text_length, preview, chunks = processor.extract_chunks(file_path, filename)
+
+    embeddings = []
+    computed = 0
+    if chunks:
+        texts = [chunk['text'] for chunk in chunks]
+        embeddings, computed = embed_with_store(
+            texts, [content_hash(text) for text in texts], _worker['store'], _worker['embedder'].encode
+        )
+
+    return {
+        'text_length': text_length,
+        'preview': preview,
+        'chunks': chunks,
+        'embeddings': embeddings,
+        'embedded': computed,
+        'worker_pid': os.getpid(),
+        'seconds': time.time() - start_time,
+    }
+
+
+class IngestionPool:
+    """Dedicated worker processes for parsing, OCR and embedding uploads.
+
+    Jobs queue in the executor and run on ``workers`` separate processes, so
+    heavy uploads use other cores instead of competing with chat traffic for
+    the API process's GIL. Workers are spawned (not forked) and load their
+    models on first use.
+
+    If a worker dies (killed for memory, failed initializer) the executor
+    is broken for good, so it is replaced with a fresh one and the job is
+    tried once more there. A job that breaks the new pool too raises
+    BrokenProcessPool; a file that kills its worker is not worth a third.
+    """
+
+    def __init__(self, workers: int, model_name: str, store_path: str, store_max_entries: int):
+        self.workers = workers
+        self._initargs = (model_name, store_path, store_max_entries)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+
+    def _restart(self, broken):
+        """Swap in a new executor, unless another job already replaced this one"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            print("♻️ Ingestion worker pool broke, starting a new one")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self.restarts += 1
+
+    def _run(self, file_path: str, filename: str, attempts: int = 2):
+        for attempt in range(attempts):
+            with self._lock:
+                executor = self._executor
+            try:
+                return executor.submit(extract_and_embed, file_path, filename).result()
+            except BrokenProcessPool:
+                self._restart(executor)
+                if attempt + 1 == attempts:
+                    raise
+                print(f"🔁 Retrying {filename} on the new ingestion workers")
+
+    def process(self, file_path: str, filename: str):
+        """Blocking: run extract_and_embed on a worker and return its result"""
+        with self._lock:
+            self.pending += 1
+        try:
+            result = self._run(file_path, filename)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+        with self._lock:
+            self.completed += 1
+            self.total_seconds += result['seconds']
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self.pending,
+                'completed': self.completed,
+                'failed': self.failed,
+                'restarts': self.restarts,
+                'avg_seconds': round(self.total_seconds / self.completed, 2) if self.completed else 0.0,
+            }
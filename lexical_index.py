@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+from metadata_filter import matches_filter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+# Function words and question phrasing; they match nearly every chunk and
+# would otherwise let any question pull in unrelated text
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+of off on once only or other our ours ourselves out over own please same she should so some such tell than
+that the their theirs them themselves then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+
+def tokenize(text: str):
+    """Lowercase word tokens that keep part numbers like 'ab-1234' intact.
+
+    Compound tokens also emit their pieces so 'ab-1234' still matches a query
+    for '1234'. Stopwords are dropped.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token not in STOPWORDS:
+            tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", token) if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Incremental BM25 inverted index persisted as an append-only jsonl log"""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self.postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self.doc_lengths = {}
+        self.doc_terms = {}
+        self.metadata = {}
+        self.total_length = 0
+
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._add(record['id'], record['metadata'])
+        print(f"✅ Lexical index loaded ({len(self.doc_lengths)} chunks)")
+
+    def _remove(self, doc_id: str):
+        for term in self.doc_terms.pop(doc_id, ()):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+        self.metadata.pop(doc_id, None)
+
+    def _add(self, doc_id: str, metadata: dict):
+        if doc_id in self.doc_lengths:
+            self._remove(doc_id)
+        counts = Counter(tokenize(metadata.get('text', '')))
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = list(counts)
+        self.metadata[doc_id] = metadata
+        self.total_length += length
+
+    def add_documents(self, documents: list):
+        """Index [(doc_id, metadata)] pairs; metadata['text'] is what gets indexed"""
+        if not documents:
+            return
+        with self._lock:
+            for doc_id, metadata in documents:
+                self._add(doc_id, metadata)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for doc_id, metadata in documents:
+                    f.write(json.dumps({'id': doc_id, 'metadata': metadata}) + "\n")
+
+    def search(self, query: str, top_k: int = 20, filter: dict = None):
+        """Return Pinecone-shaped matches ranked by BM25 score.
+
+        Each match also has 'coverage': the fraction of the query's distinct
+        terms that appear in the chunk.
+        """
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            query_terms = set(tokenize(query))
+            if n_docs == 0 or not query_terms:
+                return []
+            avg_length = self.total_length / n_docs or 1.0
+
+            scores = defaultdict(float)
+            matched_terms = defaultdict(int)
+            for term in query_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if filter and not matches_filter(self.metadata[doc_id], filter):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched_terms[doc_id] += 1
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [
+                {'id': doc_id, 'score': score, 'coverage': matched_terms[doc_id] / len(query_terms),
+                 'metadata': self.metadata[doc_id]}
+                for doc_id, score in ranked
+            ]
+
+    def stats(self):
+        return {'chunks': len(self.doc_lengths), 'terms': len(self.postings)}
+
+
+def reciprocal_rank_fusion(ranked_lists: dict, k: int = 60):
+    """Fuse {name: ranked matches} with RRF; each match needs 'id' and 'metadata'.
+
+    The fused 'score' is the RRF score; the original score from each list is
+    kept as '<name>_score' (None when that list didn't return the match).
+    """
+    fused = {}
+    for name, matches in ranked_lists.items():
+        for rank, match in enumerate(matches):
+            entry = fused.get(match['id'])
+            if entry is None:
+                entry = {'id': match['id'], 'score': 0.0, 'metadata': match['metadata']}
+                for other in ranked_lists:
+                    entry[f'{other}_score'] = None
+                fused[match['id']] = entry
+            entry['score'] += 1.0 / (k + rank + 1)
+            entry[f'{name}_score'] = match.get('score', 0)
+    return sorted(fused.values(), key=lambda entry: entry['score'], reverse=True)
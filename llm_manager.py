@@ -2,9 +2,80 @@
 import requests
 import json
 import base64
-from PIL import Image
 import io
+import os
 import time
+import threading
+import socket
+import hashlib
+from ollama_client import OllamaClient
+from image_cache import ImageCache, file_sha256
+from circuit_breaker import CircuitBreaker
+from extractive_answer import ExtractiveAnswerer
+from context_builder import TokenCounter, pack_context, source_label, NO_CONTEXT
+
+CHAT_SYSTEM_PROMPT = """You are an AI assistant that provides direct, factual answers based ONLY on the document context given in this conversation.
+
+INSTRUCTIONS:
+- Provide a direct, concise answer to the question
+- Use ONLY information from the context provided
+- Do not add any extra information, explanations, or examples
+- If the answer requires specific numbers or facts, include them precisely
+- Maximum 2-3 sentences
+- Do not reference the context itself in your answer
+- Do not say "based on the context" or similar phrases
+
+If the context doesn't contain the answer, respond with: "The available documents don't contain information about this specific question.\""""
+
+class CancelToken(threading.Event):
+    """A cancel event that also runs callbacks when it is set.
+
+    stream_response registers the close of its Ollama response, so
+    cancelling from another thread frees the scheduler slot and the pooled
+    connection at once, even while Ollama is still evaluating the prompt.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_cancel(self, callback):
+        """Run callback when cancelled (right away if already cancelled)"""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cancel callback failed: {str(e)}")
+
+
+def abort_response(response):
+    """Close a streaming response from another thread.
+
+    close() alone doesn't wake a thread blocked reading the socket, so the
+    socket is shut down first.
+    """
+    try:
+        sock = getattr(response.raw._connection, 'sock', None)
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except Exception:
+        pass
+    response.close()
+
+
+# Normalized vision inputs, shared by every caller of image_to_base64
+vision_image_cache = ImageCache(max_bytes=int(float(os.getenv('VISION_CACHE_MAX_MB', '64')) * 1024 * 1024))
 
 class LLMManager:
     def __init__(self):
@@ -13,9 +84,41 @@ class LLMManager:
         self.vision_model = "llava:7b"
         self.fallback_mode = False
         self.available_models = []
+        # Prompt window and the part of it kept free for the answer
+        self.num_ctx = int(os.getenv('LLM_NUM_CTX', '1024'))
+        self.answer_tokens = int(os.getenv('LLM_ANSWER_TOKENS', '256'))
+        self.token_counter = TokenCounter(
+            default_chars_per_token=float(os.getenv('LLM_CHARS_PER_TOKEN', '3.0'))
+        )
+        # Keeping the model loaded lets Ollama reuse the KV cache of a session's shared prefix
+        self.keep_alive = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+        # Follow-up turns forget old turns rather than go below this much room for new context
+        self.min_context_tokens = int(os.getenv('LLM_MIN_CONTEXT_TOKENS', '200'))
+        # Images sent inline to /multimodal-chat go to the vision model as sent, unless this
+        # is on: then they are resized to 1024px JPEG (and cached) like uploaded image files
+        self.normalize_inline_images = os.getenv('VISION_NORMALIZE_INLINE_IMAGES', 'false').lower() == 'true'
+        # Sentence-level extractive answers; set once the embedder is loaded
+        self.extractive = None
+        # One pooled keep-alive client shared by every Ollama call
+        self.client = OllamaClient(
+            self.ollama_base_url,
+            max_connections=int(os.getenv('OLLAMA_MAX_CONNECTIONS', '8')),
+            connect_timeout=float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '5'))
+        )
+        # Generation calls fail fast to extraction while Ollama is down
+        self.breaker = CircuitBreaker(
+            "Ollama",
+            failure_threshold=int(os.getenv('OLLAMA_BREAKER_FAILURES', '3')),
+            reset_timeout=float(os.getenv('OLLAMA_BREAKER_RESET', '30'))
+        )
+        self.health_interval = float(os.getenv('OLLAMA_HEALTH_INTERVAL', '15'))
+        self.last_health_check = None
+        self._stop_health_probe = threading.Event()
+        self._health_thread = None
         
         print("🔄 Initializing LLM Manager...")
         self._initialize_ollama()
+        self.start_health_probe()
     
     def _initialize_ollama(self):
         """Initialize Ollama with retry logic"""
@@ -25,7 +128,7 @@ class LLMManager:
         for attempt in range(max_retries):
             try:
                 print(f"🔄 Connecting to Ollama... (Attempt {attempt + 1}/{max_retries})")
-                response = requests.get(f"{self.ollama_base_url}/api/tags", timeout=10)
+                response = self.client.get("/api/tags", timeout=10)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -57,6 +160,102 @@ class LLMManager:
         print("🚨 Switching to fallback mode (no Ollama)")
         self.fallback_mode = True
     
+    def start_health_probe(self):
+        """Re-check Ollama in the background so fallback mode follows its real state"""
+        if self.health_interval <= 0 or self._health_thread is not None:
+            return
+        self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_probe(self):
+        self._stop_health_probe.set()
+
+    def _health_loop(self):
+        while not self._stop_health_probe.wait(self.health_interval):
+            self.check_health()
+
+    def check_health(self):
+        """Refresh available_models from /api/tags and switch fallback mode on or off"""
+        self.last_health_check = time.time()
+        try:
+            response = self.client.get("/api/tags", timeout=3)
+            response.raise_for_status()
+            models = [model['name'] for model in response.json().get('models', [])]
+        except Exception as e:
+            if not self.fallback_mode:
+                print(f"🚨 Ollama health check failed ({e}), switching to fallback mode")
+            self.fallback_mode = True
+            self.breaker.trip()
+            return False
+
+        if models != self.available_models:
+            print(f"🔄 Ollama models changed: {models}")
+            self.available_models = models
+            if models:
+                self._select_available_models()
+
+        if not models:
+            if not self.fallback_mode:
+                print("⚠️  Ollama has no models, switching to fallback mode")
+            self.fallback_mode = True
+            return False
+
+        if self.fallback_mode:
+            print("✅ Ollama is back, leaving fallback mode")
+            self.fallback_mode = False
+        return True
+
+    def health_stats(self):
+        return {
+            'fallback_mode': self.fallback_mode,
+            'available_models': self.available_models,
+            'text_model': self.text_model,
+            'vision_model': self.vision_model,
+            'last_health_check': self.last_health_check,
+            'health_interval': self.health_interval,
+            'circuit': self.breaker.stats(),
+        }
+
+    def _ollama_post(self, path: str, payload: dict, timeout: float, stream: bool = False):
+        """POST to Ollama through the circuit breaker.
+
+        Raises CircuitOpenError without touching the network while the circuit
+        is open. Connection errors, timeouts and 5xx answers count as failures.
+        """
+        self.breaker.before_call()
+        try:
+            response = self.client.post(path, json=payload, timeout=timeout, stream=stream)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def alist_models(self):
+        """List installed models through the async pooled client"""
+        response = await self.client.aget("/api/tags", timeout=10)
+        response.raise_for_status()
+        return [model['name'] for model in response.json().get('models', [])]
+    
+    def warm_up(self):
+        """Ask Ollama to load the text model now instead of on the first chat"""
+        if self.fallback_mode:
+            return
+        try:
+            start_time = time.time()
+            # An empty prompt just loads the model into memory
+            self._ollama_post(
+                "/api/generate",
+                {"model": self.text_model, "prompt": "", "keep_alive": self.keep_alive},
+                timeout=120
+            )
+            print(f"🔥 {self.text_model} loaded in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            print(f"⚠️  Model warm-up failed: {e}")
+    
     # def _select_available_models(self):
     #     """Automatically select the best available models"""
     #     # Priority list for text models
@@ -130,34 +329,230 @@ class LLMManager:
         
     #     # Use text model
     #     return self._process_text_only(user_question, context)
-    def generate_response(self, user_question: str, context: str = "", images: list = None):
-        """Generate response with image question handling"""
+    def generate_response(self, user_question: str, context: str = "", images: list = None,
+                          session=None, chunk_ids: list = None, cancel: threading.Event = None,
+                          trace: dict = None):
+        """Generate response with image question handling.
+
+        With a session (and no images) the answer comes from Ollama's chat
+        API, replaying the session's earlier turns. With a cancel event, text
+        answers are streamed internally so setting the event stops Ollama
+        mid-generation. If given, trace['answered_by'] is set to 'llm' or
+        'extractive'.
+        """
+        if cancel is not None and not images:
+            return "".join(self.stream_response(
+                user_question, context, session=session, chunk_ids=chunk_ids, cancel=cancel, trace=trace
+            )).strip()
     
         print(f"\n🎯 User question: {user_question}")
         print(f"📄 Context length: {len(context) if context else 0}")
     
-        # Check if this is an image-related question
-        image_keywords = [
-            'image', 'picture', 'photo', 'screenshot', 'chart', 'graph',
-            'what is this', 'what does this show', 'describe this',
-            'what contain', 'what about', 'what text', 'what written'
-        ]
-        is_image_question = any(keyword in user_question.lower() for keyword in image_keywords)
+        is_image_question = self._is_image_question(user_question)
+        has_history = session is not None and bool(session.turns)
+        full_context = self._session_context(session, context)
+        trace = trace if trace is not None else {}
+        trace['answered_by'] = 'extractive'
     
         # Use fallback if no context
-        if self.fallback_mode or not context or context == "No relevant documents found.":
-            return self._extract_from_context(user_question, context)
+        if self.fallback_mode or (not has_history and (not context or context == NO_CONTEXT)):
+            return self._extract_from_context(user_question, full_context)
     
         # SPECIAL: For image questions, return full extracted text directly
         if is_image_question:
             print("🖼️ Image question detected - returning full extracted text")
-            return self._handle_image_question(context)
+            return self._handle_image_question(full_context)
     
          # Normal processing for other questions
         if images:
-            return self._process_with_vision(user_question, images, context)
+            return self._process_with_vision(user_question, images, context, trace=trace)
+    
+        if session is not None:
+            return self._process_chat(session, user_question, context, chunk_ids, trace=trace)
     
-        return self._process_text_only(user_question, context)
+        return self._process_text_only(user_question, context, trace=trace)
+
+    def extract_answer(self, user_question: str, context: str = "", session=None):
+        """The extractive answer for a question, without calling Ollama"""
+        return self._extract_from_context(user_question, self._session_context(session, context))
+
+    def context_budget(self, user_question: str):
+        """Tokens left for document context once the prompt and answer are accounted for"""
+        overhead = self.token_counter.count(self._format_text_prompt(user_question, "-"), self.text_model)
+        return max(0, self.num_ctx - self.answer_tokens - overhead)
+
+    def build_context(self, user_question: str, matches: list, session=None):
+        """Pack ranked search matches into the context window of the text model.
+
+        With a session, chunks the conversation already carries are not sent
+        again, and the budget is what's left after the replayed history.
+        Returns (context, sources, chunk_ids of the packed chunks).
+        """
+        if session is None:
+            budget = self.context_budget(user_question)
+            fresh = matches
+            known_sources = []
+        else:
+            budget, fresh = self._session_budget(session, user_question, matches)
+            known_sources = [source_label(m['metadata']) for m in matches if m not in fresh]
+
+        context, sources, stats = pack_context(fresh, budget, self.token_counter, self.text_model)
+        print(f"🧮 Context: {stats['context_tokens']}/{budget} tokens, "
+              f"{stats['chunks_included']}/{stats['chunks_retrieved']} chunks in {stats['passages']} passages"
+              f"{' (last one truncated)' if stats['truncated'] else ''}")
+        if known_sources:
+            print(f"♻️  {len(known_sources)} chunks already in the conversation")
+            sources = list(dict.fromkeys(sources + known_sources))
+        if not stats['passages'] and session is not None and session.turns:
+            context = ""
+        return context, sources, stats['chunk_ids']
+
+    def _session_budget(self, session, user_question: str, matches: list):
+        """Context budget for the next turn of a session, trimming old turns if needed"""
+        fixed = (
+            self.num_ctx - self.answer_tokens
+            - self.token_counter.count(CHAT_SYSTEM_PROMPT, self.text_model)
+            - self.token_counter.count(self._format_chat_turn(user_question, "-"), self.text_model)
+        )
+        known = session.chunk_ids()
+        needs_context = any(m['id'] not in known for m in matches)
+        dropped = session.trim(max(0, fixed - (self.min_context_tokens if needs_context else 0)))
+        if dropped:
+            print(f"✂️  Dropped {dropped} old turns from session {session.session_id}")
+            known = session.chunk_ids()
+        fresh = [m for m in matches if m['id'] not in known]
+        return max(0, fixed - session.history_tokens()), fresh
+
+    def record_turn(self, session, user_question: str, context: str, answer: str, chunk_ids: list,
+                    answer_tokens: int = None):
+        """Add a finished exchange to the history replayed on the session's next turn"""
+        prompt = self._format_chat_turn(user_question, context)
+        tokens = self.token_counter.count(prompt, self.text_model) + (
+            answer_tokens or self.token_counter.count(answer, self.text_model)
+        )
+        session.add_turn(user_question, prompt, context, answer, chunk_ids, tokens)
+
+    @staticmethod
+    def _session_context(session, context: str):
+        """Everything the model has been shown in this session plus the new context"""
+        if session is None:
+            return context
+        parts = [session.context_text(), context if context != NO_CONTEXT else ""]
+        return "\n---\n".join(part for part in parts if part) or context
+
+    @staticmethod
+    def _is_image_question(user_question: str):
+        """Check if this is an image-related question"""
+        image_keywords = [
+            'image', 'picture', 'photo', 'screenshot', 'chart', 'graph',
+            'what is this', 'what does this show', 'describe this',
+            'what contain', 'what about', 'what text', 'what written'
+        ]
+        return any(keyword in user_question.lower() for keyword in image_keywords)
+
+    def stream_response(self, user_question: str, context: str = "", session=None, chunk_ids: list = None,
+                        cancel: threading.Event = None, trace: dict = None):
+        """Yield the answer piece by piece as Ollama generates it.
+
+        Fallback and image-question answers are produced in one go, so they
+        come out as a single piece. With a session the chat API is used and
+        the finished exchange is added to the session. Setting ``cancel``
+        closes the Ollama stream and records nothing; a CancelToken closes
+        it immediately, a plain Event at the next token. trace['answered_by']
+        is 'llm' only for a stream Ollama finished; one that broke off after
+        some tokens is 'llm_partial'.
+        """
+        print(f"\n🎯 User question (streaming): {user_question}")
+        print(f"📄 Context length: {len(context) if context else 0}")
+
+        has_history = session is not None and bool(session.turns)
+        full_context = self._session_context(session, context)
+        trace = trace if trace is not None else {}
+        trace['answered_by'] = 'extractive'
+
+        if self.fallback_mode or (not has_history and (not context or context == NO_CONTEXT)):
+            yield self._extract_from_context(user_question, full_context)
+            return
+
+        if self._is_image_question(user_question):
+            print("🖼️ Image question detected - returning full extracted text")
+            yield self._handle_image_question(full_context)
+            return
+
+        produced = False
+        pieces = []
+        final_chunk = {}
+        try:
+            if session is not None:
+                prompt = self._format_chat_turn(user_question, context)
+                path = "/api/chat"
+                payload = self._chat_payload(session, prompt, stream=True)
+            else:
+                prompt = self._format_text_prompt(user_question, context)
+                path = "/api/generate"
+                payload = self._text_payload(prompt, stream=True)
+
+            print(f"🔄 Streaming from Ollama with {self.text_model}...")
+            start_time = time.time()
+            first_token_time = None
+
+            if cancel is not None and cancel.is_set():
+                return
+            with self._ollama_post(path, payload, timeout=120, stream=True) as response:
+                if hasattr(cancel, 'on_cancel'):
+                    cancel.on_cancel(lambda: abort_response(response))
+                if response.status_code != 200:
+                    raise Exception(f"Ollama API returned {response.status_code}: {response.text}")
+
+                # Ollama streams one JSON object per line
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise Exception(chunk["error"])
+                    token = chunk["message"].get("content", "") if "message" in chunk else chunk.get("response", "")
+                    if token:
+                        if first_token_time is None:
+                            first_token_time = time.time()
+                            print(f"⚡ First token after {first_token_time - start_time:.2f}s")
+                        if cancel is not None and cancel.is_set():
+                            print("⏹️  Generation cancelled, closing the Ollama stream")
+                            return
+                        produced = True
+                        trace['answered_by'] = 'llm_partial'
+                        pieces.append(token)
+                        yield token
+                    if chunk.get("done"):
+                        final_chunk = chunk
+                        break
+
+            print(f"⏱️  Ollama stream finished in {time.time() - start_time:.2f}s")
+            if cancel is not None and cancel.is_set():
+                return
+            if not produced:
+                raise ValueError("Empty response from Ollama")
+            if not final_chunk.get("done"):
+                raise ValueError("Ollama stream ended before it was done")
+            trace['answered_by'] = 'llm'
+
+            if session is None:
+                self.token_counter.observe(
+                    self.text_model, prompt, final_chunk.get("prompt_eval_count"), self.num_ctx
+                )
+            else:
+                self._finish_chat_turn(session, user_question, context, chunk_ids,
+                                       "".join(pieces).strip(), final_chunk)
+
+        except Exception as e:
+            if cancel is not None and cancel.is_set():
+                print("⏹️  Generation cancelled, Ollama stream closed")
+                return
+            print(f"🔄 Ollama stream failed: {e}")
+            # Only fall back if the user hasn't already seen part of an answer
+            if not produced:
+                print("🔄 Switching to content extraction...")
+                yield self._extract_from_context(user_question, full_context)
 
     def _handle_image_question(self, context: str):
         """Return full extracted text from images"""
@@ -224,9 +619,8 @@ class LLMManager:
     #         print(f"🔄 Ollama failed: {e}")
     #         print("🔄 Switching to content extraction...")
     #         return self._extract_from_context(user_question, context)
-    def _process_text_only(self, user_question: str, context: str):
+    def _process_text_only(self, user_question: str, context: str, trace: dict = None):
         try:
-            url = f"{self.ollama_base_url}/api/generate"
             prompt = self._format_text_prompt(user_question, context)
         
             # DEBUG: Show the prompt being sent
@@ -235,23 +629,12 @@ class LLMManager:
             print(prompt[:500] + "..." if len(prompt) > 500 else prompt)
             print(f"--- PROMPT END ---")
         
-            # NEW PAYLOAD WITH CPU-ONLY SETTINGS
-            payload = {
-                "model": self.text_model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,
-                    "num_gpu": 0,           # ← FORCE CPU ONLY
-                    "num_ctx": 1024,        # ← REDUCE CONTEXT SIZE
-                    "num_thread": 2         # ← LIMIT THREADS
-                }
-            }
+            payload = self._text_payload(prompt, stream=False)
         
             print(f"🔄 Calling Ollama with {self.text_model}...")
             start_time = time.time()
         
-            response = requests.post(url, json=payload, timeout=120)
+            response = self._ollama_post("/api/generate", payload, timeout=120)
         
             elapsed_time = time.time() - start_time
             print(f"⏱️  Ollama response time: {elapsed_time:.2f}s")
@@ -259,9 +642,14 @@ class LLMManager:
             if response.status_code == 200:
                 result = response.json()
                 response_text = result.get("response", "").strip()
+                self.token_counter.observe(
+                    self.text_model, prompt, result.get("prompt_eval_count"), self.num_ctx
+                )
             
                 if response_text and len(response_text) > 10:
                     print("✅ Ollama response successful!")
+                    if trace is not None:
+                        trace['answered_by'] = 'llm'
                     return response_text
                 else:
                     print("⚠️  Ollama returned empty or short response")
@@ -277,14 +665,85 @@ class LLMManager:
             print("🔄 Switching to content extraction...")
             return self._extract_from_context(user_question, context)
     
-    def _process_with_vision(self, user_question: str, images: list, context: str = ""):
+    def _process_chat(self, session, user_question: str, context: str, chunk_ids: list = None,
+                      trace: dict = None):
+        """Answer the next turn of a session through Ollama's chat API"""
+        try:
+            payload = self._chat_payload(session, self._format_chat_turn(user_question, context), stream=False)
+
+            print(f"🔄 Calling Ollama chat with {self.text_model} ({len(session.turns)} earlier turns)...")
+            start_time = time.time()
+
+            response = self._ollama_post("/api/chat", payload, timeout=120)
+
+            elapsed_time = time.time() - start_time
+            print(f"⏱️  Ollama response time: {elapsed_time:.2f}s")
+
+            if response.status_code != 200:
+                raise Exception(f"Ollama API returned {response.status_code}: {response.text}")
+
+            result = response.json()
+            response_text = result.get("message", {}).get("content", "").strip()
+            if not response_text or len(response_text) <= 10:
+                print("⚠️  Ollama returned empty or short response")
+                raise ValueError("Empty response from Ollama")
+
+            print("✅ Ollama response successful!")
+            self._finish_chat_turn(session, user_question, context, chunk_ids, response_text, result)
+            if trace is not None:
+                trace['answered_by'] = 'llm'
+            return response_text
+
+        except Exception as e:
+            print(f"🔄 Ollama failed: {e}")
+            print("🔄 Switching to content extraction...")
+            return self._extract_from_context(user_question, self._session_context(session, context))
+
+    def _finish_chat_turn(self, session, user_question: str, context: str, chunk_ids: list,
+                          answer: str, result: dict):
+        if not session.turns:
+            # Later turns only evaluate the new suffix, so their counts say nothing about length
+            messages = self._chat_payload(session, self._format_chat_turn(user_question, context), False)['messages']
+            self.token_counter.observe(
+                self.text_model, "".join(m['content'] for m in messages),
+                result.get("prompt_eval_count"), self.num_ctx
+            )
+        prompt_ms = (result.get("prompt_eval_duration") or 0) / 1e6
+        print(f"🧠 Turn {len(session.turns) + 1}: {result.get('prompt_eval_count', '?')} prompt tokens "
+              f"evaluated in {prompt_ms:.0f}ms")
+        self.record_turn(session, user_question, context, answer, chunk_ids, result.get("eval_count"))
+
+    def _chat_payload(self, session, turn_prompt: str, stream: bool):
+        payload = self._text_payload(turn_prompt, stream)
+        del payload["prompt"]
+        payload["messages"] = session.messages(CHAT_SYSTEM_PROMPT) + [{"role": "user", "content": turn_prompt}]
+        return payload
+
+    def _text_payload(self, prompt: str, stream: bool):
+        # NEW PAYLOAD WITH CPU-ONLY SETTINGS
+        return {
+            "model": self.text_model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.1,
+                "num_gpu": 0,           # ← FORCE CPU ONLY
+                "num_ctx": self.num_ctx,        # ← REDUCE CONTEXT SIZE
+                "num_predict": self.answer_tokens,  # ← context builder leaves this much room
+                "num_thread": 2         # ← LIMIT THREADS
+            }
+        }
+    
+    def _process_with_vision(self, user_question: str, images: list, context: str = "", trace: dict = None):
         """Process vision queries with better error handling"""
         try:
             if self.vision_model not in self.available_models:
                 raise Exception(f"Vision model {self.vision_model} not available")
             
-            url = f"{self.ollama_base_url}/api/generate"
             full_prompt = self._format_vision_prompt(user_question, context)
+            if self.normalize_inline_images:
+                images = [self.normalize_base64_image(image) for image in images]
             
             payload = {
                 "model": self.vision_model,
@@ -294,7 +753,7 @@ class LLMManager:
             }
             
             print(f"👁️  Calling vision model {self.vision_model}...")
-            response = requests.post(url, json=payload, timeout=180)
+            response = self._ollama_post("/api/generate", payload, timeout=180)
             
             if response.status_code == 200:
                 result = response.json()
@@ -302,6 +761,8 @@ class LLMManager:
                 
                 if vision_response:
                     print("✅ Vision analysis successful!")
+                    if trace is not None:
+                        trace['answered_by'] = 'llm'
                     return vision_response
                 else:
                     raise ValueError("Empty response from vision model")
@@ -341,6 +802,16 @@ ANSWER:"""
 
 Please provide a helpful and accurate answer:"""
     
+    @staticmethod
+    def _format_chat_turn(user_question: str, context: str):
+        """User message for one session turn; documents already sent are not repeated"""
+        if context and context != NO_CONTEXT:
+            return f"""CONTEXT INFORMATION:
+{context}
+
+USER QUESTION: {user_question}"""
+        return user_question
+    
     def _format_vision_prompt(self, user_question: str, context: str):
         """Format prompt for vision models"""
         base_prompt = f"""Please analyze the provided image(s) and answer the user's question.
@@ -359,49 +830,102 @@ Please provide a clear analysis of what you see in the images:"""
         
         return base_prompt
     
+    def set_sentence_encoder(self, encode):
+        """Use the shared sentence embedder for extractive answers"""
+        self.extractive = ExtractiveAnswerer(
+            encode,
+            top_n=int(os.getenv('EXTRACTIVE_TOP_SENTENCES', '3')),
+            min_score=float(os.getenv('EXTRACTIVE_MIN_SCORE', '0.25'))
+        )
+
     def _extract_from_context(self, user_question: str, context: str):
-        """Improved fallback content extraction"""
-        if not context or context == "No relevant documents found.":
+        """Fallback answer: the context sentences closest to the question"""
+        if not context or context == NO_CONTEXT:
             return "I don't have enough information in the uploaded documents to answer this question. Please upload relevant documents or ask about the content that has been uploaded."
         
-        # Simple keyword-based extraction
-        question_lower = user_question.lower()
-        relevant_info = []
+        relevant_info = None
+        if self.extractive is not None:
+            try:
+                start_time = time.time()
+                relevant_info = [sentence for sentence, _ in self.extractive.best_sentences(user_question, context)]
+                print(f"🔎 Extractive answer from {len(relevant_info)} sentences in {time.time() - start_time:.2f}s")
+            except Exception as e:
+                print(f"⚠️  Sentence scoring failed, using keyword match: {e}")
+        if relevant_info is None:
+            relevant_info = self._keyword_lines(user_question, context)
         
-        # Look for lines that might be relevant
+        if relevant_info:
+            response = "Based on the available documents, here's relevant information:\n" + "\n".join(relevant_info[:3])
+            return response[:800]  # Limit response length
+        else:
+            return "I found documents, but they don't contain specific information about your question. The documents might cover different topics."
+    
+    @staticmethod
+    def _keyword_lines(user_question: str, context: str):
+        """Lines sharing a word with the question; used until the embedder is loaded"""
+        question_words = [word for word in user_question.lower().split() if len(word) > 3]
+        relevant_info = []
         for line in context.split('\n'):
             line = line.strip()
             if len(line) > 20:  # Only substantial lines
                 line_lower = line.lower()
-                # Check for keyword matches
-                question_words = [word for word in question_lower.split() if len(word) > 3]
-                matches = sum(1 for word in question_words if word in line_lower)
-                
-                if matches > 0:
+                if any(word in line_lower for word in question_words):
                     relevant_info.append(line)
-        
-        if relevant_info:
-            response = "Based on the available documents, here's relevant information:" + "\n".join(relevant_info[:3])
-            return response[:800]  # Limit response length
-        else:
-            return "I found documents, but they don't contain specific information about your question. The documents might cover different topics."
+                    if len(relevant_info) == 3:
+                        break
+        return relevant_info
     
+    @staticmethod
+    def _normalize_image(source):
+        """Resize to fit 1024px and re-encode as JPEG; returns (jpeg_bytes, base64_str)"""
+        from PIL import Image
+
+        with Image.open(source) as img:
+            if img.mode in ('RGBA', 'P'):
+                img = img.convert('RGB')
+            
+            max_size = (1024, 1024)
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+            
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=85)
+            jpeg_bytes = buffer.getvalue()
+            return jpeg_bytes, base64.b64encode(jpeg_bytes).decode('utf-8')
+
     @staticmethod
     def image_to_base64(image_path: str) -> str:
         """Convert image file to base64 string for Ollama"""
         try:
-            with Image.open(image_path) as img:
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                
-                max_size = (1024, 1024)
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                buffer = io.BytesIO()
-                img.save(buffer, format="JPEG", quality=85)
-                img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return img_str
+            key = file_sha256(image_path)
+            cached = vision_image_cache.get(key)
+            if cached is not None:
+                print("⚡ Vision cache hit, skipping image conversion")
+                return cached[1]
+
+            jpeg_bytes, img_str = LLMManager._normalize_image(image_path)
+            vision_image_cache.put(key, jpeg_bytes, img_str)
+            return img_str
                 
         except Exception as e:
             print(f"❌ Error converting image: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def normalize_base64_image(image_data: str) -> str:
+        """Apply the image_to_base64 normalization to an already base64-encoded image"""
+        try:
+            if image_data.startswith('data:'):
+                image_data = image_data.split(',', 1)[1]
+            raw = base64.b64decode(image_data)
+            key = hashlib.sha256(raw).hexdigest()
+            cached = vision_image_cache.get(key)
+            if cached is not None:
+                return cached[1]
+
+            jpeg_bytes, img_str = LLMManager._normalize_image(io.BytesIO(raw))
+            vision_image_cache.put(key, jpeg_bytes, img_str)
+            return img_str
+
+        except Exception as e:
+            print(f"⚠️  Could not normalize image, sending it as-is: {e}")
+            return image_data
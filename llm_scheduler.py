@@ -0,0 +1,115 @@
+import time
+import queue
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+
+class SchedulerFull(Exception):
+    """Raised when the generation queue is at capacity"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """Bounded priority queue in front of the LLM with a fixed number of workers.
+
+    At most ``max_in_flight`` generations run at once. Everything else waits
+    in a priority queue of at most ``max_queue`` jobs: interactive chat
+    (priority 0) is served before background work such as image analysis
+    (priority 10), FIFO within a priority. When the queue is full,
+    ``submit`` raises SchedulerFull with a Retry-After estimate instead of
+    letting requests pile up until they time out.
+    """
+
+    def __init__(self, max_in_flight: int = 2, max_queue: int = 16):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._in_flight = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_times = deque(maxlen=500)
+        self._service_times = deque(maxlen=100)
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"llm-worker-{i}", daemon=True)
+            for i in range(self.max_in_flight)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely to free up"""
+        avg_service = sum(self._service_times) / len(self._service_times) if self._service_times else 10.0
+        return max(1, int(avg_service * (self._pending + 1) / self.max_in_flight))
+
+    def submit(self, func, *args, priority: int = INTERACTIVE, **kwargs):
+        """Queue func(*args, **kwargs); returns a concurrent.futures.Future"""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerFull(self.retry_after())
+            self._pending += 1
+            self.submitted += 1
+        future = Future()
+        self._queue.put((priority, next(self._sequence), time.monotonic(), func, args, kwargs, future))
+        return future
+
+    def _run(self):
+        while True:
+            priority, _, enqueued_at, func, args, kwargs, future = self._queue.get()
+            with self._lock:
+                self._pending -= 1
+                self._in_flight += 1
+            self._wait_times.append(time.monotonic() - enqueued_at)
+
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self._in_flight -= 1
+                continue
+
+            start_time = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                self.failed += 1
+                future.set_exception(e)
+            else:
+                self.completed += 1
+                future.set_result(result)
+            finally:
+                self._service_times.append(time.monotonic() - start_time)
+                with self._lock:
+                    self._in_flight -= 1
+
+    def stats(self):
+        waits = sorted(self._wait_times)
+        services = list(self._service_times)
+        return {
+            'queue_depth': self._pending,
+            'in_flight': self._in_flight,
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'avg_wait_seconds': round(sum(waits) / len(waits), 3) if waits else 0.0,
+            'p95_wait_seconds': round(waits[int(len(waits) * 0.95) - 1], 3) if waits else 0.0,
+            'max_wait_seconds': round(waits[-1], 3) if waits else 0.0,
+            'avg_generation_seconds': round(sum(services) / len(services), 3) if services else 0.0,
+        }
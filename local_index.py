@@ -0,0 +1,507 @@
+import os
+import json
+import threading
+import numpy as np
+from metadata_filter import matches_filter, normalize_condition
+
+STORAGE_DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+# Metadata fields with a value -> rows index for filter push-down
+INDEXED_FIELDS = ('file_type', 'filename', 'doc_id')
+
+
+class LocalVectorIndex:
+    """In-process cosine index over a memory-mapped embedding matrix.
+
+    Vectors are L2-normalized on insert so cosine similarity is a plain dot
+    product. Search is exact (brute force) for small collections and switches
+    to an IVF (inverted file) approximate search once the index is large.
+    Everything is persisted under ``index_dir`` and reloaded on start.
+
+    ``storage`` picks how vectors are kept: float32, float16 (2x smaller) or
+    int8 scalar-quantized with a per-vector scale (4x smaller). With
+    ``rescore`` on, a float32 copy is also written to disk and only the top
+    candidates are read back from it to re-rank at full precision.
+    ``keep_full`` writes that copy without rescoring, as the exact
+    reference for measure_recall.
+
+    Pinecone-style metadata filters are evaluated before scoring: equality
+    and $in on file_type/filename/doc_id use an in-memory value -> rows
+    index, and upload-time ranges use a dense timestamp column.
+    """
+
+    def __init__(self, index_dir: str, dimension: int = 384, search_mode: str = "auto",
+                 ann_threshold: int = 20000, n_probe: int = 8, storage: str = "float32",
+                 rescore: bool = False, rescore_factor: int = 4, keep_full: bool = False):
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage mode: {storage} (expected one of {list(STORAGE_DTYPES)})")
+
+        self.index_dir = index_dir
+        self.dimension = dimension
+        self.search_mode = search_mode  # "exact", "approximate" or "auto"
+        self.ann_threshold = ann_threshold
+        self.n_probe = n_probe
+        self.storage = storage
+        self.rescore = rescore and storage != 'float32'
+        # Whether the float32 copy exists (always, when rescoring)
+        self.keep_full = (rescore or keep_full) and storage != 'float32'
+        self.rescore_factor = max(1, rescore_factor)
+
+        self._lock = threading.RLock()
+        self._metadata_path = os.path.join(index_dir, "metadata.jsonl")
+        self._state_path = os.path.join(index_dir, "state.json")
+        self._ivf_path = os.path.join(index_dir, "ivf.npz")
+
+        self.count = 0
+        self.ids = []
+        self.metadata = []
+        self._row_by_id = {}
+        self._vectors = None  # stored (possibly quantized) codes
+        self._scales = None   # per-vector scale, int8 storage only
+        self._full = None     # float32 copy for rescoring / recall measurement
+
+        # Metadata filter indexes
+        self._field_rows = {field: {} for field in INDEXED_FIELDS}
+        self._uploaded_at = np.full(1024, np.nan)
+
+        # IVF state
+        self._centroids = None
+        self._assignments = None
+        self._lists = []
+        self._list_arrays = {}
+        self._ivf_built_at = 0
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+        print(f"✅ Local vector index ready ({self.count} vectors, mode={self.search_mode}, storage={self.storage})")
+
+    # ------------------------------------------------------------------ storage
+
+    def _path(self, name: str):
+        return os.path.join(self.index_dir, f"{name}.npy")
+
+    def _matrix_specs(self):
+        """(name, dtype, row shape) of every memory-mapped array this index keeps"""
+        specs = [('vectors', STORAGE_DTYPES[self.storage], (self.dimension,))]
+        if self.storage == 'int8':
+            specs.append(('scales', np.float32, ()))
+        if self.keep_full:
+            specs.append(('full', np.float32, (self.dimension,)))
+        return specs
+
+    def _load(self):
+        """Reload vectors, metadata and IVF state from disk"""
+        if os.path.exists(self._state_path):
+            with open(self._state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.count = state.get('count', 0)
+            stored_as = state.get('storage', 'float32')
+            if self.count and stored_as != self.storage:
+                raise ValueError(
+                    f"Local index at {self.index_dir} is stored as {stored_as}, not {self.storage}; "
+                    f"rebuild it or set LOCAL_INDEX_STORAGE={stored_as}"
+                )
+            if self.count and self.keep_full and not state.get('full_copy', state.get('rescore', False)):
+                raise ValueError(f"Local index at {self.index_dir} has no full-precision copy to rescore from")
+
+        for name, dtype, row_shape in self._matrix_specs():
+            if os.path.exists(self._path(name)):
+                matrix = np.load(self._path(name), mmap_mode='r+')
+            else:
+                matrix = self._allocate(name, dtype, row_shape, 1024)
+            setattr(self, f"_{name}", matrix)
+
+        if os.path.exists(self._metadata_path):
+            with open(self._metadata_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    self._set_row_metadata(record['row'], record['id'], record['metadata'])
+        # Drop any rows whose metadata never made it to disk
+        self.count = min(self.count, len(self.ids))
+
+        if os.path.exists(self._ivf_path):
+            data = np.load(self._ivf_path)
+            self._centroids = data['centroids']
+            assignments = data['assignments'].tolist()
+            self._ivf_built_at = int(data['built_at'])
+            self._lists = [[] for _ in range(len(self._centroids))]
+            self._assignments = []
+            for row in range(self.count):
+                if row < len(assignments):
+                    centroid = assignments[row]
+                else:
+                    centroid = self._nearest_centroid(self._read(row, row + 1)[0])
+                self._assignments.append(centroid)
+                self._lists[centroid].append(row)
+
+    def _allocate(self, name: str, dtype, row_shape: tuple, capacity: int, previous=None):
+        """Create (or grow) one memory-mapped matrix"""
+        path = self._path(name)
+        tmp_path = path + ".tmp"
+        matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(capacity, *row_shape))
+        if previous is not None and self.count:
+            matrix[:self.count] = previous[:self.count]
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode='r+')
+
+    def _ensure_capacity(self, needed: int):
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, dtype, row_shape in self._matrix_specs():
+            previous = getattr(self, f"_{name}")
+            setattr(self, f"_{name}", None)
+            setattr(self, f"_{name}", self._allocate(name, dtype, row_shape, capacity, previous))
+            del previous
+
+    def _set_row_metadata(self, row: int, vector_id: str, metadata: dict):
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.metadata.append(None)
+        old_id = self.ids[row]
+        if old_id is not None and old_id != vector_id:
+            self._row_by_id.pop(old_id, None)
+        old_metadata = self.metadata[row]
+        self.ids[row] = vector_id
+        self.metadata[row] = metadata
+        self._row_by_id[vector_id] = row
+        self._index_metadata(row, old_metadata, metadata)
+
+    def _index_metadata(self, row: int, old_metadata: dict, metadata: dict):
+        for field in INDEXED_FIELDS:
+            if old_metadata is not None and field in old_metadata:
+                rows = self._field_rows[field].get(old_metadata[field])
+                if rows is not None:
+                    rows.discard(row)
+            if field in metadata:
+                self._field_rows[field].setdefault(metadata[field], set()).add(row)
+
+        if row >= len(self._uploaded_at):
+            grown = np.full(max(row + 1, 2 * len(self._uploaded_at)), np.nan)
+            grown[:len(self._uploaded_at)] = self._uploaded_at
+            self._uploaded_at = grown
+        uploaded_at = metadata.get('uploaded_at')
+        self._uploaded_at[row] = np.nan if uploaded_at is None else uploaded_at
+
+    def _filter_rows(self, flt: dict):
+        """Rows whose metadata satisfies a Pinecone-style filter, as a sorted array"""
+        mask = np.ones(self.count, dtype=bool)
+        for field, condition in flt.items():
+            condition = normalize_condition(condition) if not field.startswith('$') else condition
+            if field in self._field_rows and set(condition) <= {'$eq', '$in'}:
+                values = [condition['$eq']] if '$eq' in condition else list(condition['$in'])
+                field_mask = np.zeros(self.count, dtype=bool)
+                for value in values:
+                    rows = self._field_rows[field].get(value)
+                    if rows:
+                        field_mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+                mask &= field_mask
+            elif field == 'uploaded_at' and set(condition) <= {'$gt', '$gte', '$lt', '$lte'}:
+                column = self._uploaded_at[:self.count]
+                with np.errstate(invalid='ignore'):
+                    for op, bound in condition.items():
+                        if op == '$gt':
+                            mask &= column > bound
+                        elif op == '$gte':
+                            mask &= column >= bound
+                        elif op == '$lt':
+                            mask &= column < bound
+                        else:
+                            mask &= column <= bound
+            else:
+                # Fallback for operators/fields without an index: scan metadata
+                sub_filter = {field: condition}
+                mask &= np.fromiter(
+                    (matches_filter(md, sub_filter) for md in self.metadata[:self.count]),
+                    dtype=bool, count=self.count
+                )
+        return np.nonzero(mask)[0]
+
+    def _persist(self, records: list):
+        """Flush vectors and append metadata records (last write wins on reload)"""
+        for name, _, _ in self._matrix_specs():
+            getattr(self, f"_{name}").flush()
+        with open(self._metadata_path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        with open(self._state_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'count': self.count,
+                'dimension': self.dimension,
+                'storage': self.storage,
+                'rescore': self.rescore,
+                'full_copy': self.keep_full,
+            }, f)
+        if self._centroids is not None:
+            np.savez(
+                self._ivf_path,
+                centroids=self._centroids,
+                assignments=np.asarray(self._assignments, dtype=np.int32),
+                built_at=self._ivf_built_at,
+            )
+
+    # ------------------------------------------------------------------ quantization
+
+    def _write(self, row: int, vector):
+        """Store one normalized float32 vector in the configured format"""
+        if self.storage == 'int8':
+            scale = float(np.abs(vector).max()) / 127.0 or 1.0
+            self._vectors[row] = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+            self._scales[row] = scale
+        else:
+            self._vectors[row] = vector
+        if self.keep_full:
+            self._full[row] = vector
+
+    def _read(self, start: int, stop: int):
+        """Dequantize a contiguous block of rows back to float32"""
+        block = np.asarray(self._vectors[start:stop], dtype=np.float32)
+        if self.storage == 'int8':
+            block *= np.asarray(self._scales[start:stop])[:, None]
+        return block
+
+    def _read_rows(self, rows):
+        block = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self.storage == 'int8':
+            block *= np.asarray(self._scales[rows])[:, None]
+        return block
+
+    def _scores(self, query, rows=None, block_size: int = 65536):
+        """Approximate (storage-precision) scores for all rows or the given rows"""
+        if rows is not None:
+            return self._read_rows(rows) @ query if len(rows) else np.empty(0, dtype=np.float32)
+        if self.storage == 'float32':
+            return np.asarray(self._vectors[:self.count]) @ query
+        # Dequantize block by block so we never materialize the whole matrix in float32
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, block_size):
+            stop = min(start + block_size, self.count)
+            scores[start:stop] = self._read(start, stop) @ query
+        return scores
+
+    # ------------------------------------------------------------------ writes
+
+    @staticmethod
+    def _normalize(matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def upsert(self, vectors: list):
+        """Insert or overwrite vectors given as Pinecone-style dicts"""
+        if not vectors:
+            return 0
+
+        with self._lock:
+            values = self._normalize([v['values'] for v in vectors])
+            new_ids = [v['id'] for v in vectors if v['id'] not in self._row_by_id]
+            self._ensure_capacity(self.count + len(set(new_ids)))
+
+            records = []
+            for vector, value in zip(vectors, values):
+                vector_id = vector['id']
+                row = self._row_by_id.get(vector_id)
+                if row is None:
+                    row = self.count
+                    self.count += 1
+                self._write(row, value)
+                metadata = vector.get('metadata', {})
+                self._set_row_metadata(row, vector_id, metadata)
+                self._assign_to_ivf(row, value)
+                records.append({'row': row, 'id': vector_id, 'metadata': metadata})
+
+            if self._should_rebuild_ivf():
+                self.build_ivf()
+            self._persist(records)
+            return len(records)
+
+    # ------------------------------------------------------------------ IVF
+
+    def _should_rebuild_ivf(self):
+        if self.search_mode == "exact" or self.count < self.ann_threshold:
+            return False
+        return self._centroids is None or self.count >= 2 * self._ivf_built_at
+
+    def _nearest_centroid(self, vector):
+        return int(np.argmax(self._centroids @ vector))
+
+    def _assign_to_ivf(self, row: int, vector):
+        if self._centroids is None:
+            return
+        centroid = self._nearest_centroid(vector)
+        if row < len(self._assignments):
+            old = self._assignments[row]
+            if old == centroid:
+                return
+            self._lists[old].remove(row)
+            self._list_arrays.pop(old, None)
+            self._assignments[row] = centroid
+        else:
+            self._assignments.append(centroid)
+        self._lists[centroid].append(row)
+        self._list_arrays.pop(centroid, None)
+
+    def build_ivf(self, n_lists: int = None, iterations: int = 10, sample_size: int = 50000):
+        """Cluster stored vectors with spherical k-means and rebuild inverted lists"""
+        with self._lock:
+            if self.count == 0:
+                return
+            if n_lists is None:
+                n_lists = max(1, int(np.sqrt(self.count)))
+            n_lists = min(n_lists, self.count)
+
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(self.count, size=min(sample_size, self.count), replace=False))
+            sample = self._read_rows(sample_rows)
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(n_lists):
+                    members = sample[labels == c]
+                    if len(members):
+                        centroids[c] = members.sum(axis=0)
+                centroids = self._normalize(centroids)
+
+            assignments = np.empty(self.count, dtype=np.int32)
+            for start in range(0, self.count, 65536):
+                stop = min(start + 65536, self.count)
+                assignments[start:stop] = np.argmax(self._read(start, stop) @ centroids.T, axis=1)
+
+            self._centroids = centroids
+            self._assignments = assignments.tolist()
+            self._lists = [[] for _ in range(n_lists)]
+            for row, centroid in enumerate(self._assignments):
+                self._lists[centroid].append(row)
+            self._list_arrays = {}
+            self._ivf_built_at = self.count
+            print(f"🗂️ Built IVF index with {n_lists} lists over {self.count} vectors")
+
+    def _candidate_rows(self, query):
+        probes = np.argsort(-(self._centroids @ query))[:self.n_probe]
+        arrays = []
+        for c in probes:
+            c = int(c)
+            if c not in self._list_arrays:
+                self._list_arrays[c] = np.asarray(self._lists[c], dtype=np.int64)
+            arrays.append(self._list_arrays[c])
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    # ------------------------------------------------------------------ reads
+
+    def _use_approximate(self, exact: bool = None):
+        if exact:
+            return False
+        if self._centroids is None:
+            return False
+        if self.search_mode == "approximate":
+            return True
+        return self.search_mode == "auto" and self.count >= self.ann_threshold
+
+    def query(self, vector, top_k: int = 5, include_metadata: bool = True, exact: bool = None,
+              rescore: bool = None, filter: dict = None):
+        """Cosine search, returns a Pinecone-shaped {'matches': [...]} dict"""
+        with self._lock:
+            if self.count == 0:
+                return {'matches': []}
+
+            query = self._normalize(vector).reshape(-1)
+            rescore = self.rescore if rescore is None else (rescore and self.rescore)
+
+            if filter:
+                rows = self._filter_rows(filter)
+                # A large partition still goes through IVF; a small one is scanned exactly
+                if len(rows) >= self.ann_threshold and self._use_approximate(exact):
+                    rows = np.intersect1d(rows, self._candidate_rows(query), assume_unique=True)
+                scores = self._scores(query, rows)
+            elif self._use_approximate(exact):
+                rows = self._candidate_rows(query)
+                scores = self._scores(query, rows)
+            else:
+                rows = np.arange(self.count)
+                scores = self._scores(query)
+
+            # When rescoring, over-fetch from the quantized scores and re-rank at full precision
+            k = min(top_k * self.rescore_factor if rescore else top_k, len(scores))
+            if k == 0:
+                return {'matches': []}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top_rows = rows[top]
+            top_scores = scores[top]
+            if rescore:
+                order = np.argsort(top_rows)
+                top_rows = top_rows[order]
+                top_scores = np.asarray(self._full[top_rows]) @ query
+            order = np.argsort(-top_scores)[:top_k]
+
+            matches = []
+            for idx in order:
+                row = int(top_rows[idx])
+                match = {'id': self.ids[row], 'score': float(top_scores[idx])}
+                if include_metadata:
+                    match['metadata'] = self.metadata[row]
+                matches.append(match)
+            return {'matches': matches}
+
+    def measure_recall(self, sample_size: int = 100, top_k: int = 10, reference=None):
+        """Recall@k against exact float32 search, with and without rescoring.
+
+        Queries are stored vectors themselves. The exact float32 vectors come
+        from ``reference`` (a count x dimension array in row order), else the
+        index's own float32 copy (rescore or keep_full), else the stored
+        vectors when storage is float32. Returns None when none is available,
+        otherwise {'recall': configured search, 'recall_no_rescore': the
+        quantized/approximate scores alone}.
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            if reference is not None:
+                full = self._normalize(np.asarray(reference, dtype=np.float32)[:self.count])
+            elif self.storage == 'float32':
+                full = np.asarray(self._vectors[:self.count])
+            elif self.keep_full:
+                full = np.asarray(self._full[:self.count])
+            else:
+                return None
+
+            rng = np.random.default_rng(0)
+            sample_rows = rng.choice(self.count, size=min(sample_size, self.count), replace=False)
+            k = min(top_k, self.count)
+            found = {'recall': 0, 'recall_no_rescore': 0}
+            for row in sample_rows:
+                query = full[row]
+                truth_scores = full @ query
+                truth = set(np.argpartition(-truth_scores, k - 1)[:k].tolist())
+                for key, rescore in (('recall', None), ('recall_no_rescore', False)):
+                    result = self.query(query, top_k=k, include_metadata=False, rescore=rescore)['matches']
+                    found[key] += len(truth & {self._row_by_id[m['id']] for m in result})
+            total = len(sample_rows) * k
+            return {key: round(hits / total, 4) for key, hits in found.items()}
+
+    def memory_bytes(self):
+        """Bytes of the vectors scanned at query time (excludes the rescoring copy)"""
+        total = self.count * self.dimension * np.dtype(STORAGE_DTYPES[self.storage]).itemsize
+        if self.storage == 'int8':
+            total += self.count * 4
+        return total
+
+    def describe(self):
+        return {
+            'backend': 'local',
+            'vectors': self.count,
+            'dimension': self.dimension,
+            'search_mode': self.search_mode,
+            'storage': self.storage,
+            'rescore': self.rescore,
+            'full_copy': self.keep_full,
+            'vector_memory_mb': round(self.memory_bytes() / (1024 * 1024), 2),
+            'ivf_lists': len(self._lists) if self._centroids is not None else 0,
+        }
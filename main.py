@@ -1,15 +1,28 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import os
 import uuid
-from typing import List
+from typing import List, Optional, Union
 from fastapi import Form
 import base64
+import json
+import asyncio
+import functools
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 # Import your modules
-from file_processor import FileProcessor
+from file_processor import FileProcessor, shutdown_pdf_pool
 from vector_db import VectorDBManager
-from llm_manager import LLMManager
+from llm_manager import LLMManager, CancelToken, vision_image_cache
+from answer_cache import SemanticAnswerCache
+from chat_sessions import ChatSessionStore
+from upload_spool import UploadSpool, UploadSizeLimit, UploadTooLarge
+from ingestion_workers import IngestionPool
+from llm_scheduler import LLMScheduler, SchedulerFull, INTERACTIVE, BACKGROUND
 
 app = FastAPI(title="JARVIS Enhanced Agent")
 
@@ -21,31 +34,273 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-try:
-    vector_db = VectorDBManager()
-    llm_manager = LLMManager()
-    file_processor = FileProcessor()
-    print("✅ Enhanced JARVIS initialized successfully")
-except Exception as e:
-    print(f"❌ Initialization error: {e}")
+# Components are created in the background at startup so the server binds
+# immediately; /ready reports when they are usable
+file_processor = FileProcessor()
+vector_db = None
+llm_manager = None
+startup_state = {
+    "status": "starting",
+    "components": {"vector_db": "pending", "llm_manager": "pending"},
+    "errors": {},
+    "started_at": None,
+    "ready_at": None,
+}
+components_ready = threading.Event()
+
+def _init_vector_db():
+    global vector_db
+    db = VectorDBManager()
+    db.warm_up()
+    vector_db = db
+
+def _init_llm_manager():
+    global llm_manager
+    manager = LLMManager()
+    manager.warm_up()
+    llm_manager = manager
+
+def initialize_components():
+    """Load the embedder/vector index and connect to Ollama concurrently, then warm up"""
+    startup_state["started_at"] = datetime.now().isoformat()
+    initializers = {"vector_db": _init_vector_db, "llm_manager": _init_llm_manager}
+    with ThreadPoolExecutor(max_workers=len(initializers), thread_name_prefix="jarvis-startup") as pool:
+        futures = {name: pool.submit(init) for name, init in initializers.items()}
+        for name, future in futures.items():
+            try:
+                future.result()
+                startup_state["components"][name] = "ready"
+            except Exception as e:
+                startup_state["components"][name] = "failed"
+                startup_state["errors"][name] = str(e)
+                print(f"❌ Initialization error ({name}): {e}")
+
+    # Fallback answers score sentences with the same embedder used for search
+    if vector_db is not None and llm_manager is not None:
+        llm_manager.set_sentence_encoder(vector_db.encode_sentences)
+
+    startup_state["ready_at"] = datetime.now().isoformat()
+    if startup_state["errors"]:
+        startup_state["status"] = "degraded"
+    else:
+        startup_state["status"] = "ready"
+        print("✅ Enhanced JARVIS initialized successfully")
+    components_ready.set()
+
+def require_components(*names):
+    """Fail fast with 503 while the named components are still loading"""
+    for name in names:
+        if globals().get(name) is None:
+            state = startup_state["components"].get(name, "pending")
+            raise HTTPException(
+                status_code=503,
+                detail=f"{name} is {state}, try again shortly",
+                headers={"Retry-After": "2"}
+            )
+
+@app.on_event("startup")
+def start_component_initialization():
+    threading.Thread(target=initialize_components, name="jarvis-init", daemon=True).start()
+
+# Blocking work (embedding, vector search, Ollama calls) runs on this pool so
+# the event loop keeps serving other requests while one chat waits on the LLM
+blocking_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BLOCKING_POOL_SIZE', '16')),
+    thread_name_prefix="jarvis-blocking"
+)
+search_limiter = asyncio.Semaphore(int(os.getenv('MAX_CONCURRENT_SEARCHES', '8')))
+
+# Every LLM generation goes through this bounded priority queue; interactive
+# chat is served before background image analysis
+llm_scheduler = LLMScheduler(
+    max_in_flight=int(os.getenv('MAX_CONCURRENT_GENERATIONS', '2')),
+    max_queue=int(os.getenv('LLM_QUEUE_SIZE', '16'))
+)
+
+async def run_blocking(func, *args, limiter: asyncio.Semaphore = None, **kwargs):
+    """Run a blocking call on the shared thread pool, optionally bounded by a semaphore"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    if limiter is None:
+        return await loop.run_in_executor(blocking_executor, call)
+    async with limiter:
+        return await loop.run_in_executor(blocking_executor, call)
 
-# Store conversation history
-conversation_history = {}
+def queue_full_error(e: SchedulerFull):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+# Seconds an endpoint waits for the LLM before answering extractively (0 waits indefinitely)
+CHAT_DEADLINE_SECONDS = float(os.getenv('CHAT_DEADLINE_SECONDS', '60'))
+CHAT_STREAM_FIRST_TOKEN_SECONDS = float(os.getenv('CHAT_STREAM_FIRST_TOKEN_SECONDS', '30'))
+MULTIMODAL_DEADLINE_SECONDS = float(os.getenv('MULTIMODAL_DEADLINE_SECONDS', '120'))
+
+async def answer_within_deadline(deadline: float, user_question: str, context: str, *, images: list = None,
+                                 session=None, chunk_ids: list = None):
+    """Race the LLM against the extractive answer for the same context.
+
+    The extractive answer is computed right away while the generation waits
+    in the scheduler. If the LLM hasn't answered after ``deadline`` seconds,
+    the generation is cancelled (or dropped from the queue if it never
+    started) and the extractive answer is returned instead. Cancelling
+    closes the Ollama stream right away, so the scheduler slot is free for
+    the next chat even if no token had arrived yet.
+    Returns (response, answered_by, deadline_exceeded).
+    """
+    trace = {}
+    cancel = CancelToken()
+    try:
+        future = llm_scheduler.submit(
+            llm_manager.generate_response,
+            user_question=user_question, context=context, images=images,
+            session=session, chunk_ids=chunk_ids, cancel=cancel, trace=trace
+        )
+    except SchedulerFull as e:
+        raise queue_full_error(e)
+    
+    generated = asyncio.wrap_future(future)
+    if deadline <= 0:
+        response = await generated
+        return response, trace.get('answered_by', 'llm'), False
+    
+    extractive = asyncio.ensure_future(
+        run_blocking(llm_manager.extract_answer, user_question, context, session=session)
+    )
+    try:
+        response = await asyncio.wait_for(asyncio.shield(generated), timeout=deadline)
+        extractive.cancel()
+        return response, trace.get('answered_by', 'llm'), False
+    except asyncio.TimeoutError:
+        print(f"⏰ LLM missed the {deadline:.1f}s deadline, answering extractively")
+        cancel.set()
+        future.cancel()
+        return await extractive, 'extractive', True
+
+def schedule_stream(generator, priority: int = INTERACTIVE, cancel: CancelToken = None):
+    """Queue a blocking token generator as one scheduler job.
+
+    Raises 429 right away if the queue is full; otherwise returns an async
+    iterator that relays tokens as the worker thread produces them. Pass the
+    generator's own CancelToken as ``cancel`` so a client that goes away
+    closes the Ollama stream immediately, not at the next token.
+    """
+    loop = asyncio.get_running_loop()
+    tokens = asyncio.Queue()
+    done = object()
+    stop = cancel if cancel is not None else CancelToken()
+
+    def relay(item):
+        try:
+            loop.call_soon_threadsafe(tokens.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed
+            stop.set()
+
+    def pump():
+        try:
+            for token in generator:
+                if stop.is_set():
+                    break
+                relay(token)
+        finally:
+            generator.close()
+            relay(done)
+
+    try:
+        future = llm_scheduler.submit(pump, priority=priority)
+    except SchedulerFull as e:
+        raise queue_full_error(e)
+
+    async def iterate():
+        try:
+            while True:
+                token = await tokens.get()
+                if token is done:
+                    break
+                yield token
+            await asyncio.wrap_future(future)
+        finally:
+            # Client went away: stop generating, or drop the job if it never started
+            stop.set()
+            future.cancel()
+
+    return iterate()
+
+@app.on_event("shutdown")
+async def shutdown_blocking_executor():
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
+    if ingestion_pool is not None:
+        ingestion_pool.shutdown()
+    shutdown_pdf_pool()
+    if llm_manager is not None:
+        llm_manager.stop_health_probe()
+        await llm_manager.client.aclose()
+        llm_manager.client.close()
+
+# Uploads are streamed here in bounded chunks; the hash of every ingested file is remembered
+upload_spool = UploadSpool(
+    directory=os.getenv('UPLOAD_SPOOL_DIR', 'upload_spool'),
+    max_bytes=int(float(os.getenv('MAX_UPLOAD_MB', '100')) * 1024 * 1024),
+    chunk_size=int(os.getenv('UPLOAD_CHUNK_KB', '1024')) * 1024
+)
+# Oversized bodies are refused before Starlette spools them to disk
+app.add_middleware(UploadSizeLimit, max_bytes=upload_spool.max_bytes, paths=["/upload", "/analyze-image"])
+
+# Uploads are parsed, OCR'd and embedded in separate worker processes; 0 keeps it in-process
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))
+ingestion_pool = IngestionPool(
+    INGEST_WORKERS,
+    model_name=os.getenv('EMBEDDING_MODEL'),
+    store_path=os.getenv('EMBEDDING_STORE_PATH', 'embedding_store.sqlite3'),
+    store_max_entries=int(os.getenv('EMBEDDING_STORE_MAX_ENTRIES', '200000'))
+) if INGEST_WORKERS > 0 else None
+
+# Per-session chat state: the turns replayed to Ollama's chat API plus the transcript
+chat_sessions = ChatSessionStore(
+    max_sessions=int(os.getenv('CHAT_MAX_SESSIONS', '200')),
+    ttl_seconds=float(os.getenv('CHAT_SESSION_TTL', '3600'))
+)
+
+# Answers for near-identical questions over the same retrieved chunks;
+# invalidated whenever an ingest bumps vector_db.corpus_generation
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95')),
+    max_entries=int(os.getenv('ANSWER_CACHE_SIZE', '500')),
+    ttl_seconds=float(os.getenv('ANSWER_CACHE_TTL', '3600'))
+)
+
+def chunk_ids(search_results):
+    return [match['id'] for match in search_results['matches']]
+
+class SearchFilters(BaseModel):
+    file_type: Optional[Union[str, List[str]]] = None
+    filename: Optional[Union[str, List[str]]] = None
+    doc_id: Optional[Union[str, List[str]]] = None
+    uploaded_after: Optional[float] = None  # Unix timestamp
+    uploaded_before: Optional[float] = None
+
+def new_session_id():
+    """Id for a request that didn't name a session; send it back to continue the conversation"""
+    return str(uuid.uuid4())
+
+def filters_to_dict(filters: Optional[SearchFilters]):
+    return filters.dict(exclude_none=True) if filters else None
 
 class ChatMessage(BaseModel):
     message: str
-    session_id: str = "default"
+    session_id: Optional[str] = None  # omitted: a new conversation, whose id comes back in the response
+    filters: Optional[SearchFilters] = None
 
 class ChatResponse(BaseModel):
     response: str
     sources: List[str]
     session_id: str
+    cached: bool = False
+    answered_by: str = "llm"  # llm, llm_partial (stream broke off), extractive or cache
+    deadline_exceeded: bool = False
 
 #debugging router remove it 
 # Add these imports at the top of main.py
 import glob
-from datetime import datetime
 
 # Add this global variable to track processing status
 file_processing_logs = []
@@ -61,9 +316,10 @@ async def debug_upload_logs():
 @app.get("/debug-processing-status")
 async def debug_processing_status():
     """Comprehensive processing status check"""
+    require_components("vector_db")
     try:
         # Check for any temp files that might be stuck
-        temp_files = glob.glob("temp_*")
+        temp_files = glob.glob(os.path.join(upload_spool.directory, "temp_*"))
         current_temp_files = []
         
         for temp_file in temp_files:
@@ -79,63 +335,232 @@ async def debug_processing_status():
             "current_temp_files": current_temp_files,
             "total_temp_files": len(current_temp_files),
             "processing_logs_count": len(file_processing_logs),
-            "vector_db_document_count": vector_db.search("test", top_k=1)['matches']  # Quick count
+            "vector_db_document_count": (await run_blocking(vector_db.search, "test", top_k=1, limiter=search_limiter))['matches']  # Quick count
         }
     except Exception as e:
         return {"error": str(e)}
 
 #Upto here 
+def build_context(search_results, question: str, session=None):
+    """Pack matched chunk texts into the LLM's token budget and list their sources.
+
+    Returns (context, sources, ids of the chunks that made it into context).
+    """
+    return llm_manager.build_context(question, search_results['matches'], session=session)
+
+def sse_event(event: str, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(message: ChatMessage):
     """Main chat endpoint"""
+    require_components("vector_db", "llm_manager")
     try:
-        session_id = message.session_id
-        
-        if session_id not in conversation_history:
-            conversation_history[session_id] = []
+        session_id = message.session_id or new_session_id()
+        session = chat_sessions.get(session_id)
+        # One turn at a time per session, so concurrent requests never interleave turns
+        async with session.turn_lock:
+            follow_up = bool(session.turns)
+            # Read before searching: an ingest that lands mid-search makes this stale, not the cache
+            generation = vector_db.corpus_generation
         
-        # Search vector DB for relevant content
-        search_results = vector_db.search(message.message, top_k=5)
-        
-        # Extract context from search results
-        context_chunks = []
-        sources = []
-        for match in search_results['matches']:
-            context_chunks.append(match['metadata']['text'])
-            source_info = f"{match['metadata']['filename']}"
-            if match['metadata'].get('file_type'):
-                source_info += f" ({match['metadata']['file_type']})"
-            sources.append(source_info)
+            # Search vector DB for relevant content
+            search_results = await run_blocking(
+                vector_db.search, message.message, top_k=5,
+                filters=filters_to_dict(message.filters), limiter=search_limiter
+            )
         
-        context = "\n---\n".join(context_chunks) if context_chunks else "No relevant documents found."
+            # Extract context from search results
+            context, sources, context_ids = build_context(search_results, message.message, session)
         
-        print(f"🎯 User question: {message.message}")
-        print(f"📄 Context found: {len(context)} characters")
+            print(f"🎯 User question: {message.message}")
+            print(f"📄 Context found: {len(context)} characters")
         
-        # FIXED: Pass user question and context separately
-        response = llm_manager.generate_response(
-            user_question=message.message,
-            context=context
-        )
+            # Repeat questions over the same chunks skip generation entirely. Follow-ups
+            # depend on the conversation so far, so only opening questions are cached.
+            cached = None
+            deadline_exceeded = False
+            if not follow_up:
+                query_embedding = await run_blocking(vector_db.embed_query, message.message)
+                cached = answer_cache.get(query_embedding, chunk_ids(search_results), generation)
+            if cached is not None:
+                print(f"⚡ Answer cache hit (similarity {cached['similarity']:.3f})")
+                response = cached['response']
+                answered_by = "cache"
+                llm_manager.record_turn(session, message.message, context, response, context_ids)
+            else:
+                # FIXED: Pass user question and context separately
+                response, answered_by, deadline_exceeded = await answer_within_deadline(
+                    CHAT_DEADLINE_SECONDS,
+                    message.message,
+                    context,
+                    session=session,
+                    chunk_ids=context_ids
+                )
+                # Only complete LLM answers are reused; fallbacks and broken-off streams would outlive an outage
+                if not follow_up and answered_by == "llm":
+                    answer_cache.put(query_embedding, chunk_ids(search_results), generation, response, sources)
         
-        # Update conversation history
-        conversation_history[session_id].append({
-            "user": message.message,
-            "assistant": response
-        })
+            # Update conversation history
+            session.record(message.message, response)
         
-        return ChatResponse(
-            response=response,
-            sources=sources,
-            session_id=session_id
-        )
+            return ChatResponse(
+                response=response,
+                sources=cached['sources'] if cached else sources,
+                session_id=session_id,
+                cached=cached is not None,
+                answered_by=answered_by,
+                deadline_exceeded=deadline_exceeded
+            )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat-stream")
+async def chat_stream(message: ChatMessage):
+    """Chat endpoint that streams the answer as Server-Sent Events.
+
+    Events: 'sources' (sent before generation starts), one 'token' per
+    generated piece, then 'done' with the full response and which path
+    answered it. If the first token takes longer than
+    CHAT_STREAM_FIRST_TOKEN_SECONDS, the extractive answer is sent instead.
+    """
+    require_components("vector_db", "llm_manager")
+    session_id = message.session_id or new_session_id()
+    session = chat_sessions.get(session_id)
+    # The turn lasts until the stream ends; event_stream releases the lock
+    await session.turn_lock.acquire()
+    try:
+        follow_up = bool(session.turns)
+        # Read before searching: an ingest that lands mid-search makes this stale, not the cache
+        generation = vector_db.corpus_generation
+        
+        try:
+            search_results = await run_blocking(
+                vector_db.search, message.message, top_k=5,
+                filters=filters_to_dict(message.filters), limiter=search_limiter
+            )
+            context, sources, context_ids = build_context(search_results, message.message, session)
+            # Follow-ups depend on the conversation so far, so only opening questions are cached
+            if not follow_up:
+                query_embedding = await run_blocking(vector_db.embed_query, message.message)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        
+        cached = None if follow_up else answer_cache.get(query_embedding, chunk_ids(search_results), generation)
+        
+        print(f"🎯 User question: {message.message}")
+        print(f"📄 Context found: {len(context)} characters")
+        
+        # Reserve a generation slot before the 200 response starts, so a full queue is still a 429
+        token_stream = None
+        cancel = None
+        trace = {}
+        if cached is None:
+            cancel = CancelToken()
+            token_stream = schedule_stream(
+                llm_manager.stream_response(
+                    user_question=message.message, context=context, session=session, chunk_ids=context_ids,
+                    cancel=cancel, trace=trace
+                ),
+                cancel=cancel
+            )
+    except BaseException:
+        session.turn_lock.release()
+        raise
+    
+    async def event_stream():
+        try:
+            yield sse_event("sources", {"sources": sources, "session_id": session_id, "cached": cached is not None})
+            deadline_exceeded = False
+            if cached is not None:
+                response = cached['response']
+                answered_by = "cache"
+                llm_manager.record_turn(session, message.message, context, response, context_ids)
+                yield sse_event("token", {"token": response})
+            else:
+                deadline = CHAT_STREAM_FIRST_TOKEN_SECONDS
+                extractive = None
+                if deadline > 0:
+                    # Computed up front so a slow first token can be answered from it right away
+                    extractive = asyncio.ensure_future(
+                        run_blocking(llm_manager.extract_answer, message.message, context, session=session)
+                    )
+                pieces = []
+                try:
+                    try:
+                        first_token = await asyncio.wait_for(token_stream.__anext__(), deadline if deadline > 0 else None)
+                        pieces.append(first_token)
+                    except StopAsyncIteration:
+                        pass
+                    except asyncio.TimeoutError:
+                        # The timeout closed token_stream, which cancels the generation
+                        print(f"⏰ No first token within {deadline:.1f}s, answering extractively")
+                        deadline_exceeded = True
+                
+                    if deadline_exceeded:
+                        response = await extractive
+                        answered_by = "extractive"
+                        yield sse_event("token", {"token": response})
+                    else:
+                        if extractive is not None:
+                            extractive.cancel()
+                        if pieces:
+                            yield sse_event("token", {"token": pieces[0]})
+                        async for token in token_stream:
+                            pieces.append(token)
+                            yield sse_event("token", {"token": token})
+                        response = "".join(pieces)
+                        answered_by = trace.get('answered_by', 'llm')
+                except Exception as e:
+                    yield sse_event("error", {"detail": str(e)})
+                    return
+            
+                # Only complete LLM answers are reused; fallbacks and broken-off streams would outlive an outage
+                if not follow_up and answered_by == "llm":
+                    answer_cache.put(query_embedding, chunk_ids(search_results), generation, response, sources)
+        
+            session.record(message.message, response)
+            yield sse_event("done", {
+                "response": response, "sources": sources, "session_id": session_id,
+                "answered_by": answered_by, "deadline_exceeded": deadline_exceeded
+            })
+        finally:
+            if cancel is not None:
+                # No-op after a normal finish; otherwise stops a generation nobody will read
+                cancel.set()
+            session.turn_lock.release()
+    
+    # Started here so its finally, which ends the turn, also runs if the
+    # client leaves before the body is sent
+    events = event_stream()
+    first_event = await events.__anext__()
+    
+    async def body():
+        yield first_event
+        async for event in events:
+            yield event
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/session/{session_id}")
+async def reset_session(session_id: str):
+    """Forget a chat session so the next message starts a fresh conversation"""
+    return {"session_id": session_id, "reset": chat_sessions.reset(session_id)}
+
 @app.post("/upload")
-async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    """Upload and process ALL file types"""
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...), force: bool = False):
+    """Upload and process ALL file types.
+
+    Files whose exact bytes were already ingested are not processed again
+    unless force=true.
+    """
     try:
         # Validate file type
         allowed_extensions = ['pdf', 'docx', 'doc', 'txt', 'xlsx', 'xls', 'csv', 
@@ -145,25 +570,73 @@ async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File
         if file_ext not in allowed_extensions:
             raise HTTPException(status_code=400, detail=f"File type {file_ext} not supported")
         
-        # Create temp file
-        file_path = f"temp_{uuid.uuid4()}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream to the spool directory, hashing as we go
+        file_path, content_hash, size = await upload_spool.receive(file)
+        
+        # Only a duplicate if it went into the current index and is still there;
+        # during startup the index isn't known yet, so nothing is skipped
+        duplicate = None
+        claimed_index = None
+        if not force and vector_db is not None:
+            try:
+                duplicate = await run_blocking(
+                    upload_spool.claim, content_hash, file.filename,
+                    index=vector_db.index_key, exists=vector_db.has_document
+                )
+            except Exception as e:
+                # Ingesting blind could duplicate a document that is still there
+                os.remove(file_path)
+                raise HTTPException(status_code=503, detail=f"Could not check the index for this file: {str(e)}")
+            claimed_index = vector_db.index_key
+        if duplicate is not None:
+            os.remove(file_path)
+            print(f"♻️  {file.filename} is identical to {duplicate['filename']}, skipping processing")
+            return {
+                "status": "duplicate",
+                "filename": file.filename,
+                "file_type": file_ext,
+                "sha256": content_hash,
+                "original_filename": duplicate['filename'],
+                "doc_id": duplicate.get('doc_id'),
+                "message": f"This file was already {duplicate.get('status', 'ingested')}"
+            }
         
         # Process in background
-        background_tasks.add_task(process_and_ingest_file, file_path, file.filename)
+        background_tasks.add_task(ingest_upload, file_path, file.filename, content_hash, size, claimed_index)
         
         return {
             "status": "processing", 
             "filename": file.filename, 
             "file_type": file_ext,
+            "sha256": content_hash,
+            "size_bytes": size,
             "message": f"File is being processed and analyzed"
         }
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-def process_and_ingest_file(file_path: str, filename: str):
+
+def ingest_upload(file_path: str, filename: str, content_hash: str, size: int, claimed_index: str = None):
+    """Background task: ingest a spooled upload and remember its hash if it worked.
+
+    claimed_index is the index /upload claimed the hash in, or None when it
+    didn't claim one (force, or during startup); only a claim is released.
+    """
+    doc_id = f"{filename}_{uuid.uuid4()}"
+    success = False
+    try:
+        success = process_and_ingest_file(file_path, filename, doc_id=doc_id)
+    finally:
+        if success:
+            upload_spool.mark_ingested(content_hash, filename, doc_id, size, index=vector_db.index_key)
+        elif claimed_index is not None:
+            upload_spool.release(content_hash, index=claimed_index)
+
+def process_and_ingest_file(file_path: str, filename: str, doc_id: str = None):
     """Background task to process and ingest ALL file types - INSTRUMENTED VERSION"""
     
     # Create log entry
@@ -196,11 +669,42 @@ def process_and_ingest_file(file_path: str, filename: str):
         file_size = os.path.getsize(file_path)
         log_step("FILE_CHECK", "success", f"File exists, size: {file_size} bytes")
         
+        # Uploads accepted during startup wait for the vector DB to finish loading
+        if not components_ready.wait(timeout=300) or vector_db is None:
+            log_step("VECTOR_DB_READY", "failed", f"Vector DB not available: {startup_state['components']['vector_db']}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            file_processing_logs.append(log_entry)
+            return False
+        
         # Step 2: Extract text from file
-        log_step("TEXT_EXTRACTION", "started", "Calling file_processor.process_file()")
-        text = file_processor.process_file(file_path, filename)
+        embeddings = None
+        result = None
+        if ingestion_pool is not None:
+            # Parsing, OCR, chunking and embedding all happen in a worker process
+            log_step("TEXT_EXTRACTION", "started", "Sent to ingestion worker pool")
+            try:
+                result = ingestion_pool.process(file_path, filename)
+            except BrokenProcessPool:
+                # Broke a fresh pool too; parsing it here could take the API process down with it
+                log_step("WORKER", "failed", "Worker pool broke twice on this file, giving up")
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                file_processing_logs.append(log_entry)
+                return False
+        if result is not None:
+            text_length = result['text_length']
+            text_preview = result['preview']
+            text_chunks = result['chunks']
+            embeddings = result['embeddings']
+            log_step("WORKER", "info", f"Worker {result['worker_pid']} finished in {result['seconds']:.2f}s, "
+                                        f"embedded {result['embedded']} new chunks")
+        else:
+            # PDFs stream page by page into the chunker; other types are read whole
+            log_step("TEXT_EXTRACTION", "started", "Calling file_processor.extract_chunks()")
+            text_length, text_preview, text_chunks = file_processor.extract_chunks(file_path, filename)
         
-        if not text:
+        if not text_length:
             log_step("TEXT_EXTRACTION", "failed", "No text returned from processor")
             # Cleanup
             if os.path.exists(file_path):
@@ -208,9 +712,8 @@ def process_and_ingest_file(file_path: str, filename: str):
             file_processing_logs.append(log_entry)
             return False
         
-        text_length = len(text)
         log_step("TEXT_EXTRACTION", "success", f"Extracted {text_length} characters")
-        log_step("TEXT_PREVIEW", "info", f"First 200 chars: {text[:200]}...")
+        log_step("TEXT_PREVIEW", "info", f"First 200 chars: {text_preview}...")
         
         if text_length < 10:
             log_step("TEXT_EXTRACTION", "failed", f"Text too short: {text_length} chars")
@@ -221,7 +724,6 @@ def process_and_ingest_file(file_path: str, filename: str):
         
         # Step 3: Split into chunks
         log_step("CHUNKING", "started", "Splitting text into chunks")
-        text_chunks = file_processor.split_text(text)
         
         if not text_chunks:
             log_step("CHUNKING", "failed", "No chunks created")
@@ -234,14 +736,14 @@ def process_and_ingest_file(file_path: str, filename: str):
         
         # Log first chunk preview
         if text_chunks:
-            log_step("CHUNK_PREVIEW", "info", f"First chunk: {text_chunks[0][:100]}...")
+            log_step("CHUNK_PREVIEW", "info", f"First chunk: {text_chunks[0]['text'][:100]}...")
         
         # Step 4: Prepare chunks for vector DB
         log_step("PREPARE_METADATA", "started", "Preparing chunks with metadata")
         chunks_with_metadata = []
-        for i, chunk_text in enumerate(text_chunks):
+        for i, chunk in enumerate(text_chunks):
             chunks_with_metadata.append({
-                'text': chunk_text,
+                **chunk,
                 'filename': filename,
                 'file_type': filename.split('.')[-1].lower()
             })
@@ -249,12 +751,14 @@ def process_and_ingest_file(file_path: str, filename: str):
         log_step("PREPARE_METADATA", "success", f"Prepared {len(chunks_with_metadata)} chunks")
         
         # Step 5: Ingest to vector DB
-        doc_id = f"{filename}_{uuid.uuid4()}"
+        doc_id = doc_id or f"{filename}_{uuid.uuid4()}"
         log_step("VECTOR_DB_INGEST", "started", f"Ingesting {len(chunks_with_metadata)} chunks to Vector DB")
         
-        success = vector_db.ingest_documents(chunks_with_metadata, doc_id)
+        success = vector_db.ingest_documents(chunks_with_metadata, doc_id, embeddings=embeddings)
         
         if success:
+            # New content can change any answer, so start a new cache generation
+            vector_db.bump_corpus_generation()
             log_step("VECTOR_DB_INGEST", "success", f"Successfully ingested document {doc_id}")
         else:
             log_step("VECTOR_DB_INGEST", "failed", "Vector DB ingestion returned False")
@@ -307,6 +811,12 @@ async def root():
         ]
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe - 200 once all components have loaded"""
+    status_code = 200 if startup_state["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=startup_state)
+
 @app.get("/supported-formats")
 async def supported_formats():
     return {
@@ -322,57 +832,57 @@ async def supported_formats():
 
 class MultimodalQuery(BaseModel):
     message: str
-    session_id: str = "default"
+    session_id: Optional[str] = None
     image_data: List[str] = None  # Base64 encoded images
+    filters: Optional[SearchFilters] = None
 
 @app.post("/multimodal-chat", response_model=ChatResponse)
 async def multimodal_chat(query: MultimodalQuery):
     """Enhanced chat endpoint that supports text + images"""
+    require_components("vector_db", "llm_manager")
     try:
-        session_id = query.session_id
-        
-        if session_id not in conversation_history:
-            conversation_history[session_id] = []
-        
-        # Search vector DB for relevant content
-        search_results = vector_db.search(query.message, top_k=5)
+        session_id = query.session_id or new_session_id()
+        session = chat_sessions.get(session_id)
+        # One turn at a time per session, so concurrent requests never interleave turns
+        async with session.turn_lock:
+            # Search vector DB for relevant content
+            search_results = await run_blocking(
+                vector_db.search, query.message, top_k=5,
+                filters=filters_to_dict(query.filters), limiter=search_limiter
+            )
         
-        # Extract context from search results
-        context_chunks = []
-        sources = []
-        for match in search_results['matches']:
-            context_chunks.append(match['metadata']['text'])
-            source_info = f"{match['metadata']['filename']}"
-            if match['metadata'].get('file_type'):
-                source_info += f" ({match['metadata']['file_type']})"
-            sources.append(source_info)
+            # Extract context from search results
+            # Images go to the vision model in a single shot; text-only questions continue the session
+            chat_session = None if query.image_data else session
+            context, sources, context_ids = build_context(search_results, query.message, chat_session)
         
-        context = "\n---\n".join(context_chunks) if context_chunks else "No relevant documents found."
+            print(f"🎯 User question: {query.message}")
+            print(f"📄 Context found: {len(context)} characters")
+            print(f"🖼️  Images provided: {len(query.image_data) if query.image_data else 0}")
         
-        print(f"🎯 User question: {query.message}")
-        print(f"📄 Context found: {len(context)} characters")
-        print(f"🖼️  Images provided: {len(query.image_data) if query.image_data else 0}")
+            # Process with LLM manager (now supports images)
+            response, answered_by, deadline_exceeded = await answer_within_deadline(
+                MULTIMODAL_DEADLINE_SECONDS,
+                query.message,
+                context,
+                images=query.image_data,  # Pass base64 images
+                session=chat_session,
+                chunk_ids=context_ids
+            )
         
-        # Process with LLM manager (now supports images)
-        response = llm_manager.generate_response(
-            user_question=query.message,
-            context=context,
-            images=query.image_data  # Pass base64 images
-        )
+            # Update conversation history
+            session.record(query.message, response, has_images=bool(query.image_data))
         
-        # Update conversation history
-        conversation_history[session_id].append({
-            "user": query.message,
-            "assistant": response,
-            "has_images": bool(query.image_data)
-        })
-        
-        return ChatResponse(
-            response=response,
-            sources=sources,
-            session_id=session_id
-        )
+            return ChatResponse(
+                response=response,
+                sources=sources,
+                session_id=session_id,
+                answered_by=answered_by,
+                deadline_exceeded=deadline_exceeded
+            )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -392,10 +902,7 @@ async def analyze_image(
             raise HTTPException(status_code=400, detail=f"Image format {file_ext} not supported")
         
         # Save temp file
-        file_path = f"temp_image_{uuid.uuid4()}.{file_ext}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        file_path, _, _ = await upload_spool.receive(file, prefix="temp_image")
         
         # Process in background
         background_tasks.add_task(process_image_analysis, file_path, question)
@@ -407,21 +914,30 @@ async def analyze_image(
             "message": "Image is being analyzed"
         }
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 def process_image_analysis(image_path: str, question: str):
     """Background task for image analysis"""
     try:
+        if not components_ready.wait(timeout=300) or llm_manager is None:
+            raise RuntimeError("LLM manager not available")
+        
         # Convert image to base64 for Ollama
         image_base64 = LLMManager.image_to_base64(image_path)
         
         if image_base64:
-            # Use vision model directly
-            response = llm_manager.generate_response(
+            # Use vision model directly, behind any interactive chats in the queue
+            response = llm_scheduler.submit(
+                llm_manager.generate_response,
                 user_question=question,
-                images=[image_base64]
-            )
+                images=[image_base64],
+                priority=BACKGROUND
+            ).result()
             
             print(f"✅ Image analysis complete: {response[:100]}...")
         else:
@@ -439,16 +955,18 @@ def process_image_analysis(image_path: str, question: str):
 @app.get("/debug-status")
 async def debug_status():
     """Comprehensive debug endpoint"""
+    require_components("vector_db", "llm_manager")
     try:
         # Test vector DB search
-        search_results = vector_db.search("test", top_k=10)
+        search_results = await run_blocking(vector_db.search, "test", top_k=10, limiter=search_limiter)
         
         # Check temp files
         import glob
-        temp_files = glob.glob("temp_*")
+        temp_files = glob.glob(os.path.join(upload_spool.directory, "temp_*"))
         
         return {
             "vector_db_status": "connected",
+            "vector_db_backend": vector_db.backend.describe(),
             "vector_db_documents": len(search_results['matches']),
             "vector_db_sample": [
                 {
@@ -460,17 +978,53 @@ async def debug_status():
             ],
             "temp_files_count": len(temp_files),
             "temp_files": temp_files[:5],
+            "query_cache": vector_db.query_cache.stats(),
+            "answer_cache": answer_cache.stats(),
+            "chat_sessions": chat_sessions.stats(),
+            "llm_scheduler": llm_scheduler.stats(),
+            "query_batching": vector_db.query_batcher.stats(),
+            "embedding_store": vector_db.embedding_store.stats(),
+            "lexical_index": vector_db.lexical_index.stats() if vector_db.lexical_index else None,
             "llm_manager_status": "fallback" if llm_manager.fallback_mode else "connected",
+            "ollama_http": llm_manager.client.stats(),
+            "ollama_health": llm_manager.health_stats(),
+            "vision_image_cache": vision_image_cache.stats(),
+            "upload_spool": upload_spool.stats(),
+            "ingestion_pool": ingestion_pool.stats() if ingestion_pool else None,
+            "context_tokens": {
+                "num_ctx": llm_manager.num_ctx,
+                "answer_tokens": llm_manager.answer_tokens,
+                **llm_manager.token_counter.stats()
+            },
             "file_processor_status": "active"
         }
     except Exception as e:
         return {"error": str(e)}
+@app.get("/debug-llm-queue")
+async def debug_llm_queue():
+    """LLM scheduler queue depth, in-flight generations and wait times"""
+    return llm_scheduler.stats()
+
+@app.get("/debug-ollama")
+async def debug_ollama():
+    """Check Ollama through the async client and show connection reuse metrics"""
+    require_components("llm_manager")
+    try:
+        models = await llm_manager.alist_models()
+        return {"reachable": True, "models": models, "http": llm_manager.client.stats(),
+                "health": llm_manager.health_stats()}
+    except Exception as e:
+        return {"reachable": False, "error": str(e), "http": llm_manager.client.stats(),
+                "health": llm_manager.health_stats()}
 # just added 
 @app.get("/debug-search/{query}")
-async def debug_search(query: str, top_k: int = 5):
+async def debug_search(query: str, top_k: int = 5, file_type: str = None, filename: str = None, doc_id: str = None):
     """Debug search functionality"""
+    require_components("vector_db")
     try:
-        results = vector_db.search(query, top_k=top_k)
+        filters = {'file_type': file_type, 'filename': filename, 'doc_id': doc_id}
+        filters = {key: value for key, value in filters.items() if value is not None}
+        results = await run_blocking(vector_db.search, query, top_k=top_k, filters=filters, limiter=search_limiter)
         return {
             "query": query,
             "total_matches": len(results['matches']),
@@ -479,6 +1033,8 @@ async def debug_search(query: str, top_k: int = 5):
                     'filename': match['metadata']['filename'],
                     'file_type': match['metadata'].get('file_type', 'unknown'),
                     'score': match.get('score', 0),
+                    'vector_score': match.get('vector_score'),
+                    'lexical_score': match.get('lexical_score'),
                     'text': match['metadata']['text'],
                     'text_length': len(match['metadata']['text'])
                 }
@@ -487,6 +1043,24 @@ async def debug_search(query: str, top_k: int = 5):
         }
     except Exception as e:
         return {"error": str(e)}
+@app.get("/debug-index-recall")
+async def debug_index_recall(sample_size: int = 100, top_k: int = 10, reference: bool = False):
+    """Measure local index recall@k (quantized/approximate vs exact float32).
+
+    reference=true compares against the embeddings in the embedding store
+    instead of the index's own float32 copy, so int8/float16 indexes without
+    one can be measured too.
+    """
+    require_components("vector_db")
+    try:
+        measure = getattr(vector_db.backend, "measure_recall", None)
+        if measure is None:
+            return {"error": f"{vector_db.backend_name} backend does not support recall measurement"}
+        exact = await run_blocking(vector_db.recall_reference) if reference else None
+        recall = await run_blocking(measure, sample_size=sample_size, top_k=top_k, reference=exact)
+        return {"backend": vector_db.backend.describe(), "top_k": top_k, "recall": recall}
+    except Exception as e:
+        return {"error": str(e)}
 # to debug the imge pipeline remove once its working 
 @app.get("/test-background-task")
 async def test_background_task(background_tasks: BackgroundTasks):
@@ -516,7 +1090,7 @@ async def test_file_processor():
         
         # Test processing directly
         print("🧪 Testing file processor directly...")
-        text = file_processor.process_file(test_path, "direct_test.png")
+        text = await run_blocking(file_processor.process_file, test_path, "direct_test.png")
         print(f"📄 Processor result: {text}")
         
         # Cleanup
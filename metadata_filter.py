@@ -0,0 +1,84 @@
+import operator
+
+IMAGE_FILE_TYPES = ['png', 'jpg', 'jpeg', 'bmp', 'tiff']
+
+RANGE_OPERATORS = {
+    '$gt': operator.gt,
+    '$gte': operator.ge,
+    '$lt': operator.lt,
+    '$lte': operator.le,
+}
+
+
+def build_filter(file_type=None, filename=None, doc_id=None, uploaded_after: float = None,
+                 uploaded_before: float = None):
+    """Turn structured search filters into a Pinecone-style metadata filter.
+
+    file_type, filename and doc_id accept a single value or a list. Upload
+    bounds are Unix timestamps matched against the 'uploaded_at' metadata.
+    Returns None when no filter is set.
+    """
+    flt = {}
+    for field, value in (('file_type', file_type), ('filename', filename), ('doc_id', doc_id)):
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            values = [v.lower() if field == 'file_type' else v for v in value]
+            flt[field] = {'$in': values}
+        else:
+            flt[field] = {'$eq': value.lower() if field == 'file_type' else value}
+
+    time_range = {}
+    if uploaded_after is not None:
+        time_range['$gte'] = uploaded_after
+    if uploaded_before is not None:
+        time_range['$lte'] = uploaded_before
+    if time_range:
+        flt['uploaded_at'] = time_range
+
+    return flt or None
+
+
+def normalize_condition(condition):
+    """Bare values mean equality, as in Pinecone"""
+    if isinstance(condition, dict):
+        return condition
+    return {'$eq': condition}
+
+
+def matches_condition(value, condition: dict):
+    for op, expected in normalize_condition(condition).items():
+        if op == '$eq':
+            if value != expected:
+                return False
+        elif op == '$ne':
+            if value == expected:
+                return False
+        elif op == '$in':
+            if value not in expected:
+                return False
+        elif op == '$nin':
+            if value in expected:
+                return False
+        elif op in RANGE_OPERATORS:
+            if value is None or not RANGE_OPERATORS[op](value, expected):
+                return False
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return True
+
+
+def matches_filter(metadata: dict, flt: dict):
+    """Evaluate a Pinecone-style filter against one metadata dict"""
+    if not flt:
+        return True
+    for field, condition in flt.items():
+        if field == '$and':
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif field == '$or':
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif not matches_condition(metadata.get(field), condition):
+            return False
+    return True
@@ -0,0 +1,89 @@
+import os
+import threading
+
+OCR_LANGUAGES = [lang.strip() for lang in os.getenv('OCR_LANGUAGES', 'en').split(',') if lang.strip()]
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', '8'))
+OCR_MIN_CONFIDENCE = float(os.getenv('OCR_MIN_CONFIDENCE', '0.3'))
+
+# One EasyOCR reader per process: loading its detection and recognition
+# models takes seconds, so it is built on first use and then reused
+_reader = None
+_reader_lock = threading.Lock()
+# Inference on the shared reader is serialized within a process
+_ocr_lock = threading.Lock()
+
+
+def get_reader():
+    """The process-wide EasyOCR reader, created on first call"""
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                import easyocr
+
+                print(f"🔄 Loading EasyOCR reader ({', '.join(OCR_LANGUAGES)})...")
+                _reader = easyocr.Reader(OCR_LANGUAGES)
+    return _reader
+
+
+def warm_up():
+    """Try to load the OCR models now; returns False instead of raising.
+
+    A failed preload (EasyOCR missing, weights not downloadable) only means
+    the reader is loaded again on the first image that needs it.
+    """
+    try:
+        get_reader()
+        return True
+    except ImportError:
+        return False
+    except Exception as e:
+        print(f"⚠️ EasyOCR preload failed, will retry on first image: {str(e)}")
+        return False
+
+
+def _load(image):
+    if isinstance(image, str):
+        import cv2
+
+        return cv2.imread(image)
+    return image
+
+
+def _confident_text(results, min_confidence: float):
+    return " ".join(text.strip() for _, text, confidence in results if confidence > min_confidence)
+
+
+def ocr_images(images: list, min_confidence: float = None, batch_size: int = None):
+    """OCR many images in one pass with the shared reader.
+
+    images are file paths or numpy arrays (e.g. rendered pages). Images with
+    the same dimensions go through EasyOCR's batched detector together;
+    recognition of text crops is batched for every image. Returns one string
+    per input, '' where nothing confident was found and None where the image
+    could not be loaded.
+    """
+    min_confidence = OCR_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    batch_size = batch_size or OCR_BATCH_SIZE
+    reader = get_reader()
+
+    arrays = [_load(image) for image in images]
+    texts = [None] * len(arrays)
+
+    by_shape = {}
+    for i, array in enumerate(arrays):
+        if array is not None:
+            by_shape.setdefault(array.shape, []).append(i)
+
+    with _ocr_lock:
+        for indices in by_shape.values():
+            if len(indices) == 1:
+                i = indices[0]
+                texts[i] = _confident_text(reader.readtext(arrays[i], batch_size=batch_size), min_confidence)
+                continue
+            for start in range(0, len(indices), batch_size):
+                group = indices[start:start + batch_size]
+                results = reader.readtext_batched([arrays[i] for i in group], batch_size=batch_size)
+                for i, result in zip(group, results):
+                    texts[i] = _confident_text(result, min_confidence)
+    return texts
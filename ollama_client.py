@@ -0,0 +1,149 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class OllamaClient:
+    """Shared, pooled HTTP client for the Ollama API (sync and async).
+
+    The sync side is a requests.Session whose adapter keeps up to
+    ``max_connections`` keep-alive connections. A request that finds them
+    all busy opens a one-off connection rather than waiting: requests gives
+    the pool no wait timeout, so blocking there could hang forever behind
+    a stream nobody closed. The async side is an httpx.AsyncClient with the same limits,
+    created on first use. Every call takes its own timeout and is recorded in
+    per-endpoint metrics.
+    """
+
+    def __init__(self, base_url: str, max_connections: int = 8, connect_timeout: float = 5,
+                 keepalive_expiry: float = 300):
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.keepalive_expiry = keepalive_expiry
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._async_client = None
+        self._metrics_lock = threading.Lock()
+        self._metrics = {}
+
+    # ------------------------------------------------------------------ metrics
+
+    def _record(self, path: str, elapsed: float, ok: bool):
+        with self._metrics_lock:
+            entry = self._metrics.setdefault(path, {'requests': 0, 'errors': 0, 'total_seconds': 0.0})
+            entry['requests'] += 1
+            entry['total_seconds'] += elapsed
+            if not ok:
+                entry['errors'] += 1
+
+    def _pool_stats(self):
+        """Connections opened vs requests served by the sync keep-alive pool"""
+        try:
+            poolmanager = self.session.get_adapter(self.base_url).poolmanager
+            opened = served = idle = 0
+            for key in list(poolmanager.pools.keys()):
+                pool = poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                served += pool.num_requests
+                idle += sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+            return {
+                'connections_opened': opened,
+                'requests_served': served,
+                'connections_reused': max(0, served - opened),
+                'idle_connections': idle,
+            }
+        except Exception as e:
+            return {'error': str(e)}
+
+    def stats(self):
+        with self._metrics_lock:
+            endpoints = {
+                path: {
+                    'requests': entry['requests'],
+                    'errors': entry['errors'],
+                    'avg_seconds': round(entry['total_seconds'] / entry['requests'], 3) if entry['requests'] else 0.0,
+                }
+                for path, entry in self._metrics.items()
+            }
+        return {
+            'base_url': self.base_url,
+            'max_connections': self.max_connections,
+            'endpoints': endpoints,
+            'sync_pool': self._pool_stats(),
+            'async_client': self._async_client is not None,
+        }
+
+    # ------------------------------------------------------------------ sync
+
+    def request(self, method: str, path: str, timeout: float, **kwargs):
+        """Sync request; timeout is the read timeout, connect uses connect_timeout"""
+        start_time = time.time()
+        ok = False
+        try:
+            response = self.session.request(
+                method, f"{self.base_url}{path}", timeout=(self.connect_timeout, timeout), **kwargs
+            )
+            ok = response.status_code < 500
+            return response
+        finally:
+            self._record(path, time.time() - start_time, ok)
+
+    def get(self, path: str, timeout: float = 10, **kwargs):
+        return self.request("GET", path, timeout, **kwargs)
+
+    def post(self, path: str, json: dict = None, timeout: float = 120, **kwargs):
+        return self.request("POST", path, timeout, json=json, **kwargs)
+
+    # ------------------------------------------------------------------ async
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import httpx
+
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(120, connect=self.connect_timeout),
+            )
+        return self._async_client
+
+    async def arequest(self, method: str, path: str, timeout: float, **kwargs):
+        import httpx
+
+        start_time = time.time()
+        ok = False
+        try:
+            response = await self.async_client.request(
+                method, path, timeout=httpx.Timeout(timeout, connect=self.connect_timeout), **kwargs
+            )
+            ok = response.status_code < 500
+            return response
+        finally:
+            self._record(path, time.time() - start_time, ok)
+
+    async def aget(self, path: str, timeout: float = 10, **kwargs):
+        return await self.arequest("GET", path, timeout, **kwargs)
+
+    async def apost(self, path: str, json: dict = None, timeout: float = 120, **kwargs):
+        return await self.arequest("POST", path, timeout, json=json, **kwargs)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,269 @@
+import os
+from collections import Counter
+
+# Rows read from disk per pass; only one block is in memory at a time
+SPREADSHEET_READ_ROWS = int(os.getenv('SPREADSHEET_READ_ROWS', '50000'))
+# Rows per searchable chunk, and how many of those chunks one file may add
+SPREADSHEET_ROWS_PER_CHUNK = int(os.getenv('SPREADSHEET_ROWS_PER_CHUNK', '25'))
+MAX_SPREADSHEET_ROW_CHUNKS = int(os.getenv('MAX_SPREADSHEET_ROW_CHUNKS', '2000'))
+
+DATE_KEYWORDS = ['date', 'time', 'month', 'year']
+MONEY_KEYWORDS = ['revenue', 'profit', 'sales', 'income', 'cost', 'price', 'amount']
+QUANTITY_KEYWORDS = ['quantity', 'units', 'count', 'number', 'qty']
+# Text columns with fewer distinct values than this are summarized as categories
+MAX_CATEGORIES = 20
+
+
+def dedupe_columns(names: list):
+    """Rename repeated headers the way pandas does: a, a.1, a.2, ...
+
+    A generated name that is already a header is skipped, so every column
+    name is unique.
+    """
+    seen = set(names)
+    counters = {}
+    columns = []
+    for name in names:
+        if name in counters:
+            while True:
+                candidate = f"{name}.{counters[name]}"
+                counters[name] += 1
+                if candidate not in seen:
+                    break
+            seen.add(candidate)
+            columns.append(candidate)
+        else:
+            counters[name] = 1
+            columns.append(name)
+    return columns
+
+
+def iter_frames(file_path: str, file_ext: str, read_rows: int = None):
+    """Yield the sheet as DataFrames of at most read_rows rows.
+
+    Every cell is read as text (dtype=str / object), so pandas never has to
+    guess a column type from a sample and then fail on a later block;
+    numeric columns are converted per block by SpreadsheetStats.
+    """
+    import pandas as pd
+
+    read_rows = read_rows or SPREADSHEET_READ_ROWS
+    if file_ext == 'csv':
+        yield from pd.read_csv(file_path, dtype=str, encoding='utf-8', encoding_errors='ignore', chunksize=read_rows)
+        return
+
+    if file_ext == 'xls':
+        # xlrd has no streaming reader; slice the sheet once it's loaded
+        df = pd.read_excel(file_path, dtype=str)
+        for start in range(0, len(df), read_rows):
+            yield df.iloc[start:start + read_rows]
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = dedupe_columns([str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)])
+        width = len(columns)
+        block = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            row = list(row[:width]) + [None] * (width - len(row))
+            block.append([None if value is None else str(value) for value in row])
+            if len(block) >= read_rows:
+                yield pd.DataFrame(block, columns=columns, dtype=object)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _format_number(value: float):
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+
+def _is_value(value):
+    return isinstance(value, str) and value != ""
+
+
+class SpreadsheetStats:
+    """Column statistics built up one block at a time.
+
+    Numeric columns are picked from the first block (at least 90% of its
+    values parse as numbers) and then keep a running count, sum, min and
+    max. Text columns keep value counts until they pass MAX_CATEGORIES
+    distinct values, after which they stop counting.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.numeric = []
+        self.rows = 0
+        self.sums = {}
+        self.counts = {}
+        self.minimums = {}
+        self.maximums = {}
+        self.categories = {}  # text column -> Counter, or None once it has too many values
+        self.date_ranges = {}
+        self.sample = []
+
+    def _start(self, frame):
+        import pandas as pd
+
+        self.columns = [str(col) for col in frame.columns]
+        for col, name in zip(frame.columns, self.columns):
+            values = frame[col].dropna()
+            parsed = pd.to_numeric(values, errors='coerce').count()
+            if len(values) and parsed >= 0.9 * len(values):
+                self.numeric.append(name)
+                self.sums[name] = 0.0
+                self.counts[name] = 0
+            else:
+                self.categories[name] = Counter()
+
+    def update(self, frame):
+        """Fold one block into the running statistics"""
+        import pandas as pd
+
+        if self.columns is None:
+            self._start(frame)
+        frame = frame.set_axis(self.columns, axis=1)
+        self.rows += len(frame)
+
+        if len(self.sample) < 3:
+            for values in zip(*(frame[col].tolist() for col in self.columns[:4])):
+                if len(self.sample) >= 3:
+                    break
+                self.sample.append(values)
+
+        for col in self.numeric:
+            values = pd.to_numeric(frame[col], errors='coerce').dropna()
+            if not len(values):
+                continue
+            self.sums[col] += float(values.sum())
+            self.counts[col] += int(values.count())
+            low, high = float(values.min()), float(values.max())
+            self.minimums[col] = min(low, self.minimums.get(col, low))
+            self.maximums[col] = max(high, self.maximums.get(col, high))
+
+        for col, counts in self.categories.items():
+            if counts is None:
+                continue
+            counts.update(frame[col].dropna().value_counts().to_dict())
+            if len(counts) >= MAX_CATEGORIES:
+                self.categories[col] = None
+
+        for col in self.columns:
+            if any(keyword in col.lower() for keyword in DATE_KEYWORDS):
+                values = frame[col].dropna()
+                if col in self.numeric:
+                    values = pd.to_numeric(values, errors='coerce').dropna()
+                if not len(values):
+                    continue
+                low, high = values.min(), values.max()
+                if col in self.date_ranges:
+                    low = min(low, self.date_ranges[col][0])
+                    high = max(high, self.date_ranges[col][1])
+                self.date_ranges[col] = (low, high)
+
+    def summary(self):
+        """The dataset overview text, as _read_spreadsheet has always produced it"""
+        if self.columns is None:
+            return "Dataset Overview:\n- Total records: 0\n"
+
+        text = "Dataset Overview:\n"
+        text += f"- Total records: {self.rows:,}\n"
+        text += f"- Columns: {', '.join(self.columns)}\n"
+        dtypes = [f"{col}({'float64' if col in self.numeric else 'object'})" for col in self.columns]
+        text += f"- Data types: {', '.join(dtypes)}\n"
+
+        if self.numeric:
+            text += "\nNumeric Analysis:\n"
+            for col in self.numeric:
+                if self.counts[col]:
+                    text += (f"- {col}: Total={_format_number(self.sums[col])}, "
+                             f"Avg={self.sums[col] / self.counts[col]:.2f}, "
+                             f"Min={_format_number(self.minimums[col])}, Max={_format_number(self.maximums[col])}\n")
+
+        categorical = {col: counts for col, counts in self.categories.items() if counts}
+        if categorical:
+            text += "\nCategorical Analysis:\n"
+            for col, counts in categorical.items():
+                text += f"- {col}: {', '.join([f'{val}({count})' for val, count in counts.most_common(3)])}\n"
+
+        text += "\nKey Insights:\n"
+        date_cols = [col for col in self.columns if col in self.date_ranges]
+        if date_cols:
+            low, high = self.date_ranges[date_cols[0]]
+            if date_cols[0] in self.numeric:
+                low, high = _format_number(low), _format_number(high)
+            text += f"- Time period: {low} to {high}\n"
+        for col in self.numeric:
+            if self.counts[col] and any(keyword in col.lower() for keyword in MONEY_KEYWORDS):
+                text += f"- Total {col}: ${_format_number(self.sums[col])}\n"
+        for col in self.numeric:
+            if self.counts[col] and any(keyword in col.lower() for keyword in QUANTITY_KEYWORDS):
+                text += f"- Total {col}: {_format_number(self.sums[col])}\n"
+
+        if self.sample:
+            text += "\nSample Data (first 3 rows):\n"
+            for i, values in enumerate(self.sample):
+                sample_text = " | ".join([f"{col}: {value}" for col, value in zip(self.columns[:4], values)])
+                text += f"{i+1}. {sample_text}\n"
+        return text
+
+
+def row_chunks(frame, columns: list, first_row: int, rows_per_chunk: int):
+    """Turn a block into searchable chunks of rows_per_chunk rows.
+
+    Each row becomes 'col: value | col: value' (empty cells left out), and
+    each chunk records the 1-based data rows it covers.
+    """
+    lines = [
+        " | ".join(f"{col}: {value}" for col, value in zip(columns, values) if _is_value(value))
+        for values in zip(*(frame.iloc[:, i].tolist() for i in range(len(columns))))
+    ]
+    chunks = []
+    for start in range(0, len(lines), rows_per_chunk):
+        group = [line for line in lines[start:start + rows_per_chunk] if line]
+        if not group:
+            continue
+        row_start = first_row + start
+        row_end = first_row + min(start + rows_per_chunk, len(lines)) - 1
+        chunks.append({
+            'text': f"Rows {row_start}-{row_end}:\n" + "\n".join(group),
+            'row_start': row_start,
+            'row_end': row_end,
+        })
+    return chunks
+
+
+def read_spreadsheet(file_path: str, file_ext: str, with_rows: bool = True,
+                     rows_per_chunk: int = None, max_row_chunks: int = None):
+    """One pass over the sheet: returns (summary text, row chunks).
+
+    Row chunks stop being collected after max_row_chunks (0 = no limit),
+    but the statistics still cover every row.
+    """
+    rows_per_chunk = rows_per_chunk or SPREADSHEET_ROWS_PER_CHUNK
+    max_row_chunks = MAX_SPREADSHEET_ROW_CHUNKS if max_row_chunks is None else max_row_chunks
+    stats = SpreadsheetStats()
+    chunks = []
+    for frame in iter_frames(file_path, file_ext):
+        first_row = stats.rows + 1
+        stats.update(frame)
+        if with_rows and not (max_row_chunks and len(chunks) >= max_row_chunks):
+            chunks += row_chunks(frame, stats.columns, first_row, rows_per_chunk)
+            if max_row_chunks:
+                chunks = chunks[:max_row_chunks]
+    if chunks and chunks[-1]['row_end'] < stats.rows:
+        print(f"📊 Indexed rows 1-{chunks[-1]['row_end']:,} of {stats.rows:,}; the rest are in the summary only")
+    return stats.summary(), chunks
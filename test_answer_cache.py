@@ -0,0 +1,68 @@
+# test_answer_cache.py
+import time
+
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+
+
+def vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_similar_question_over_same_chunks_hits():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put(vec(1, 0, 0), ["a", "b"], 0, "answer", [{"filename": "f.txt"}])
+
+    hit = cache.get(vec(0.99, 0.05, 0), ["b", "a"], 0)
+    assert hit['response'] == "answer"
+    assert hit['sources'] == [{"filename": "f.txt"}]
+    assert hit['similarity'] >= 0.95
+
+
+def test_different_question_or_chunks_miss():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put(vec(1, 0, 0), ["a"], 0, "answer", [])
+
+    assert cache.get(vec(0, 1, 0), ["a"], 0) is None
+    assert cache.get(vec(1, 0, 0), ["a", "c"], 0) is None
+    assert cache.stats()['misses'] == 2
+
+
+def test_newer_generation_drops_entries():
+    cache = SemanticAnswerCache()
+    cache.put(vec(1, 0), ["a"], 0, "old answer", [])
+
+    assert cache.get(vec(1, 0), ["a"], 1) is None
+    assert cache.stats()['entries'] == 0
+    assert cache.generation == 1
+
+
+def test_stale_generation_never_moves_back_or_stores():
+    cache = SemanticAnswerCache()
+    cache.put(vec(1, 0), ["a"], 2, "current", [])
+
+    # A search that started before the last ingest finishes late
+    cache.put(vec(0, 1), ["b"], 1, "stale", [])
+    assert cache.generation == 2
+    assert cache.get(vec(0, 1), ["b"], 2) is None
+    assert cache.get(vec(1, 0), ["a"], 1) is None
+    assert cache.get(vec(1, 0), ["a"], 2)['response'] == "current"
+
+
+def test_oldest_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.put(vec(1, 0, 0), ["a"], 0, "one", [])
+    cache.put(vec(0, 1, 0), ["a"], 0, "two", [])
+    cache.put(vec(0, 0, 1), ["a"], 0, "three", [])
+
+    assert cache.get(vec(1, 0, 0), ["a"], 0) is None
+    assert cache.get(vec(0, 0, 1), ["a"], 0)['response'] == "three"
+
+
+def test_expired_entries_miss():
+    cache = SemanticAnswerCache(ttl_seconds=0.01)
+    cache.put(vec(1, 0), ["a"], 0, "answer", [])
+    time.sleep(0.02)
+    assert cache.get(vec(1, 0), ["a"], 0) is None
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,88 @@
+# test_chat_sessions.py
+import asyncio
+
+from chat_sessions import ChatSession, ChatSessionStore
+
+
+def add(session, n, chunk_ids=(), tokens=10):
+    session.add_turn(f"q{n}", f"prompt {n}", f"context {n}", f"a{n}", list(chunk_ids), tokens)
+
+
+def test_sessions_without_id_are_never_shared():
+    store = ChatSessionStore()
+    first = store.get(None)
+    add(first, 1)
+    assert store.get(None).turns == []
+    assert store.stats()['sessions'] == 0
+
+
+def test_same_id_returns_same_session():
+    store = ChatSessionStore()
+    assert store.get("a") is store.get("a")
+    assert store.get("a") is not store.get("b")
+
+
+def test_least_recently_used_session_is_evicted():
+    store = ChatSessionStore(max_sessions=2)
+    a = store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+    assert store.get("a") is a
+    assert store.stats()['sessions'] == 2
+    assert store.reset("b") is False
+
+
+def test_idle_sessions_expire():
+    store = ChatSessionStore(ttl_seconds=0.01)
+    a = store.get("a")
+    a.last_used -= 1
+    assert store.get("a") is not a
+
+
+def test_reset_starts_a_new_conversation():
+    store = ChatSessionStore()
+    add(store.get("a"), 1)
+    assert store.reset("a") is True
+    assert store.get("a").turns == []
+
+
+def test_known_chunks_come_from_live_turns_only():
+    session = ChatSession("s")
+    add(session, 1, chunk_ids=["c1", "c2"], tokens=30)
+    add(session, 2, chunk_ids=["c2", "c3"], tokens=30)
+    assert session.chunk_ids() == {"c1", "c2", "c3"}
+
+    # Once a turn is trimmed its chunks count as unseen again
+    assert session.trim(40) == 1
+    assert session.chunk_ids() == {"c2", "c3"}
+    assert session.history_tokens() == 30
+    assert session.trimmed_turns == 1
+
+
+def test_messages_replay_turns_in_order():
+    session = ChatSession("s")
+    add(session, 1)
+    add(session, 2)
+    assert [m['role'] for m in session.messages("system")] == ["system", "user", "assistant", "user", "assistant"]
+    assert session.messages("system")[3]['content'] == "prompt 2"
+    assert session.context_text() == "context 1\n---\ncontext 2"
+
+
+def test_turn_lock_serializes_requests_on_one_session():
+    session = ChatSession("s")
+    events = []
+
+    async def turn(name):
+        async with session.turn_lock:
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            add(session, name)
+            events.append(f"{name} end")
+
+    async def main():
+        await asyncio.gather(turn(1), turn(2))
+
+    asyncio.run(main())
+    assert events == ["1 start", "1 end", "2 start", "2 end"]
+    assert [t['user'] for t in session.turns] == ["q1", "q2"]
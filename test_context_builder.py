@@ -0,0 +1,56 @@
+# test_context_builder.py
+from context_builder import TokenCounter, merge_adjacent_chunks, pack_context, source_label
+from file_processor import FileProcessor
+
+
+def chunk_matches(text, doc_id="doc", ranks=None):
+    """Search matches for the split_text chunks of text, in the given rank order"""
+    chunks = FileProcessor.split_text(text, chunk_size=50, chunk_overlap=10)
+    order = ranks if ranks is not None else range(len(chunks))
+    return [
+        {'id': f"{doc_id}-{i}", 'metadata': {'text': chunks[i], 'doc_id': doc_id, 'chunk_id': i, 'filename': 'a.txt'}}
+        for i in order
+    ]
+
+
+def test_merge_adjacent_chunks_removes_overlap():
+    text = " ".join(f"w{i}" for i in range(130))
+    passages = merge_adjacent_chunks(chunk_matches(text, ranks=[1, 0, 2]), max_overlap=10)
+
+    assert len(passages) == 1
+    assert passages[0]['words'] == text.split()
+    assert sorted(passages[0]['ids']) == ["doc-0", "doc-1", "doc-2"]
+
+
+def test_merge_keeps_gaps_separate():
+    text = " ".join(f"w{i}" for i in range(130))
+    passages = merge_adjacent_chunks(chunk_matches(text, ranks=[2, 0]), max_overlap=10)
+    assert [p['ids'] for p in passages] == [["doc-2"], ["doc-0"]]
+
+
+def test_pack_context_respects_budget():
+    counter = TokenCounter(default_chars_per_token=4.0)
+    matches = chunk_matches(" ".join(f"word{i}" for i in range(400)), ranks=[0, 4, 8])
+
+    context, sources, stats = pack_context(matches, 120, counter, "model", chunk_overlap=10, min_fragment_tokens=20)
+    assert counter.count(context, "model") <= 120
+    assert stats['truncated']
+    assert stats['chunk_ids'][0] == "doc-0"
+    assert sources[0] == "a.txt"
+
+
+def test_token_counter_calibrates():
+    counter = TokenCounter(default_chars_per_token=3.0)
+    counter.observe("model", "x" * 400, 100)
+    assert counter.count("x" * 400, "model") < counter.count("x" * 400, "other")
+
+
+def test_source_label_pages():
+    assert source_label({'filename': 'a.pdf', 'file_type': 'pdf', 'page_start': 2, 'page_end': 2}) == "a.pdf (pdf) p. 2"
+    assert source_label({'filename': 'a.pdf', 'page_start': 2, 'page_end': 4}) == "a.pdf pp. 2-4"
+    assert source_label({'filename': 'a.txt', 'file_type': 'txt'}) == "a.txt (txt)"
+
+
+def test_source_label_rows():
+    assert source_label({'filename': 'b.csv', 'row_start': 1, 'row_end': 25}) == "b.csv rows 1-25"
+    assert source_label({'filename': 'b.csv', 'file_type': 'csv', 'row_start': 26, 'row_end': 26}) == "b.csv (csv) rows 26-26"
@@ -0,0 +1,42 @@
+# test_embedding_cache.py
+from embedding_cache import QueryEmbeddingCache
+
+
+def test_trivially_different_queries_share_an_entry():
+    cache = QueryEmbeddingCache()
+    cache.put("What is  the Total?", [1.0, 2.0])
+    assert cache.get(" what is the total? ") == [1.0, 2.0]
+    assert cache.get("what is the total") is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_least_recently_used_query_is_evicted():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0]
+    assert cache.stats()['size'] == 2
+
+
+def test_entries_expire():
+    cache = QueryEmbeddingCache(ttl_seconds=0.01)
+    cache.put("a", [1.0])
+    key = cache.normalize("a")
+    embedding, stored_at = cache._entries[key]
+    cache._entries[key] = (embedding, stored_at - 1)
+    assert cache.get("a") is None
+    assert cache.stats()['size'] == 0
+
+
+def test_zero_size_disables_and_clear_empties():
+    disabled = QueryEmbeddingCache(max_size=0)
+    disabled.put("a", [1.0])
+    assert disabled.get("a") is None
+
+    cache = QueryEmbeddingCache()
+    cache.put("a", [1.0])
+    cache.clear()
+    assert cache.get("a") is None
@@ -0,0 +1,83 @@
+# test_embedding_service.py
+import threading
+
+import numpy as np
+
+from embedding_service import BatchingEmbedder
+
+
+class RecordingEmbedder:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def encode(self, texts, batch_size=None):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model not loaded")
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+def encode_concurrently(batcher, texts):
+    """Encode each text on its own thread; returns results and errors in input order"""
+    results = [None] * len(texts)
+    errors = [None] * len(texts)
+    start = threading.Barrier(len(texts))
+
+    def run(i):
+        start.wait()
+        try:
+            results[i] = batcher.encode(texts[i], timeout=5)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results, errors
+
+
+def test_concurrent_queries_share_batches():
+    embedder = RecordingEmbedder()
+    batcher = BatchingEmbedder(embedder, window_ms=200, max_batch_size=32)
+    texts = [f"query {'x' * i}" for i in range(8)]
+
+    results, errors = encode_concurrently(batcher, texts)
+    assert errors == [None] * 8
+    assert results == [[float(len(text))] for text in texts]
+    assert len(embedder.calls) < len(texts)
+    assert batcher.stats()['queries'] == 8
+
+
+def test_identical_queries_are_encoded_once():
+    embedder = RecordingEmbedder()
+    batcher = BatchingEmbedder(embedder, window_ms=200)
+
+    results, _ = encode_concurrently(batcher, ["same"] * 4)
+    assert results == [[4.0]] * 4
+    assert [text for call in embedder.calls for text in call].count("same") < 4
+
+
+def test_batch_size_cap():
+    embedder = RecordingEmbedder()
+    batcher = BatchingEmbedder(embedder, window_ms=200, max_batch_size=2)
+    encode_concurrently(batcher, [f"q{i}" for i in range(6)])
+    assert all(len(call) <= 2 for call in embedder.calls)
+    assert batcher.stats()['largest_batch'] <= 2
+
+
+def test_errors_reach_every_caller():
+    batcher = BatchingEmbedder(RecordingEmbedder(fail=True), window_ms=50)
+    results, errors = encode_concurrently(batcher, ["a", "b", "c"])
+    assert results == [None] * 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_zero_window_encodes_inline():
+    embedder = RecordingEmbedder()
+    batcher = BatchingEmbedder(embedder, window_ms=0)
+    assert batcher.encode("abc") == [3.0]
+    assert embedder.calls == [["abc"]]
+    assert batcher._worker is None
@@ -0,0 +1,58 @@
+# test_embedding_store.py
+import numpy as np
+
+from embedding_store import EmbeddingStore, content_hash, embed_with_store
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_content_hash_is_stable():
+    assert content_hash("hello") == content_hash("hello")
+    assert content_hash("hello") != content_hash("hello ")
+
+
+def test_only_missing_texts_are_encoded(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store.db"), "model-a")
+    encode = CountingEncoder()
+    texts = ["alpha", "beta", "alpha"]
+    hashes = [content_hash(text) for text in texts]
+
+    embeddings, computed = embed_with_store(texts, hashes, store, encode)
+    assert computed == 2
+    assert encode.batches == [["alpha", "beta"]]
+    assert [e.tolist() for e in embeddings] == [[5.0, 1.0], [4.0, 1.0], [5.0, 1.0]]
+
+    embeddings, computed = embed_with_store(["beta", "gamma"], [hashes[1], content_hash("gamma")], store, encode)
+    assert computed == 1
+    assert encode.batches[-1] == ["gamma"]
+    assert embeddings[0].tolist() == [4.0, 1.0]
+
+
+def test_store_persists_and_is_scoped_to_the_model(tmp_path):
+    path = str(tmp_path / "store.db")
+    h = content_hash("alpha")
+    EmbeddingStore(path, "model-a").put_many({h: np.array([1.0, 2.0])})
+
+    reopened = EmbeddingStore(path, "model-a")
+    assert reopened.get_many([h])[h].tolist() == [1.0, 2.0]
+    assert EmbeddingStore(path, "model-b").get_many([h]) == {}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store.db"), "model-a", max_entries=10)
+    store.put_many({f"h{i}": np.array([float(i)]) for i in range(10)})
+    # Touch h0 so it is the most recently used
+    store.get_many(["h0"])
+    store.put_many({"h10": np.array([10.0])})
+
+    # Evicts down to 90% of max_entries, oldest first
+    assert store.stats()['entries'] == 9
+    assert "h0" in store.get_many(["h0"])
+    assert "h10" in store.get_many(["h10"])
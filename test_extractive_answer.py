@@ -0,0 +1,63 @@
+# test_extractive_answer.py
+import numpy as np
+
+from extractive_answer import ExtractiveAnswerer, split_sentences
+
+VOCABULARY = ["invoice", "total", "paid", "weather", "sunny", "shipping", "days"]
+
+
+def bag_of_words(texts):
+    """Stand-in embedder: counts of each vocabulary word"""
+    return np.array([[text.lower().count(word) for word in VOCABULARY] for text in texts], dtype=np.float32)
+
+
+def test_split_sentences_keeps_order_and_drops_duplicates():
+    context = ("The invoice total was 400 dollars. It was paid in March.\n---\n"
+               "The invoice total was 400 dollars. Shipping took five days.")
+    assert split_sentences(context) == [
+        "The invoice total was 400 dollars.",
+        "It was paid in March.",
+        "Shipping took five days.",
+    ]
+
+
+def test_split_sentences_windows_unpunctuated_text():
+    row = " ".join(f"cell{i}" for i in range(200))
+    spans = split_sentences(row, max_chars=100)
+    assert len(spans) > 1
+    assert all(len(span) <= 100 for span in spans)
+    assert " ".join(spans) == row
+
+
+def test_short_fragments_are_skipped():
+    assert split_sentences("Too short. Also tiny.") == []
+
+
+def test_best_sentences_ranked_by_similarity_returned_in_document_order():
+    answerer = ExtractiveAnswerer(bag_of_words, top_n=2, min_score=0.1)
+    context = ("The invoice was sent by post on Monday. The weather was sunny all week. "
+               "The invoice total was paid in full.")
+
+    best = answerer.best_sentences("When was the invoice total paid?", context)
+    assert [sentence for sentence, _ in best] == [
+        "The invoice was sent by post on Monday.",
+        "The invoice total was paid in full.",
+    ]
+    assert best[1][1] > 0.99 > best[0][1] > 0.5
+
+
+def test_min_score_filters_unrelated_sentences():
+    answerer = ExtractiveAnswerer(bag_of_words, top_n=3, min_score=0.5)
+    context = "The weather was sunny all week. Shipping took five days to arrive."
+    assert answerer.best_sentences("What was the invoice total?", context) == []
+
+
+def test_question_and_sentences_are_encoded_in_one_call():
+    calls = []
+
+    def encode(texts):
+        calls.append(len(texts))
+        return bag_of_words(texts)
+
+    ExtractiveAnswerer(encode).best_sentences("invoice?", "The invoice total was 400. It was paid in March.")
+    assert calls == [3]
@@ -0,0 +1,89 @@
+# test_file_processor.py
+import pytest
+
+import file_processor
+from file_processor import FileProcessor
+
+
+def pages_of(word_counts):
+    """(page_no, text) pairs with distinct words, numbered from 1"""
+    return [(n + 1, " ".join(f"p{n + 1}w{i}" for i in range(count))) for n, count in enumerate(word_counts)]
+
+
+def split_text_uncapped(text, chunk_size=500, chunk_overlap=100):
+    words = text.split()
+    chunks = []
+    for i in range(0, len(words), chunk_size - chunk_overlap):
+        chunks.append(" ".join(words[i:i + chunk_size]))
+        if i + chunk_size >= len(words):
+            break
+    return chunks
+
+
+@pytest.mark.parametrize("word_counts", [[], [5], [500], [400, 100], [37, 250, 0, 913, 12], [120] * 60])
+def test_split_pages_matches_split_text(word_counts):
+    pages = pages_of(word_counts)
+    text = "".join(text + "\n" for _, text in pages)
+    chunks = list(FileProcessor.split_pages(iter(pages)))
+
+    assert [chunk['text'] for chunk in chunks] == split_text_uncapped(text)
+    # split_text caps at 15 chunks; split_pages produces the same first ones
+    assert FileProcessor.split_text(text) == [chunk['text'] for chunk in chunks][:15] or not text.strip()
+
+
+def test_split_pages_tracks_pages():
+    chunks = list(FileProcessor.split_pages(iter(pages_of([300, 300, 300])), chunk_size=500, chunk_overlap=100))
+    assert [(c['page_start'], c['page_end']) for c in chunks] == [(1, 2), (2, 3)]
+    for chunk in chunks:
+        pages = {int(word[1:word.index('w')]) for word in chunk['text'].split()}
+        assert pages == set(range(chunk['page_start'], chunk['page_end'] + 1))
+
+
+def test_split_pages_max_chunks():
+    chunks = list(FileProcessor.split_pages(iter(pages_of([120] * 60)), max_chunks=3))
+    assert len(chunks) == 3
+
+
+def test_pdf_workers_sized_from_cores(monkeypatch):
+    monkeypatch.setattr(file_processor, "PDF_WORKERS", 0)
+    monkeypatch.setattr(file_processor, "available_cores", lambda: 16)
+    assert file_processor.pdf_workers() == 4
+    monkeypatch.setattr(file_processor, "available_cores", lambda: 2)
+    assert file_processor.pdf_workers() == 1
+    monkeypatch.setattr(file_processor, "PDF_WORKERS", 6)
+    assert file_processor.pdf_workers() == 6
+
+
+def test_disabled_pdf_pool_reads_in_line(monkeypatch):
+    class FakePool:
+        shut_down = False
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shut_down = True
+
+    pool = FakePool()
+    monkeypatch.setattr(file_processor, "PDF_WORKERS", 8)
+    monkeypatch.setattr(file_processor, "_pdf_pool", pool)
+    monkeypatch.setattr(file_processor, "_pdf_pool_enabled", True)
+
+    file_processor.disable_pdf_pool()
+    assert pool.shut_down
+    assert file_processor._pdf_pool is None
+    assert file_processor.pdf_workers() == 1
+
+
+def test_extract_chunks_text_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    text = " ".join(f"word{i}" for i in range(700))
+    path.write_text(text, encoding="utf-8")
+
+    length, preview, chunks = FileProcessor.extract_chunks(str(path), "notes.txt")
+    assert length == len(text)
+    assert preview == text[:200]
+    assert [chunk['text'] for chunk in chunks] == FileProcessor.split_text(text)
+
+
+def test_extract_chunks_too_short(tmp_path):
+    path = tmp_path / "tiny.txt"
+    path.write_text("hi", encoding="utf-8")
+    assert FileProcessor.extract_chunks(str(path), "tiny.txt") == (2, "hi", [])
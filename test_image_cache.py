@@ -0,0 +1,49 @@
+# test_image_cache.py
+import hashlib
+
+from image_cache import ImageCache, file_sha256
+
+
+def test_file_sha256_matches_hashlib(tmp_path):
+    path = tmp_path / "image.png"
+    data = bytes(range(256)) * 10
+    path.write_bytes(data)
+    assert file_sha256(str(path), block_size=100) == hashlib.sha256(data).hexdigest()
+
+
+def test_hit_by_original_hash_and_by_normalized_hash():
+    cache = ImageCache()
+    cache.put("original", b"jpeg", "anBlZw==")
+
+    assert cache.get("original") == (b"jpeg", "anBlZw==")
+    assert cache.get(hashlib.sha256(b"jpeg").hexdigest()) == (b"jpeg", "anBlZw==")
+    assert cache.get("other") is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 1)
+
+
+def test_bounded_by_stored_bytes():
+    cache = ImageCache(max_bytes=25)
+    cache.put("a", b"a" * 5, "a" * 5)
+    cache.put("b", b"b" * 5, "b" * 5)
+    cache.get("a")
+    cache.put("c", b"c" * 5, "c" * 5)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get(hashlib.sha256(b"b" * 5).hexdigest()) is None
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, 20, 1)
+
+
+def test_oversized_entry_is_not_stored():
+    cache = ImageCache(max_bytes=10)
+    cache.put("big", b"x" * 8, "x" * 8)
+    assert cache.get("big") is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_replacing_an_entry_keeps_the_byte_count():
+    cache = ImageCache()
+    cache.put("a", b"x" * 4, "x" * 4)
+    cache.put("a", b"x" * 4, "x" * 4)
+    assert cache.stats()['bytes'] == 8
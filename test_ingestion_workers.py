@@ -0,0 +1,82 @@
+# test_ingestion_workers.py
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from ingestion_workers import IngestionPool
+
+
+class FakeExecutor:
+    """Stands in for ProcessPoolExecutor: each submit pops the next outcome"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.submitted = 0
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            future.set_exception(outcome)
+        else:
+            future.set_result(outcome)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def make_pool(monkeypatch, *executors):
+    queue = list(executors)
+    monkeypatch.setattr(IngestionPool, "_new_executor", lambda self: queue.pop(0))
+    return IngestionPool(1, "model", "store", 10)
+
+
+def test_broken_pool_is_restarted_and_job_retried(monkeypatch):
+    first = FakeExecutor([BrokenProcessPool("worker died")])
+    second = FakeExecutor([{'seconds': 1.0}])
+    pool = make_pool(monkeypatch, first, second)
+
+    assert pool.process("a.pdf", "a.pdf") == {'seconds': 1.0}
+    assert first.shut_down
+    assert second.submitted == 1
+    stats = pool.stats()
+    assert (stats['restarts'], stats['completed'], stats['failed'], stats['pending']) == (1, 1, 0, 0)
+
+
+def test_job_that_breaks_the_new_pool_too_fails(monkeypatch):
+    first = FakeExecutor([BrokenProcessPool("worker died")])
+    second = FakeExecutor([BrokenProcessPool("worker died again")])
+    third = FakeExecutor([])
+    pool = make_pool(monkeypatch, first, second, third)
+
+    with pytest.raises(BrokenProcessPool):
+        pool.process("bad.pdf", "bad.pdf")
+    # The pool is replaced again so later uploads still have workers
+    assert pool._executor is third
+    stats = pool.stats()
+    assert (stats['restarts'], stats['completed'], stats['failed'], stats['pending']) == (2, 0, 1, 0)
+
+
+def test_other_errors_are_not_retried(monkeypatch):
+    executor = FakeExecutor([ValueError("bad file")])
+    pool = make_pool(monkeypatch, executor)
+
+    with pytest.raises(ValueError):
+        pool.process("a.txt", "a.txt")
+    assert executor.submitted == 1
+    assert pool.stats()['restarts'] == 0
+
+
+def test_restart_ignores_an_already_replaced_executor(monkeypatch):
+    first = FakeExecutor([])
+    second = FakeExecutor([])
+    pool = make_pool(monkeypatch, first, second)
+
+    pool._restart(first)
+    pool._restart(first)
+    assert pool._executor is second
+    assert pool.restarts == 1
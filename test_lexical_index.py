@@ -0,0 +1,52 @@
+# test_lexical_index.py
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = [
+    "The quarterly sales report for the northern region",
+    "Instructions for assembling the standing desk",
+    "Part AB-1234 is the replacement fan for the server",
+    "Laptops come with a two year warranty period",
+    "The cafeteria menu for this week",
+]
+
+
+def make_index(tmp_path):
+    index = BM25Index(str(tmp_path / "lexical.jsonl"))
+    index.add_documents([(f"d{i}", {'text': text, 'file_type': 'txt'}) for i, text in enumerate(DOCUMENTS)])
+    return index
+
+
+def test_tokenize_keeps_part_numbers_and_drops_stopwords():
+    tokens = tokenize("What is the price of AB-1234?")
+    assert "ab-1234" in tokens and "1234" in tokens
+    assert not {"what", "is", "the", "of"} & set(tokens)
+
+
+def test_stopwords_alone_match_nothing(tmp_path):
+    assert make_index(tmp_path).search("what is this for") == []
+
+
+def test_ranking_and_coverage(tmp_path):
+    matches = make_index(tmp_path).search("what is the warranty period for laptops")
+    assert matches[0]['id'] == "d3"
+    assert matches[0]['coverage'] == 1.0
+    assert make_index(tmp_path).search("1234")[0]['id'] == "d2"
+
+
+def test_filter_and_reload(tmp_path):
+    index = make_index(tmp_path)
+    assert index.search("desk", filter={'file_type': 'pdf'}) == []
+
+    reloaded = BM25Index(str(tmp_path / "lexical.jsonl"))
+    assert reloaded.stats()['chunks'] == len(DOCUMENTS)
+    assert reloaded.search("desk")[0]['id'] == "d1"
+
+
+def test_reciprocal_rank_fusion():
+    vector = [{'id': "a", 'score': 0.9, 'metadata': {}}, {'id': "b", 'score': 0.8, 'metadata': {}}]
+    lexical = [{'id': "b", 'score': 7.0, 'metadata': {}}, {'id': "c", 'score': 3.0, 'metadata': {}}]
+    fused = reciprocal_rank_fusion({'vector': vector, 'lexical': lexical}, k=60)
+
+    assert [m['id'] for m in fused] == ["b", "a", "c"]
+    assert fused[0]['score'] == 1 / 62 + 1 / 61
+    assert fused[1]['lexical_score'] is None and fused[1]['vector_score'] == 0.9
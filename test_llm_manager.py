@@ -0,0 +1,40 @@
+# test_llm_manager.py
+import threading
+
+from llm_manager import CancelToken
+
+
+def test_cancel_token_runs_callbacks_once():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append("first"))
+    token.on_cancel(lambda: calls.append("second"))
+    assert calls == []
+
+    token.set()
+    token.set()
+    assert token.is_set()
+    assert calls == ["first", "second"]
+
+
+def test_cancel_token_late_callback_runs_immediately():
+    token = CancelToken()
+    token.set()
+    calls = []
+    token.on_cancel(lambda: calls.append("late"))
+    assert calls == ["late"]
+
+
+def test_cancel_token_survives_failing_callback():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: 1 / 0)
+    token.on_cancel(lambda: calls.append("after"))
+    token.set()
+    assert calls == ["after"]
+
+
+def test_cancel_token_is_an_event():
+    token = CancelToken()
+    threading.Timer(0.01, token.set).start()
+    assert token.wait(2)
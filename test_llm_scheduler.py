@@ -0,0 +1,60 @@
+# test_llm_scheduler.py
+import threading
+
+import pytest
+
+from llm_scheduler import LLMScheduler, SchedulerFull, INTERACTIVE, BACKGROUND
+
+
+def blocked_scheduler(max_queue):
+    """A one-worker scheduler whose worker is held until the returned event is set"""
+    scheduler = LLMScheduler(max_in_flight=1, max_queue=max_queue)
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    blocker = scheduler.submit(hold)
+    assert started.wait(5)
+    return scheduler, release, blocker
+
+
+def test_interactive_runs_before_background():
+    scheduler, release, blocker = blocked_scheduler(max_queue=10)
+    order = []
+    futures = [
+        scheduler.submit(order.append, "background-1", priority=BACKGROUND),
+        scheduler.submit(order.append, "interactive-1", priority=INTERACTIVE),
+        scheduler.submit(order.append, "background-2", priority=BACKGROUND),
+        scheduler.submit(order.append, "interactive-2", priority=INTERACTIVE),
+    ]
+    release.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+
+    assert order == ["interactive-1", "interactive-2", "background-1", "background-2"]
+
+
+def test_full_queue_raises_with_retry_after():
+    scheduler, release, blocker = blocked_scheduler(max_queue=2)
+    queued = [scheduler.submit(lambda: None), scheduler.submit(lambda: None)]
+
+    with pytest.raises(SchedulerFull) as excinfo:
+        scheduler.submit(lambda: None)
+    assert excinfo.value.retry_after >= 1
+    assert scheduler.stats()['rejected'] == 1
+
+    release.set()
+    for future in [blocker] + queued:
+        future.result(timeout=5)
+    scheduler.submit(lambda: None).result(timeout=5)
+
+
+def test_exceptions_reach_the_future():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue=4)
+    future = scheduler.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        future.result(timeout=5)
+    assert scheduler.stats()['failed'] == 1
@@ -0,0 +1,103 @@
+# test_local_index.py
+import numpy as np
+
+from local_index import LocalVectorIndex
+
+
+def make_vectors(count=600, dimension=32, clusters=12, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension))
+    labels = rng.integers(0, clusters, size=count)
+    return (centers[labels] + 0.1 * rng.standard_normal((count, dimension))).astype(np.float32)
+
+
+def fill(index, vectors):
+    index.upsert([
+        {'id': f"v{i}", 'values': vector.tolist(),
+         'metadata': {'text': f"chunk {i}", 'file_type': 'pdf' if i % 2 else 'csv', 'uploaded_at': float(i)}}
+        for i, vector in enumerate(vectors)
+    ])
+
+
+def test_exact_search_returns_the_vector_itself(tmp_path):
+    vectors = make_vectors()
+    index = LocalVectorIndex(str(tmp_path), dimension=32, search_mode="exact")
+    fill(index, vectors)
+
+    matches = index.query(vectors[7], top_k=3)['matches']
+    assert matches[0]['id'] == "v7"
+    assert abs(matches[0]['score'] - 1.0) < 1e-5
+    assert matches[0]['metadata']['text'] == "chunk 7"
+
+
+def test_ivf_probing_every_list_matches_exact(tmp_path):
+    vectors = make_vectors()
+    index = LocalVectorIndex(str(tmp_path), dimension=32, search_mode="approximate", n_probe=1000)
+    fill(index, vectors)
+    index.build_ivf(n_lists=10)
+
+    for row in (0, 123, 599):
+        exact = [m['id'] for m in index.query(vectors[row], top_k=10, exact=True)['matches']]
+        approximate = [m['id'] for m in index.query(vectors[row], top_k=10)['matches']]
+        assert approximate == exact
+
+
+def test_ivf_recall_with_few_probes(tmp_path):
+    vectors = make_vectors()
+    index = LocalVectorIndex(str(tmp_path), dimension=32, search_mode="approximate", n_probe=3)
+    fill(index, vectors)
+    index.build_ivf(n_lists=12)
+
+    assert index.measure_recall(sample_size=50, top_k=10)['recall'] >= 0.9
+
+
+def test_reload_and_overwrite(tmp_path):
+    vectors = make_vectors(count=50)
+    index = LocalVectorIndex(str(tmp_path), dimension=32)
+    fill(index, vectors)
+    index.upsert([{'id': "v3", 'values': vectors[4].tolist(), 'metadata': {'text': "moved"}}])
+
+    reloaded = LocalVectorIndex(str(tmp_path), dimension=32)
+    assert reloaded.count == 50
+    top = reloaded.query(vectors[4], top_k=2)['matches']
+    assert {m['id'] for m in top} == {"v3", "v4"}
+    assert reloaded.metadata[reloaded._row_by_id["v3"]]['text'] == "moved"
+
+
+def test_quantized_reload_and_overwrite(tmp_path):
+    vectors = make_vectors(count=50)
+    index = LocalVectorIndex(str(tmp_path), dimension=32, storage="int8", keep_full=True)
+    fill(index, vectors)
+    index.upsert([{'id': "v3", 'values': vectors[4].tolist(), 'metadata': {'text': "moved"}}])
+
+    reloaded = LocalVectorIndex(str(tmp_path), dimension=32, storage="int8", keep_full=True)
+    assert reloaded.count == 50
+    top = reloaded.query(vectors[4], top_k=2)['matches']
+    assert {m['id'] for m in top} == {"v3", "v4"}
+    assert reloaded.metadata[reloaded._row_by_id["v3"]]['text'] == "moved"
+
+
+def test_measure_recall_without_rescoring(tmp_path):
+    vectors = make_vectors()
+    plain = LocalVectorIndex(str(tmp_path / "plain"), dimension=32, search_mode="exact", storage="int8")
+    fill(plain, vectors)
+    assert plain.measure_recall(sample_size=20) is None
+    recall = plain.measure_recall(sample_size=20, reference=vectors)
+    assert recall['recall'] == recall['recall_no_rescore']
+
+    rescored = LocalVectorIndex(str(tmp_path / "rescored"), dimension=32, search_mode="exact",
+                                storage="int8", rescore=True)
+    fill(rescored, vectors)
+    recall = rescored.measure_recall(sample_size=20)
+    assert recall['recall'] >= recall['recall_no_rescore']
+
+
+def test_filter_is_applied_before_ranking(tmp_path):
+    vectors = make_vectors()
+    index = LocalVectorIndex(str(tmp_path), dimension=32, search_mode="exact")
+    fill(index, vectors)
+
+    matches = index.query(vectors[8], top_k=5, filter={'file_type': 'pdf', 'uploaded_at': {'$lt': 100}})['matches']
+    assert len(matches) == 5
+    assert all(m['metadata']['file_type'] == 'pdf' and m['metadata']['uploaded_at'] < 100 for m in matches)
+    assert "v8" not in {m['id'] for m in matches}
@@ -0,0 +1,37 @@
+# test_metadata_filter.py
+import pytest
+
+from metadata_filter import build_filter, matches_filter
+
+METADATA = {'file_type': 'pdf', 'filename': 'report.pdf', 'doc_id': 'doc-1', 'uploaded_at': 100.0}
+
+
+def test_build_filter():
+    assert build_filter() is None
+    assert build_filter(file_type="PDF") == {'file_type': {'$eq': 'pdf'}}
+    assert build_filter(file_type=["PNG", "jpg"], uploaded_after=10, uploaded_before=20) == {
+        'file_type': {'$in': ['png', 'jpg']},
+        'uploaded_at': {'$gte': 10, '$lte': 20},
+    }
+
+
+def test_matches_built_filters():
+    assert matches_filter(METADATA, build_filter(file_type="pdf", doc_id=["doc-1", "doc-2"]))
+    assert matches_filter(METADATA, build_filter(uploaded_after=100))
+    assert not matches_filter(METADATA, build_filter(uploaded_before=99))
+    assert not matches_filter(METADATA, build_filter(filename="other.pdf"))
+
+
+def test_operators_and_logic():
+    assert matches_filter(METADATA, None)
+    assert matches_filter(METADATA, {'file_type': 'pdf'})
+    assert matches_filter(METADATA, {'file_type': {'$ne': 'csv'}, 'doc_id': {'$nin': ['doc-2']}})
+    assert matches_filter(METADATA, {'$or': [{'file_type': 'csv'}, {'uploaded_at': {'$gt': 50}}]})
+    assert not matches_filter(METADATA, {'$and': [{'file_type': 'pdf'}, {'uploaded_at': {'$lt': 50}}]})
+    # A missing field never satisfies a range
+    assert not matches_filter({'file_type': 'pdf'}, {'uploaded_at': {'$gte': 0}})
+
+
+def test_unknown_operator():
+    with pytest.raises(ValueError):
+        matches_filter(METADATA, {'file_type': {'$regex': 'p.*'}})
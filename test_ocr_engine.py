@@ -0,0 +1,69 @@
+# test_ocr_engine.py
+import numpy as np
+import pytest
+
+import ocr_engine
+
+
+class FakeReader:
+    """Returns one confident and one unsure box per image, tagged with the image's fill value"""
+
+    def __init__(self):
+        self.single = 0
+        self.batches = []
+
+    def _result(self, array):
+        value = int(array.flat[0])
+        return [([], f" text{value} ", 0.9), ([], "noise", 0.1)]
+
+    def readtext(self, array, batch_size=None):
+        self.single += 1
+        return self._result(array)
+
+    def readtext_batched(self, arrays, batch_size=None):
+        self.batches.append(len(arrays))
+        return [self._result(array) for array in arrays]
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    fake = FakeReader()
+    monkeypatch.setattr(ocr_engine, "_reader", fake)
+    return fake
+
+
+def image(value, shape=(10, 10)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_same_size_images_are_batched(reader):
+    images = [image(i) for i in range(5)]
+    assert ocr_engine.ocr_images(images, min_confidence=0.3, batch_size=2) == [f"text{i}" for i in range(5)]
+    assert reader.batches == [2, 2, 1]
+    assert reader.single == 0
+
+
+def test_mixed_sizes_keep_input_order(reader):
+    images = [image(1), image(2, (20, 10)), image(3), None]
+    texts = ocr_engine.ocr_images(images, min_confidence=0.3)
+    assert texts == ["text1", "text2", "text3", None]
+    assert reader.batches == [2]
+    assert reader.single == 1
+
+
+def test_min_confidence(reader):
+    assert ocr_engine.ocr_images([image(7)], min_confidence=0.05) == ["text7 noise"]
+    assert ocr_engine.ocr_images([image(7)], min_confidence=0.95) == [""]
+
+
+def test_reader_is_shared(reader):
+    assert ocr_engine.get_reader() is reader
+    assert ocr_engine.warm_up() is True
+
+
+def test_warm_up_never_raises(monkeypatch):
+    def broken():
+        raise RuntimeError("weights not downloadable")
+
+    monkeypatch.setattr(ocr_engine, "get_reader", broken)
+    assert ocr_engine.warm_up() is False
@@ -0,0 +1,61 @@
+# test_ollama_client.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ollama_client import OllamaClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"models": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_full_pool_does_not_block(server):
+    client = OllamaClient(server, max_connections=1)
+    held = client.get("/api/tags", timeout=5, stream=True)
+    try:
+        # The only pooled connection is still checked out by the open stream
+        done = []
+        thread = threading.Thread(target=lambda: done.append(client.get("/api/tags", timeout=5).json()))
+        thread.start()
+        thread.join(5)
+        assert done == [{"models": []}]
+    finally:
+        held.close()
+        client.close()
+
+
+def test_connections_are_reused_and_recorded(server):
+    client = OllamaClient(server, max_connections=2)
+    try:
+        for _ in range(3):
+            assert client.get("/api/tags", timeout=5).status_code == 200
+        stats = client.stats()
+        assert stats['endpoints']['/api/tags']['requests'] == 3
+        assert stats['endpoints']['/api/tags']['errors'] == 0
+        assert stats['sync_pool']['connections_opened'] == 1
+        assert stats['sync_pool']['connections_reused'] == 2
+    finally:
+        client.close()
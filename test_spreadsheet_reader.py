@@ -0,0 +1,81 @@
+# test_spreadsheet_reader.py
+import pytest
+
+from spreadsheet_reader import dedupe_columns, read_spreadsheet
+
+CSV = """Date,Region,Revenue,Units,Note
+2024-01-01,North,100.5,3,first
+2024-02-01,South,200,4,
+2024-03-01,North,50,abc,third
+2024-04-01,East,,5,fourth
+"""
+
+
+def test_dedupe_columns():
+    assert dedupe_columns(["a", "a", "a"]) == ["a", "a.1", "a.2"]
+    assert dedupe_columns(["a", "a.1", "a"]) == ["a", "a.1", "a.2"]
+    names = dedupe_columns(["a", "a", "a.1", "b"])
+    assert len(set(names)) == 4 and names[0] == "a" and names[3] == "b"
+
+
+def test_csv_stats_across_blocks(tmp_path, monkeypatch):
+    pytest.importorskip("pandas")
+    import spreadsheet_reader
+
+    path = tmp_path / "sales.csv"
+    path.write_text(CSV, encoding="utf-8")
+    # Two rows per block, so every statistic has to be combined across blocks
+    monkeypatch.setattr(spreadsheet_reader, "SPREADSHEET_READ_ROWS", 2)
+    summary, chunks = read_spreadsheet(str(path), "csv", rows_per_chunk=3)
+
+    assert "- Total records: 4" in summary
+    assert "Revenue(float64)" in summary and "Region(object)" in summary
+    assert "- Revenue: Total=350.50, Avg=116.83, Min=50, Max=200" in summary
+    assert "- Units: Total=12, Avg=4.00, Min=3, Max=5" in summary
+    assert "- Region: North(2), South(1), East(1)" in summary
+    assert "- Time period: 2024-01-01 to 2024-04-01" in summary
+    assert "- Total Revenue: $350.50" in summary
+
+    assert [(c['row_start'], c['row_end']) for c in chunks] == [(1, 2), (3, 4)]
+    assert chunks[0]['text'].startswith("Rows 1-2:\nDate: 2024-01-01 | Region: North | Revenue: 100.5")
+    # Empty cells are left out of the row text
+    assert "Note" not in chunks[0]['text'].splitlines()[2]
+
+
+def test_csv_ignores_undecodable_bytes(tmp_path):
+    pytest.importorskip("pandas")
+    path = tmp_path / "latin.csv"
+    path.write_bytes("name,qty\ncaf\xe9,1\ntea,2\n".encode("latin-1"))
+    summary, chunks = read_spreadsheet(str(path), "csv")
+    assert "- Total records: 2" in summary
+    assert "- qty: Total=3" in summary
+
+
+def test_xlsx_with_repeated_headers(tmp_path):
+    pytest.importorskip("pandas")
+    openpyxl = pytest.importorskip("openpyxl")
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["a", "a", "a", None, "qty"])
+    for i in range(30):
+        sheet.append([i, f"t{i % 3}", i * 2, None, 1])
+    sheet.append([None, None, None, None, None])
+    path = tmp_path / "book.xlsx"
+    workbook.save(path)
+
+    summary, chunks = read_spreadsheet(str(path), "xlsx", rows_per_chunk=25, max_row_chunks=0)
+    assert "- Columns: a, a.1, a.2, Unnamed: 3, qty" in summary
+    assert "- Total records: 30" in summary
+    assert "- a.2: Total=870" in summary
+    assert "- a.1: t0(10), t1(10), t2(10)" in summary
+    assert [(c['row_start'], c['row_end']) for c in chunks] == [(1, 25), (26, 30)]
+
+
+def test_row_chunk_cap(tmp_path):
+    pytest.importorskip("pandas")
+    path = tmp_path / "big.csv"
+    path.write_text("n\n" + "".join(f"{i}\n" for i in range(100)), encoding="utf-8")
+    summary, chunks = read_spreadsheet(str(path), "csv", rows_per_chunk=10, max_row_chunks=3)
+    assert len(chunks) == 3
+    assert "- Total records: 100" in summary
@@ -0,0 +1,137 @@
+# test_upload_spool.py
+import asyncio
+import hashlib
+
+import pytest
+
+from upload_spool import UploadSizeLimit, UploadSpool, UploadTooLarge
+
+
+class FakeUpload:
+    def __init__(self, filename, data):
+        self.filename = filename
+        self.data = data
+
+    async def read(self, size):
+        block, self.data = self.data[:size], self.data[size:]
+        return block
+
+
+def test_receive_spools_and_hashes(tmp_path):
+    spool = UploadSpool(str(tmp_path), chunk_size=4)
+    path, digest, size = asyncio.run(spool.receive(FakeUpload("a b.txt", b"hello world")))
+
+    assert open(path, 'rb').read() == b"hello world"
+    assert digest == hashlib.sha256(b"hello world").hexdigest()
+    assert size == 11
+    assert path.endswith("a_b.txt")
+
+
+def test_receive_rejects_oversized_and_cleans_up(tmp_path):
+    spool = UploadSpool(str(tmp_path / "spool"), max_bytes=8, chunk_size=4)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool.receive(FakeUpload("big.txt", b"x" * 20)))
+
+    assert list((tmp_path / "spool").iterdir()) == []
+    assert spool.stats()['rejected_too_large'] == 1
+
+
+def test_claim_release_and_mark_ingested(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    assert spool.claim("h1", "a.pdf", index="idx") is None
+    # Same bytes while the first upload is still processing
+    assert spool.claim("h1", "copy.pdf", index="idx")['status'] == 'processing'
+
+    spool.release("h1", index="idx")
+    assert spool.claim("h1", "a.pdf", index="idx") is None
+
+    spool.mark_ingested("h1", "a.pdf", "doc-1", 10, index="idx")
+    duplicate = spool.claim("h1", "again.pdf", index="idx")
+    assert (duplicate['doc_id'], duplicate['status']) == ("doc-1", 'ingested')
+    assert spool.stats()['in_progress'] == 0
+
+
+def test_claims_are_per_index(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    assert spool.claim("h1", "a.pdf", index="one") is None
+    assert spool.claim("h1", "a.pdf", index="two") is None
+
+    spool.mark_ingested("h1", "a.pdf", "doc-1", 10, index="one")
+    assert spool.claim("h1", "a.pdf", index="one")['status'] == 'ingested'
+    assert spool.claim("h1", "a.pdf", index="two")['status'] == 'processing'
+
+
+def test_registry_survives_restart(tmp_path):
+    UploadSpool(str(tmp_path)).mark_ingested("h1", "a.pdf", "doc-1", 10, index="idx")
+    assert UploadSpool(str(tmp_path)).claim("h1", "a.pdf", index="idx")['doc_id'] == "doc-1"
+
+
+def test_missing_document_is_ingested_again(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    spool.mark_ingested("h1", "a.pdf", "doc-1", 10, index="idx")
+    assert spool.claim("h1", "a.pdf", index="idx", exists=lambda doc_id: False) is None
+
+
+def test_exists_errors_propagate_without_claiming(tmp_path):
+    spool = UploadSpool(str(tmp_path))
+    spool.mark_ingested("h1", "a.pdf", "doc-1", 10, index="idx")
+
+    def unreachable(doc_id):
+        raise ConnectionError("index unreachable")
+
+    with pytest.raises(ConnectionError):
+        spool.claim("h1", "a.pdf", index="idx", exists=unreachable)
+    assert spool.stats()['in_progress'] == 0
+    assert spool.claim("h1", "a.pdf", index="idx")['status'] == 'ingested'
+
+
+def run_asgi(middleware, path, headers, bodies):
+    """Send one request through the middleware; returns the response status"""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': i < len(bodies) - 1}
+                for i, body in enumerate(bodies)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'path': path, 'headers': headers}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]['status'] if sent else None
+
+
+def make_app(calls):
+    async def app(scope, receive, send):
+        calls.append(scope['path'])
+        while (await receive()).get('more_body'):
+            pass
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+    return app
+
+
+def test_size_limit_rejects_large_content_length_before_reading():
+    calls = []
+    middleware = UploadSizeLimit(make_app(calls), max_bytes=100, paths=["/upload"], slack=0)
+
+    assert run_asgi(middleware, "/upload", [(b'content-length', b'101')], [b'']) == 413
+    assert calls == []
+
+
+def test_size_limit_only_applies_to_its_paths():
+    calls = []
+    middleware = UploadSizeLimit(make_app(calls), max_bytes=100, paths=["/upload"], slack=0)
+
+    assert run_asgi(middleware, "/chat", [(b'content-length', b'500')], [b'x' * 500]) == 200
+    assert run_asgi(middleware, "/upload", [(b'content-length', b'50')], [b'x' * 50]) == 200
+    assert calls == ["/chat", "/upload"]
+
+
+def test_size_limit_stops_chunked_body_once_over():
+    pytest.importorskip("fastapi")
+    calls = []
+    middleware = UploadSizeLimit(make_app(calls), max_bytes=100, paths=["/upload"], slack=0)
+
+    assert run_asgi(middleware, "/upload", [], [b'x' * 60, b'x' * 60, b'x' * 60]) == 413
@@ -0,0 +1,86 @@
+# test_vector_db.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+import vector_db
+from vector_db import PineconeBackend, chunk_vector_id
+
+
+class FakeIndex:
+    """Records upserts; fails the first `failures` calls, or writes only part of a batch"""
+
+    def __init__(self, failures=0, short_by=0):
+        self.failures = failures
+        self.short_by = short_by
+        self.batches = []
+
+    def upsert(self, vectors):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("reset by peer")
+        self.batches.append(vectors)
+        return {'upserted_count': len(vectors) - self.short_by}
+
+
+def make_backend(index, batch_size=100, max_retries=2):
+    backend = PineconeBackend.__new__(PineconeBackend)
+    backend.index = index
+    backend.batch_size = batch_size
+    backend.max_retries = max_retries
+    backend.last_upsert_stats = {}
+    backend._upsert_pool = ThreadPoolExecutor(max_workers=2)
+    return backend
+
+
+def vectors(count, dimension=4, text=""):
+    return [{'id': f"v{i}", 'values': [0.1] * dimension, 'metadata': {'text': text}} for i in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(vector_db.time, "sleep", lambda seconds: None)
+
+
+def test_batches_bounded_by_count():
+    backend = make_backend(FakeIndex(), batch_size=10)
+    assert [len(batch) for batch in backend._make_batches(vectors(25))] == [10, 10, 5]
+
+
+def test_batches_bounded_by_payload_size():
+    backend = make_backend(FakeIndex(), batch_size=1000)
+    big = vectors(10, text="x" * 400_000)
+    batches = backend._make_batches(big)
+    assert len(batches) > 1
+    assert sum(len(batch) for batch in batches) == 10
+
+
+def test_upsert_sends_every_batch_and_records_stats():
+    index = FakeIndex()
+    backend = make_backend(index, batch_size=10)
+    assert backend.upsert(vectors(25)) == 25
+    assert sorted(len(batch) for batch in index.batches) == [5, 10, 10]
+    assert backend.last_upsert_stats['batches'] == 3
+    assert backend.last_upsert_stats['failed_batches'] == 0
+
+
+def test_failed_batch_is_retried():
+    index = FakeIndex(failures=1)
+    backend = make_backend(index, max_retries=2)
+    backend.upsert(vectors(3))
+    assert backend.last_upsert_stats['per_batch'][0]['attempts'] == 2
+
+
+def test_partial_write_counts_as_failure():
+    backend = make_backend(FakeIndex(short_by=1), max_retries=1)
+    with pytest.raises(RuntimeError, match="1/1 upsert batches failed"):
+        backend.upsert(vectors(3))
+    assert backend.last_upsert_stats['failed_batches'] == 1
+
+
+def test_chunk_vector_ids_are_scoped_to_the_document():
+    assert chunk_vector_id("a.pdf_1", "hash") == chunk_vector_id("a.pdf_1", "hash")
+    assert chunk_vector_id("a.pdf_1", "hash") != chunk_vector_id("b.pdf_2", "hash")
+    assert chunk_vector_id("résumé.pdf_1", "hash").isascii()
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload goes over the configured size limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File is larger than the {max_bytes // (1024 * 1024)} MB upload limit")
+        self.max_bytes = max_bytes
+
+
+class UploadSizeLimit:
+    """ASGI middleware that stops oversized request bodies on upload paths.
+
+    Starlette parses a multipart body into its own temp file before the
+    endpoint runs, so UploadSpool's limit alone only triggers after the
+    whole upload is on disk. This rejects requests whose Content-Length is
+    over the limit before reading anything, and aborts chunked bodies as
+    soon as they pass it. ``slack`` allows for the multipart framing
+    around the file itself.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: list, slack: int = 64 * 1024):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + slack
+        self.paths = set(paths)
+
+    async def _reject(self, send):
+        body = json.dumps({'detail': str(UploadTooLarge(self.max_bytes))}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope['headers']).get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > self.limit:
+            await self._reject(send)
+            return
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.limit:
+                    from fastapi import HTTPException
+
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is
+                    raise HTTPException(status_code=413, detail=str(UploadTooLarge(self.max_bytes)))
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception as e:
+            if started or getattr(e, 'status_code', None) != 413:
+                raise
+            await self._reject(send)
+
+
+class UploadSpool:
+    """Streams uploads to a spool directory and remembers what was ingested.
+
+    Uploads are copied in ``chunk_size`` blocks, so memory use per upload
+    stays flat no matter how big the file is. The size limit is enforced as
+    bytes arrive, and the SHA-256 is computed on the way through. Successful
+    ingests are appended to ``ingested.jsonl`` in the spool directory with
+    the vector index they went into, so a re-upload of the same bytes to the
+    same index is recognised before any processing starts, even after a
+    restart.
+    """
+
+    def __init__(self, directory: str = 'upload_spool', max_bytes: int = 100 * 1024 * 1024,
+                 chunk_size: int = 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+
+        self.registry_path = os.path.join(directory, 'ingested.jsonl')
+        self._lock = threading.Lock()
+        self._ingested = {}  # (index, content hash) -> record
+        self._in_progress = {}  # (index, content hash) -> filename
+        self.duplicates = 0
+        self.rejected_too_large = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.registry_path):
+            return
+        with open(self.registry_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self._ingested[(record.get('index'), record['sha256'])] = record
+                except (ValueError, KeyError):
+                    continue
+
+    def spool_path(self, filename: str, prefix: str = 'temp'):
+        safe_name = os.path.basename(filename or 'upload').replace(' ', '_')
+        return os.path.join(self.directory, f"{prefix}_{uuid.uuid4()}_{safe_name}")
+
+    async def receive(self, upload, prefix: str = 'temp'):
+        """Copy an UploadFile to the spool; returns (path, sha256, size)"""
+        path = self.spool_path(upload.filename, prefix)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(path, 'wb') as out:
+                while True:
+                    block = await upload.read(self.chunk_size)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > self.max_bytes:
+                        self.rejected_too_large += 1
+                        raise UploadTooLarge(self.max_bytes)
+                    digest.update(block)
+                    out.write(block)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return path, digest.hexdigest(), size
+
+    def claim(self, content_hash: str, filename: str, index: str = None, exists=None):
+        """Reserve a hash for ingestion; returns the earlier record if it's a duplicate.
+
+        Only records and claims for the same index count. If exists is
+        given, it is called with the record's doc_id; when the document is
+        gone (the index was wiped) the record is dropped and the file
+        ingested again. Errors from exists propagate, leaving nothing claimed.
+        """
+        key = (index, content_hash)
+        with self._lock:
+            record = self._ingested.get(key)
+        if record is not None and exists is not None and not exists(record.get('doc_id')):
+            print(f"🔎 {record['filename']} is no longer in {index}, ingesting it again")
+            with self._lock:
+                if self._ingested.get(key) is record:
+                    del self._ingested[key]
+
+        with self._lock:
+            if key in self._ingested:
+                self.duplicates += 1
+                return self._ingested[key]
+            if key in self._in_progress:
+                self.duplicates += 1
+                return {'sha256': content_hash, 'filename': self._in_progress[key], 'status': 'processing'}
+            self._in_progress[key] = filename
+            return None
+
+    def release(self, content_hash: str, index: str = None):
+        """Forget a claim whose ingest failed, so the file can be uploaded again"""
+        with self._lock:
+            self._in_progress.pop((index, content_hash), None)
+
+    def mark_ingested(self, content_hash: str, filename: str, doc_id: str, size: int, index: str = None):
+        record = {
+            'sha256': content_hash,
+            'index': index,
+            'filename': filename,
+            'doc_id': doc_id,
+            'size': size,
+            'ingested_at': time.time(),
+            'status': 'ingested',
+        }
+        with self._lock:
+            self._in_progress.pop((index, content_hash), None)
+            self._ingested[(index, content_hash)] = record
+            with open(self.registry_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        return record
+
+    def stats(self):
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'max_upload_bytes': self.max_bytes,
+                'ingested_files': len(self._ingested),
+                'in_progress': len(self._in_progress),
+                'duplicates_skipped': self.duplicates,
+                'rejected_too_large': self.rejected_too_large,
+            }
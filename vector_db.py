@@ -1,59 +1,317 @@
-
 import os
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
+import json
+import time
+import random
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from embedding_cache import QueryEmbeddingCache
+from embedding_service import BatchingEmbedder
+from embedding_store import EmbeddingStore, content_hash, embed_with_store
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from metadata_filter import IMAGE_FILE_TYPES, build_filter
 
 load_dotenv()
 
-class VectorDBManager:
-    def __init__(self):
+
+def chunk_vector_id(doc_id: str, chunk_hash: str) -> str:
+    """Index ID for one chunk of one document.
+
+    The same text in two documents gets two vectors, so neither upload can
+    overwrite the other's metadata (or disappear with the other's doc_id).
+    Hashed because Pinecone IDs must be ASCII and filenames need not be.
+    """
+    return content_hash(f"{doc_id}\0{chunk_hash}")
+
+
+class PineconeBackend:
+    """Vector backend backed by a Pinecone serverless index"""
+
+    # Pinecone rejects upsert requests larger than 2MB; stay well under it
+    MAX_BATCH_BYTES = 1_500_000
+
+    def __init__(self, index_name: str, dimension: int):
+        from pinecone import Pinecone, ServerlessSpec
+
         # Initialize Pinecone with new API
         self.pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
-        
-        self.index_name = "jarvis-docs"
-        self.embedder = SentenceTransformer(os.getenv('EMBEDDING_MODEL'))
-        
+        self.index_name = index_name
+        self.batch_size = int(os.getenv('UPSERT_BATCH_SIZE', '100'))
+        self.concurrency = int(os.getenv('UPSERT_CONCURRENCY', '4'))
+        self.max_retries = int(os.getenv('UPSERT_MAX_RETRIES', '3'))
+        self.last_upsert_stats = {}
+
         # Check if index exists, create if not
         if self.index_name not in self.pc.list_indexes().names():
             self.pc.create_index(
                 name=self.index_name,
-                dimension=384,
+                dimension=dimension,
                 metric='cosine',
                 spec=ServerlessSpec(
                     cloud='aws',
                     region='us-east-1'
                 )
             )
-        
-        self.index = self.pc.Index(self.index_name)
-        print("✅ Vector DB initialized")
 
-    def ingest_documents(self, chunks: list, doc_id: str):
-        """Store document chunks in vector database"""
+        # pool_threads sizes the client's shared HTTP connection pool
+        self.index = self.pc.Index(self.index_name, pool_threads=self.concurrency)
+        self._upsert_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pinecone-upsert")
+
+    def _make_batches(self, vectors: list):
+        """Split vectors into batches bounded by count and approximate payload size"""
+        batches = []
+        current = []
+        current_bytes = 0
+        for vector in vectors:
+            # ~12 bytes per float in JSON plus the serialized metadata
+            size = len(vector['values']) * 12 + len(json.dumps(vector.get('metadata', {})))
+            if current and (len(current) >= self.batch_size or current_bytes + size > self.MAX_BATCH_BYTES):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(vector)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _upsert_batch(self, batch_no: int, batch: list):
+        """Upsert one batch, retrying with exponential backoff on errors or partial writes"""
+        start_time = time.time()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.index.upsert(vectors=batch)
+                upserted = getattr(response, 'upserted_count', None)
+                if upserted is None and isinstance(response, dict):
+                    upserted = response.get('upserted_count')
+                if upserted is not None and upserted < len(batch):
+                    raise RuntimeError(f"partial upsert: {upserted}/{len(batch)} vectors written")
+                elapsed = time.time() - start_time
+                print(f"⏱️  Upsert batch {batch_no}: {len(batch)} vectors in {elapsed:.2f}s (attempt {attempt + 1})")
+                return {'batch': batch_no, 'vectors': len(batch), 'seconds': round(elapsed, 3), 'attempts': attempt + 1}
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    print(f"❌ Upsert batch {batch_no} failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = (2 ** attempt) * 0.5 + random.uniform(0, 0.25)
+                print(f"⚠️  Upsert batch {batch_no} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def upsert(self, vectors: list):
+        """Upsert in size-bounded batches sent concurrently"""
+        batches = self._make_batches(vectors)
+        start_time = time.time()
+        futures = [self._upsert_pool.submit(self._upsert_batch, i, batch) for i, batch in enumerate(batches)]
+
+        batch_stats = []
+        errors = []
+        for future in futures:
+            try:
+                batch_stats.append(future.result())
+            except Exception as e:
+                errors.append(str(e))
+
+        self.last_upsert_stats = {
+            'vectors': len(vectors),
+            'batches': len(batches),
+            'failed_batches': len(errors),
+            'seconds': round(time.time() - start_time, 3),
+            'per_batch': batch_stats,
+        }
+        if errors:
+            raise RuntimeError(f"{len(errors)}/{len(batches)} upsert batches failed: {errors[0]}")
+        return len(vectors)
+
+    def query(self, vector, top_k: int = 5, include_metadata: bool = True, filter: dict = None):
+        # The filter is applied server-side before nearest-neighbour scoring
+        return self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            filter=filter
+        )
+
+    def describe(self):
+        return {
+            'backend': 'pinecone',
+            'index_name': self.index_name,
+            'last_upsert': self.last_upsert_stats,
+        }
+
+
+def create_backend(name: str, dimension: int, storage: str = None, rescore: bool = None):
+    """Build the vector backend selected by VECTOR_BACKEND"""
+    if name == 'local':
+        from local_index import LocalVectorIndex
+        if storage is None:
+            storage = os.getenv('LOCAL_INDEX_STORAGE', 'float32')
+        if rescore is None:
+            rescore = os.getenv('LOCAL_INDEX_RESCORE', 'true').lower() == 'true'
+        return LocalVectorIndex(
+            index_dir=os.getenv('LOCAL_INDEX_DIR', 'local_index'),
+            dimension=dimension,
+            search_mode=os.getenv('LOCAL_INDEX_SEARCH_MODE', 'auto'),
+            ann_threshold=int(os.getenv('LOCAL_INDEX_ANN_THRESHOLD', '20000')),
+            n_probe=int(os.getenv('LOCAL_INDEX_NPROBE', '8')),
+            storage=storage,
+            rescore=rescore,
+            rescore_factor=int(os.getenv('LOCAL_INDEX_RESCORE_FACTOR', '4')),
+            keep_full=os.getenv('LOCAL_INDEX_KEEP_FULL', 'false').lower() == 'true',
+        )
+    if name == 'pinecone':
+        return PineconeBackend("jarvis-docs", dimension)
+    raise ValueError(f"Unknown vector backend: {name}")
+
+
+class VectorDBManager:
+    def __init__(self, backend_name: str = None, storage: str = None, rescore: bool = None):
+        """storage ('float32', 'float16', 'int8') and rescore only apply to the local backend"""
+        # Imported here so importing this module doesn't pull in torch
+        from sentence_transformers import SentenceTransformer
+
+        self.index_name = "jarvis-docs"
+        self.embedder = SentenceTransformer(os.getenv('EMBEDDING_MODEL'))
+        self.dimension = self.embedder.get_sentence_embedding_dimension() or 384
+        self.query_cache = QueryEmbeddingCache(
+            max_size=int(os.getenv('QUERY_CACHE_SIZE', '1024')),
+            ttl_seconds=float(os.getenv('QUERY_CACHE_TTL', '3600'))
+        )
+        self.embedding_store = EmbeddingStore(
+            path=os.getenv('EMBEDDING_STORE_PATH', 'embedding_store.sqlite3'),
+            model_name=os.getenv('EMBEDDING_MODEL'),
+            max_entries=int(os.getenv('EMBEDDING_STORE_MAX_ENTRIES', '200000'))
+        )
+        self.query_batcher = BatchingEmbedder(
+            self.embedder,
+            window_ms=float(os.getenv('EMBED_BATCH_WINDOW_MS', '5')),
+            max_batch_size=int(os.getenv('EMBED_BATCH_MAX_SIZE', '32'))
+        )
+
+        self.hybrid_search = os.getenv('HYBRID_SEARCH', 'true').lower() == 'true'
+        self.min_vector_score = float(os.getenv('MIN_VECTOR_SCORE', '0.3' if self.hybrid_search else '0.1'))
+        self.rrf_k = int(os.getenv('RRF_K', '60'))
+        # A chunk only BM25 found must cover this much of the query (and score this high) to be fused
+        self.lexical_min_coverage = float(os.getenv('LEXICAL_MIN_COVERAGE', '0.5'))
+        self.lexical_min_score = float(os.getenv('LEXICAL_MIN_SCORE', '1.0'))
+        self.lexical_index = BM25Index(os.getenv('LEXICAL_INDEX_PATH', 'lexical_index.jsonl')) if self.hybrid_search else None
+
+        # Bumped after every successful ingest; caches keyed on the corpus compare against it
+        self.corpus_generation = 0
+        self._generation_lock = threading.Lock()
+
+        self.backend_name = backend_name or os.getenv('VECTOR_BACKEND', 'pinecone')
+        self.backend = create_backend(self.backend_name, self.dimension, storage=storage, rescore=rescore)
+        print(f"✅ Vector DB initialized ({self.backend_name} backend)")
+
+    @property
+    def index_key(self):
+        """Names the index uploads land in, e.g. 'pinecone:jarvis-docs' or 'local:local_index'"""
+        location = getattr(self.backend, 'index_name', None) or getattr(self.backend, 'index_dir', '')
+        return f"{self.backend_name}:{location}"
+
+    def has_document(self, doc_id: str):
+        """Whether any chunk of doc_id is in the index.
+
+        Errors from the backend propagate: guessing either way would skip a
+        missing document or ingest a duplicate.
+        """
+        if not doc_id:
+            return False
+        probe = [1.0] + [0.0] * (self.dimension - 1)
+        results = self.backend.query(vector=probe, top_k=1, include_metadata=False, filter={'doc_id': doc_id})
+        return bool(results.get('matches'))
+
+    def bump_corpus_generation(self):
+        # Concurrent ingests must each move it on, or one invalidation is lost
+        with self._generation_lock:
+            self.corpus_generation += 1
+            return self.corpus_generation
+
+    def warm_up(self):
+        """Run one throwaway encode so the first real query doesn't pay model warm-up"""
+        start_time = time.time()
+        self.embedder.encode(["warm up"])
+        print(f"🔥 Embedder warmed up in {time.time() - start_time:.2f}s")
+
+    def embed_query(self, query: str):
+        """Embed a search query, reusing cached embeddings for repeated questions"""
+        embedding = self.query_cache.get(query)
+        if embedding is None:
+            embedding = self.query_batcher.encode(query)
+            self.query_cache.put(query, embedding)
+        return embedding
+
+    def encode_sentences(self, sentences: list):
+        """Embed a list of short texts in one batched call (not cached)"""
+        return self.embedder.encode(sentences, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+
+    def recall_reference(self):
+        """Float32 embeddings of every local index row, for measure_recall.
+
+        Vector IDs are chunk content hashes, so these come from the embedding
+        store; chunks it no longer holds are re-encoded from their text.
+        """
+        backend = self.backend
+        ids = backend.ids[:backend.count]
+        stored = self.embedding_store.get_many(ids)
+        missing = [row for row, vector_id in enumerate(ids) if vector_id not in stored]
+        if missing:
+            texts = [backend.metadata[row].get('text', '') for row in missing]
+            stored.update(zip((ids[row] for row in missing), self.encode_sentences(texts)))
+        return np.stack([np.asarray(stored[vector_id], dtype=np.float32) for vector_id in ids])
+
+    def embed_chunks(self, texts: list, hashes: list):
+        """Embed chunk texts, only running the model on content not seen before"""
+        embeddings, computed = embed_with_store(texts, hashes, self.embedding_store, self.embedder.encode)
+        print(f"🧮 Embedded {computed} new chunks, reused {len(set(hashes)) - computed} cached")
+        return embeddings
+
+    def ingest_documents(self, chunks: list, doc_id: str, embeddings: list = None):
+        """Store document chunks in vector database.
+
+        embeddings may be passed in when they were computed elsewhere (the
+        ingestion worker pool); otherwise they are computed here.
+        """
         if not chunks:
             return False
             
         try:
+            uploaded_at = time.time()
             texts = [chunk['text'] for chunk in chunks]
-            embeddings = self.embedder.encode(texts)
+            hashes = [content_hash(text) for text in texts]
+            if embeddings is None:
+                embeddings = self.embed_chunks(texts, hashes)
             
+            # The content hash keys the embedding store; repeats within this
+            # document are stored once, under an ID scoped to the document
             vectors = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                vector_id = f"{doc_id}_chunk_{i}"
+            seen_hashes = set()
+            for i, (chunk, chunk_hash, embedding) in enumerate(zip(chunks, hashes, embeddings)):
+                if chunk_hash in seen_hashes:
+                    continue
+                seen_hashes.add(chunk_hash)
+                metadata = {
+                    'text': chunk['text'],
+                    'filename': chunk['filename'],
+                    'file_type': chunk['file_type'],
+                    'chunk_id': i,
+                    'doc_id': doc_id,
+                    'uploaded_at': uploaded_at
+                }
+                # PDF chunks remember which pages they came from, spreadsheet chunks which rows
+                for key in ('page_start', 'page_end', 'row_start', 'row_end'):
+                    if key in chunk:
+                        metadata[key] = chunk[key]
                 vectors.append({
-                    'id': vector_id,
+                    'id': chunk_vector_id(doc_id, chunk_hash),
                     'values': embedding.tolist(),
-                    'metadata': {
-                        'text': chunk['text'],
-                        'filename': chunk['filename'],
-                        'file_type': chunk['file_type'],
-                        'chunk_id': i,
-                        'doc_id': doc_id
-                    }
+                    'metadata': metadata
                 })
             
-            self.index.upsert(vectors=vectors)
+            self.backend.upsert(vectors)
+            if self.lexical_index is not None:
+                self.lexical_index.add_documents([(v['id'], v['metadata']) for v in vectors])
             print(f"✅ Ingested {len(vectors)} chunks from {chunks[0]['filename']}")
             return True
             
@@ -92,44 +350,81 @@ class VectorDBManager:
     #         print(f"❌ Search error: {str(e)}")
     #         return {'matches': []}
         # Update the search function to be more lenient for image queries
-    def search(self, query: str, top_k: int = 5):
-        """Semantic search - IMAGE FRIENDLY VERSION"""
+    def search(self, query: str, top_k: int = 5, filters: dict = None):
+        """Hybrid search - vector + BM25 fused with reciprocal-rank fusion
+
+        filters takes file_type, filename, doc_id, uploaded_after and
+        uploaded_before; they are pushed down to the backend as a metadata
+        filter so only the matching partition is searched.
+        """
         try:
-            query_embedding = self.embedder.encode([query]).tolist()
-            results = self.index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
+            metadata_filter = build_filter(**(filters or {}))
+            # Over-fetch candidates from both retrievers; fusion picks the final top_k
+            candidate_k = max(top_k * 4, 20) if self.hybrid_search else top_k
+            query_embedding = self.embed_query(query)
+            results = self.backend.query(
+                vector=query_embedding,
+                top_k=candidate_k,
+                include_metadata=True,
+                filter=metadata_filter
             )
         
             # SPECIAL HANDLING FOR IMAGE QUERIES
-            filtered_matches = []
-            seen_texts = set()
-        
             image_keywords = ['image', 'picture', 'photo', 'screenshot', 'chart', 'graph', 'what contain', 'what about', 'describe']
             is_image_query = any(keyword in query.lower() for keyword in image_keywords)
         
+            vector_matches = []
             for match in results.get('matches', []):
-                text = match['metadata'].get('text', '')
                 score = match.get('score', 0)
                 file_type = match['metadata'].get('file_type', '')
-                is_image_file = file_type in ['png', 'jpg', 'jpeg', 'bmp', 'tiff']
+                is_image_file = file_type in IMAGE_FILE_TYPES
             
-                if is_image_query and is_image_file:
-                    # VERY LENIENT for image queries - return ALL image content
-                    filtered_matches.append(match)
-                if (score > 0.1 and  # Very low threshold
-                    text not in seen_texts and 
-                    len(text) > 10):
-                    filtered_matches.append(match)
-                    seen_texts.add(text)
-                else:
-                    # Normal filtering for other content
-                    if (score > 0.3 and 
-                        text not in seen_texts and 
-                        len(text) > 5 and len(text) < 1000):
-                        filtered_matches.append(match)
-                        seen_texts.add(text)
+                # Image queries keep all image content; everything else needs a real semantic match
+                if score >= self.min_vector_score or (is_image_query and is_image_file):
+                    vector_matches.append({'id': match['id'], 'score': score, 'metadata': match['metadata']})
+        
+            # Image questions also get a pass restricted to image chunks, so text
+            # chunks can't use up top_k before any image content is reached
+            if is_image_query and not (metadata_filter and 'file_type' in metadata_filter):
+                image_filter = dict(metadata_filter or {}, file_type={'$in': IMAGE_FILE_TYPES})
+                image_results = self.backend.query(
+                    vector=query_embedding,
+                    top_k=top_k,
+                    include_metadata=True,
+                    filter=image_filter
+                )
+                image_matches = [
+                    {'id': match['id'], 'score': match.get('score', 0), 'metadata': match['metadata']}
+                    for match in image_results.get('matches', [])
+                ]
+                image_ids = {match['id'] for match in image_matches}
+                vector_matches = image_matches + [m for m in vector_matches if m['id'] not in image_ids]
+        
+            if self.lexical_index is not None:
+                vector_ids = {match['id'] for match in vector_matches}
+                lexical_matches = [
+                    match for match in self.lexical_index.search(query, top_k=candidate_k, filter=metadata_filter)
+                    if match['id'] in vector_ids or (
+                        match['coverage'] >= self.lexical_min_coverage and match['score'] >= self.lexical_min_score
+                    )
+                ]
+                ranked = reciprocal_rank_fusion(
+                    {'vector': vector_matches, 'lexical': lexical_matches},
+                    k=self.rrf_k
+                )
+            else:
+                ranked = vector_matches
+        
+            filtered_matches = []
+            seen_texts = set()
+            for match in ranked:
+                text = match['metadata'].get('text', '')
+                if text in seen_texts or len(text) <= 5:
+                    continue
+                filtered_matches.append(match)
+                seen_texts.add(text)
+                if len(filtered_matches) >= top_k:
+                    break
         
             return {'matches': filtered_matches}
         